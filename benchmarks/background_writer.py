@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Benchmark for writing chunked FASTA predictions on a background thread.
+
+Scales metapredict/data/test_data.fasta up to a larger file, then predicts
+it chunk by chunk twice with real inference: once writing each chunk's .csv
+output in the calling thread before the next chunk is predicted (the old 
+behaviour), and once through predict_disorder_fasta(chunk_size=...), which
+writes each chunk on a BackgroundWriter thread while the next one is 
+predicted. Both runs must produce identical files.
+
+Example:
+
+    python benchmarks/background_writer.py --copies 400 --chunk-size 200 --device cpu
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+import protfasta
+
+import metapredict as meta
+from metapredict.backend import meta_tools
+from metapredict.backend.predictor import predict
+
+
+TEST_FASTA = os.path.join(os.path.dirname(os.path.abspath(meta.__file__)), 'data', 'test_data.fasta')
+
+
+def build_fasta(filename, copies):
+    """
+    Writes copies x the records in test_data.fasta to filename. Each copy 
+    is rotated by a different offset, so every sequence is unique and none
+    are collapsed by the de-duplication in predict().
+    """
+    records = protfasta.read_fasta(TEST_FASTA)
+    scaled = {}
+    for i in range(copies):
+        for header, seq in records.items():
+            shift = i % len(seq)
+            scaled[f'{header.split()[0]}_{i}'] = seq[shift:] + seq[:shift]
+    protfasta.write_fasta(scaled, filename)
+    return len(scaled), sum([len(s) for s in scaled.values()])
+
+
+def predict_serial(fasta, output_file, chunk_size, device):
+    """
+    Predicts and writes one chunk at a time in the calling thread.
+    """
+    meta_tools.write_csv({}, output_file)
+    for chunk in meta_tools.read_fasta_chunks(fasta, chunk_size):
+        predictions = predict(chunk, return_numpy=False, show_progress_bar=False, use_device=device)
+        meta_tools.write_csv(predictions, output_file, append=True)
+
+
+def predict_overlapped(fasta, output_file, chunk_size, device):
+    """
+    Predicts one chunk while the previous one is written on a background thread.
+    """
+    meta.predict_disorder_fasta(fasta, output_file=output_file, chunk_size=chunk_size, device=device, show_progress_bar=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chunked FASTA prediction with and without the background writer.')
+    parser.add_argument('--copies', type=int, default=400, help='Number of copies of test_data.fasta to predict. Default = 400')
+    parser.add_argument('--chunk-size', type=int, default=200, help='Sequences per chunk. Default = 200')
+    parser.add_argument('--device', default='cpu', help='Device to predict on. Default = cpu')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of timed runs of each mode; the fastest is reported. Default = 3')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fasta = os.path.join(tmpdir, 'scaled.fasta')
+        n_seqs, n_res = build_fasta(fasta, args.copies)
+        print(f'{n_seqs} sequences ({n_res} residues), chunks of {args.chunk_size}, on {args.device}')
+
+        # warm up, so loading the network is not timed
+        predict_serial(fasta, os.path.join(tmpdir, 'warmup.csv'), args.chunk_size, args.device)
+
+        times = {}
+        for name, function in [('serial', predict_serial), ('background', predict_overlapped)]:
+            times[name] = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                function(fasta, os.path.join(tmpdir, f'{name}.csv'), args.chunk_size, args.device)
+                times[name].append(time.perf_counter() - start)
+            print(f'{name:>10}: {min(times[name]):.2f} s (best of {args.repeats})')
+
+        with open(os.path.join(tmpdir, 'serial.csv')) as a, open(os.path.join(tmpdir, 'background.csv')) as b:
+            if a.read() != b.read():
+                raise RuntimeError('serial and background outputs differ')
+
+    print(f'speed-up: {min(times["serial"]) / min(times["background"]):.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,9 @@ from metapredict.meta import *
 from metapredict.parameters import DEFAULT_NETWORK
 from metapredict.backend.network_parameters import metapredict_networks 
 from metapredict.backend.predictor import predict
+from metapredict.backend.prediction_cache import PredictionCache
+from metapredict.backend.score_archive import ScoreArchive
+from metapredict.backend.domain_segmenter import DomainSegmenter
 
 import os
 from importlib.metadata import version, PackageNotFoundError
@@ -0,0 +1 @@
+__version__ = "1.0.0+25.gc01ac5f.dirty"
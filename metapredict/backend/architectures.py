@@ -12,6 +12,26 @@ import torch
 import torch.nn as nn
 import pytorch_lightning as L
 
+
+def build_index_table(input_size):
+    """
+    Builds the lookup table used to turn integer residue indices into the
+    one-hot vectors the networks were trained on. Row i is the one-hot vector
+    for residue index i, and the extra final row (index == input_size) is all
+    zeros so it can be used for padding.
+
+    Parameters
+    ----------
+    input_size : int
+        Length of the input vectors at each timestep
+
+    Returns
+    -------
+    torch.FloatTensor
+        [input_size+1 X input_size] lookup table
+    """
+    return torch.eye(input_size + 1, input_size)
+
 '''
 USED BY V1 and V2 disorder predictors!
 USED BY V1 pLDDT predictor!
@@ -86,6 +106,10 @@ class BRNN_MtM(nn.Module):
         self.fc = torch.nn.Linear(in_features=hidden_size*2,  # *2 for bidirection
                                   out_features=num_classes)
 
+        # lookup table for index inputs. Not persistent so it does not appear
+        # in (or break loading of) the saved state dict.
+        self.register_buffer('index_table', build_index_table(input_size), persistent=False)
+
     def forward(self, x):
         """Propogate input sequences through the network to produce outputs
 
@@ -113,6 +137,43 @@ class BRNN_MtM(nn.Module):
         # return decoded hidden state
         return fc_out
 
+    def embed_indices(self, x):
+        """Expand integer residue indices into one-hot network inputs
+
+        The first LSTM layer multiplies each one-hot input by weight_ih_l0,
+        which is simply a column gather. This lets us send compact int8
+        indices to the device and do that gather there, rather than
+        building and copying dense [batch X length X 20] one-hot tensors.
+        The result is identical to the one-hot input.
+
+        Parameters
+        ----------
+        x : 2-dimensional PyTorch Tensor (any integer type)
+            Residue indices in the format [batch_dim X sequence_length].
+            The value input_size is treated as padding.
+
+        Returns
+        -------
+        3-dimensional PyTorch FloatTensor
+            [batch_dim X sequence_length X input_size] one-hot input
+        """
+        return nn.functional.embedding(x.long(), self.index_table)
+
+    def forward_indices(self, x):
+        """Propogate sequences encoded as integer indices through the network
+
+        Parameters
+        ----------
+        x : 2-dimensional PyTorch Tensor (any integer type)
+            Residue indices in the format [batch_dim X sequence_length]
+
+        Returns
+        -------
+        3-dimensional PyTorch FloatTensor
+            Same as forward() on the equivalent one-hot input
+        """
+        return self.forward(self.embed_indices(x))
+
 '''
 USED BY V3 disorder predictor!
 USED BY V2 pLDDT predictor!
@@ -187,6 +248,10 @@ class BRNN_MtM_lightning(L.LightningModule):
         # improve generalization, stability, and model capacity
         self.layer_norm = nn.LayerNorm(lstm_hidden_size*2)
 
+        # lookup table for index inputs. Not persistent so it does not appear
+        # in (or break loading of) the saved checkpoints.
+        self.register_buffer('index_table', build_index_table(input_size), persistent=False)
+
         self.linear_layers = nn.ModuleList()
         # increase LSTM embedding to linear hidden size dimension * 2 because bidirection-LSTM
         for i in range(0,self.num_linear_layers):
@@ -242,7 +307,39 @@ class BRNN_MtM_lightning(L.LightningModule):
 
         return out
 
+    def embed_indices(self, x):
+        """Expand integer residue indices into one-hot network inputs
 
+        The first LSTM layer multiplies each one-hot input by weight_ih_l0,
+        which is simply a column gather. This lets us send compact int8
+        indices to the device and do that gather there, rather than
+        building and copying dense [batch X length X 20] one-hot tensors.
+        The result is identical to the one-hot input.
 
+        Parameters
+        ----------
+        x : 2-dimensional PyTorch Tensor (any integer type)
+            Residue indices in the format [batch_dim X sequence_length].
+            The value input_size is treated as padding.
 
+        Returns
+        -------
+        3-dimensional PyTorch FloatTensor
+            [batch_dim X sequence_length X input_size] one-hot input
+        """
+        return nn.functional.embedding(x.long(), self.index_table)
+
+    def forward_indices(self, x):
+        """Propogate sequences encoded as integer indices through the network
+
+        Parameters
+        ----------
+        x : 2-dimensional PyTorch Tensor (any integer type)
+            Residue indices in the format [batch_dim X sequence_length]
 
+        Returns
+        -------
+        3-dimensional PyTorch FloatTensor
+            Same as forward() on the equivalent one-hot input
+        """
+        return self.forward(self.embed_indices(x))
@@ -0,0 +1,107 @@
+"""
+Writing output on a background thread.
+
+When a FASTA file is predicted a chunk at a time, formatting and writing
+one chunk's output can overlap with inference on the next chunk. Torch
+releases the GIL while the network runs, so a single writer thread that
+takes write jobs from a bounded queue keeps the device busy while the
+previous chunk is written. Jobs are run in the order they were submitted,
+and the bounded queue means at most max_queued chunks of predictions are
+held in memory waiting to be written.
+"""
+
+import queue
+import threading
+
+
+class BackgroundWriter:
+    """
+    Runs write jobs (any function call) one after another on a background
+    thread. If a job raises an exception, every later job is skipped and 
+    the exception is re-raised in the calling thread on the next submit() 
+    or on close(). Once a job has failed the writer stays failed, even 
+    after the exception has been raised, so nothing is written after the
+    point of failure.
+
+    Use as a context manager, so the thread is always shut down:
+
+        with BackgroundWriter() as writer:
+            for chunk in chunks:
+                writer.submit(write_csv, predict(chunk), output_file, append=True)
+    """
+
+    def __init__(self, max_queued=2):
+        """
+        Parameters
+        -----------
+        max_queued : int
+            Maximum number of jobs waiting to be written. submit() blocks
+            when the queue is full, so prediction never runs more than
+            max_queued chunks ahead of the writer.
+            Default = 2
+        """
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.error = None
+        self.failed = False
+        self.closed = False
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+
+            # None is the signal to stop
+            if job is None:
+                return
+
+            # keep draining the queue after an error so submit() never blocks
+            if self.failed:
+                continue
+
+            func, args, kwargs = job
+            try:
+                func(*args, **kwargs)
+            except BaseException as e:
+                self.error = e
+                self.failed = True
+
+    def _raise_error(self):
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queues func(*args, **kwargs) to be run on the writer thread.
+        Blocks if max_queued jobs are already waiting.
+        """
+        self._raise_error()
+        self.queue.put((func, args, kwargs))
+
+    def close(self):
+        """
+        Waits for every queued job to finish and stops the thread. Raises
+        the exception from a failed job, if there was one.
+        """
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+            self.thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # an exception in the caller takes precedence over one from the writer
+            self.error = None
+            if not self.closed:
+                self.closed = True
+                self.queue.put(None)
+                self.thread.join()
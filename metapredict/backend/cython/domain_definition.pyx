@@ -34,23 +34,35 @@ cdef binerize_function(double[:]  idr_score, double disorder_threshold):
     """
 
     
-    cdef int i
     cdef np.ndarray[np.int32_t, ndim=1] return_vals = np.empty(idr_score.shape[0], dtype=np.int32)
-    
-    for i in range(idr_score.shape[0]):
+    cdef int[:] B = return_vals
 
-        if idr_score[i] > disorder_threshold:
-            return_vals[i] = 1
-        else:
-            return_vals[i] = 0
+    with nogil:
+        binerize_into(idr_score, disorder_threshold, B)
             
     return return_vals
 
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void binerize_into(double[:] idr_score, double disorder_threshold, int[:] B) noexcept nogil:
+    """
+    Writes the binerized disorder scores into B (which must be the same 
+    length as idr_score). See binerize_function().
+    """
+    cdef Py_ssize_t i
+
+    for i in range(idr_score.shape[0]):
+        if idr_score[i] > disorder_threshold:
+            B[i] = 1
+        else:
+            B[i] = 0
+
 ## ................................................................................................
 ##
 @cython.boundscheck(False)
 @cython.wraparound(False) 
-cdef int sum_array(int start, int end, np.ndarray[np.int32_t, ndim=1] B):
+cdef int sum_array(int start, int end, int[:] B) noexcept nogil:
     """
     This function is actually where most of the performance boost for cythonizing this whole
     thing comes from. The first loop in the domain decomposition code has a TON of calls
@@ -68,7 +80,7 @@ cdef int sum_array(int start, int end, np.ndarray[np.int32_t, ndim=1] B):
         Note we don't bounds check so NEED to be sure that end < len(B) or this will cause a 
         segfault (and the 'kernel will die' from Python's perspective)
 
-    B : np.ndarray[np.int32_t, ndim=1]
+    B : int[:]
         Binary array - i.e. a 1D array of integers 
 
     Returns
@@ -84,6 +96,180 @@ cdef int sum_array(int start, int end, np.ndarray[np.int32_t, ndim=1] B):
     return total_sum
 
 
+## ................................................................................................
+##
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void close_gaps(int[:] B, int gap_closure) noexcept nogil:
+    """
+    Part 1 of the domain decomposition. For each gap size g (1 to gap_closure), 
+    fills in any stretch of g 0s that has g 1s on both sides. B is modified
+    in place, and must be at least 3*gap_closure+1 long.
+    """
+    cdef int g
+    cdef int n = B.shape[0]
+
+    for g in range(1, gap_closure+1):
+        close_gap_pass(B, g, 0, n)
+
+
+## ................................................................................................
+##
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int close_gap_pass(int[:] B, int g, int i, int limit) noexcept nogil:
+    """
+    The scan for one gap size g in close_gaps(). Starting from the window 
+    at position i, works along B looking at windows of 3*g positions, 
+    stopping before the first window whose end would reach limit (the 
+    length of B for a complete pass). Returns the position of the next 
+    window to look at, so the scan can be picked up again later once more
+    of B is known (see advance_gap_closure()). Positions before the 
+    returned position are never changed by a later window.
+    """
+    cdef int p1, p2, p3, p4, k, total
+
+    while i + 3*g < limit:
+        p1 = i
+        p2 = i + g
+        p3 = i + 2*g
+        p4 = i + 3*g
+
+        total = sum_array(p1, p4, B)
+
+        # if the complete set of smaller regions ahead is empty or
+        # fully assigned skip ahead because nothing to do here...
+        if total == 0:
+            i = p4
+
+        # we jump to the p3 position (and NOT p4) as this allows us to skip along without
+        # discarding positions we need for filling. Note if we know everything is empty
+        # it doesn't matter and we can jump to p4
+        elif total == 3*g:
+            i = p3
+
+        # if we have gapsize number of hits and gap away there's another gapsize
+        else:
+            if sum_array(p1, p2, B) == g and sum_array(p3, p4, B) == g:
+                for k in range(p2, p3):
+                    B[k] = 1
+            i = i + 1
+
+    return i
+
+
+def advance_gap_closure(int[:] B, int gap_size, int position, int limit):
+    """
+    Runs the close_gaps() scan for one gap size over a buffer holding part
+    of a binary profile, for the streaming domain decomposition. 
+
+    Parameters
+    -----------------
+    B : int[:]
+        Binary profile (int32), modified in place. Position 0 of B does not
+        have to be the start of the sequence; position and limit are 
+        indices into B.
+
+    gap_size : int
+        Gap size g of this scan
+
+    position : int
+        Position of the next window to look at
+
+    limit : int
+        Windows whose end reaches limit are not looked at. Everything 
+        before limit must already be final from the scans for smaller 
+        gap sizes, and limit must not be larger than the length of B.
+
+    Returns
+    -----------------
+    int
+        Position of the next window to look at
+    """
+    if limit > B.shape[0]:
+        raise ValueError('limit is past the end of B')
+
+    with nogil:
+        position = close_gap_pass(B, gap_size, position, limit)
+    return position
+
+
+## ................................................................................................
+##
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void remove_short_runs(int[:] B, int minimum_IDR_size) noexcept nogil:
+    """
+    Part 2 of the domain decomposition. Sets every run of 1s that is 
+    minimum_IDR_size or shorter to 0, in a single pass over the runs.
+
+    This gives exactly the same result as the original string-based version,
+    which for each size i from 1 to minimum_IDR_size replaced '0' + i*'1' + '0'
+    (and the same with the ends of the sequence in place of the 0s) with 0s
+    using str.replace(). Because str.replace() does not allow matches to 
+    overlap, the 0 after a run that was removed cannot also be the 0 before
+    the next run. So for a chain of interior runs of the same length, each 
+    separated by a single 0, only every other run was removed. The same is 
+    done here: an interior run is kept if the run before it has the same
+    length, is a single 0 away and was itself removed as an interior run.
+    Runs at either end of the sequence are always removed.
+    """
+    cdef int n = B.shape[0]
+    cdef int idx = 0
+    cdef int start, end, k
+    cdef int prev_end = -2, prev_length = -1
+    cdef bint interior, removed, prev_removed = False
+
+    while idx < n:
+        if B[idx] == 0:
+            idx = idx + 1
+            continue
+
+        # find the end of this run of 1s
+        start = idx
+        while idx < n and B[idx] == 1:
+            idx = idx + 1
+        end = idx
+
+        interior = start > 0 and end < n
+        removed = False
+
+        if end - start <= minimum_IDR_size:
+            if not interior:
+                removed = True
+            elif not (prev_removed and prev_length == end - start and start - prev_end == 1):
+                removed = True
+
+        if removed:
+            for k in range(start, end):
+                B[k] = 0
+
+        prev_end = end
+        prev_length = end - start
+        prev_removed = removed and interior
+
+
+## ................................................................................................
+##
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int find_transitions(int[:] B, int[:] transitions) noexcept nogil:
+    """
+    Writes every position i (1 <= i < len(B)) where B[i] != B[i-1] into 
+    transitions (which must be at least len(B) long) and returns how many 
+    there were. These split B into alternating runs of 1s and 0s.
+    """
+    cdef int i
+    cdef int count = 0
+
+    for i in range(1, B.shape[0]):
+        if B[i] != B[i-1]:
+            transitions[count] = i
+            count = count + 1
+
+    return count
+
+
 ## ................................................................................................
 ##
 ##
@@ -103,10 +289,12 @@ cpdef build_domains_from_values(double[:]  values,
     cdef:    
         int folded_domain_min_size_1, folded_domain_min_size_2
         np.ndarray[np.int32_t, ndim=1] B
-        int i, g, p1, p2, p3, p4, idx, start, gap_start, end
-        list local_domains = [], local_gaps = [], real_gaps = [], tmp = [], valid_vals = []
+        np.ndarray[np.int32_t, ndim=1] transitions
+        int[:] B_view
+        int[:] transitions_view
+        int i, n_transitions, segment_start, segment_end
         bint inside
-        float mean_value
+        list local_domains = [], local_gaps = [], real_gaps = [], tmp = [], valid_vals = []
 
     # 
     if not override_folded_domain_minsize:
@@ -133,96 +321,36 @@ cpdef build_domains_from_values(double[:]  values,
     
     if len(B) != len(values):
         raise ValueError('Error with binerize function. This is a bug.')
-    
-    for g in range(1, gap_closure+1):
-        
-        i = 0
-        
-        while True:
-            p1 = i
-            p2 = i + g
-            p3 = i + 2*g
-            p4 = i + 3*g
-
-            # if the complete set of smaller regions ahead is empty or
-            # fully assigned skip ahead because nothing to do here...
-            #if np.sum(B[p1:p4]) == 0:
-            if sum_array(p1,p4,B) == 0:
-                i = p4
-
-            # we jump to the p3 position (and NOT p4) as this allows us to skip along without
-            # discarding positions we need for filling. Note if we know everything is empty
-            # it doesn't matter and we can jump to p4
-            #elif np.sum(B[p1:p4]) == 3*g:
-            elif sum_array(p1,p4,B) == 3*g:
-                i = p3
-
-            # if we have gapsize number of hits and gap away there's another gapsize
-            else:
-                #if np.sum(B[p1:p2]) == g and np.sum(B[p3:p4]) == g:
-                if sum_array(p1,p2,B) == g and sum_array(p3,p4,B) == g:
-                
-                    B[p2:p3] = [1]*g
-                i = i + 1
-
-            if i + 3*g >= len(B):
-                break
 
-    # build a binary string
-    B_string = '-' + ''.join(map(str, B)) + '-'
-
-
-    for i in range(1, minimum_IDR_size + 1):
-
-        # 011110 -> 000000
-        B_string = B_string.replace('0' + i*'1' + '0', '0' + i*'0' + '0')
-
-        # -11110 -> -00000
-        B_string = B_string.replace('-'+i*'1' + '0', '-'+i*'0' + '0')
-
-        # 01111- -> 00000-
-        B_string = B_string.replace('0' + i*'1'+'-', '0' + i*'0'+'-')
-                   
-        # -1111- -> -0000-
-        B_string = B_string.replace('-' + i*'1'+'-', '-' + i*'0'+'-')
-
-    # 1 to -1 to cut off the artificial caps we added
-    for i in range(1, len(B_string)-1):
-        B[i-1] = int(B_string[i])
-
-    # Part 3 - extract domain boundaries
-    if B[0] == 1:
-        inside = True
-        start = 0
-        gap_start = -1
-    else:
-        inside = False
-        gap_start = 0
+    transitions = np.empty(len(B), dtype=np.int32)
+    B_view = B
+    transitions_view = transitions
+
+    # Parts 1-3 work on the binary array in C and release the GIL: close
+    # small gaps, remove runs that are too short to be IDRs and find where
+    # the remaining runs start and end
+    with nogil:
+        close_gaps(B_view, gap_closure)
+        remove_short_runs(B_view, minimum_IDR_size)
+        n_transitions = find_transitions(B_view, transitions_view)
+
+    # Part 3 - extract domain boundaries. Runs alternate between 1 (domain)
+    # and 0 (gap), starting with the value of B[0]
+    inside = B[0] == 1
+    segment_start = 0
+    for i in range(n_transitions + 1):
+        if i < n_transitions:
+            segment_end = transitions[i]
+        else:
+            segment_end = len(B)
 
-    # for each position
-    for idx in range(0, len(B)):
-        i = B[idx]
+        if inside:
+            local_domains.append([segment_start, segment_end])
+        else:
+            local_gaps.append([segment_start, segment_end])
 
-        if i == 1:
-            if inside:
-                continue
-            else:
-                local_gaps.append([gap_start, idx])
-                inside = True
-                start = idx
-
-        if i == 0:
-            if inside:
-                inside = False
-                end = idx
-                local_domains.append([start, end])
-                gap_start = idx
-
-    # if we finished inside
-    if inside:
-        local_domains.append([start, len(B)])
-    else:
-        local_gaps.append([gap_start, len(B)])
+        inside = not inside
+        segment_start = segment_end
 
     # Part 4 - final closure of larger gaps if close to disorder_threshold
     for d in local_gaps:
@@ -265,3 +393,223 @@ cpdef build_domains_from_values(double[:]  values,
     return (local_domains, real_gaps)
 
 
+
+
+## ................................................................................................
+##
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef double mean_array(double[:] values, int start, int end) noexcept nogil:
+    """
+    Mean of values[start:end]. end must be > start.
+    """
+    cdef int i
+    cdef double total = 0
+
+    for i in range(start, end):
+        total += values[i]
+    return total / (end - start)
+
+
+## ................................................................................................
+##
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void decompose_one(double[:] values,
+                        int[:] B,
+                        int[:] transitions,
+                        double disorder_threshold,
+                        int minimum_IDR_size,
+                        int minimum_folded_domain,
+                        int gap_closure,
+                        int folded_domain_min_size_1,
+                        int folded_domain_min_size_2,
+                        np.int64_t[:, :] idr_out,
+                        np.int64_t[:, :] fd_out,
+                        np.int64_t[:] counts) noexcept nogil:
+    """
+    The whole domain decomposition (as build_domains_from_values()) for one
+    sequence, without the GIL. B and transitions are scratch space the 
+    same length as values. IDR and folded domain boundaries are written to
+    the first rows of idr_out and fd_out (which must have at least 
+    len(values) rows), and how many of each there are to counts[0] and 
+    counts[1].
+    """
+    cdef int n = values.shape[0]
+    cdef int i, n_transitions, segment_start, segment_end, length
+    cdef int n_idr = 0, n_fd = 0
+    cdef int merged_start = -1, merged_end = -1
+    cdef bint inside, disordered
+    cdef double total = 0
+
+    binerize_into(values, disorder_threshold, B)
+
+    # for short sequences class the whole thing as either folded or disordered
+    if n < minimum_IDR_size or n < 3*gap_closure+1:
+        for i in range(n):
+            total += B[i]
+
+        if total / n >= disorder_threshold:
+            idr_out[0, 0] = 0
+            idr_out[0, 1] = n
+            n_idr = 1
+        else:
+            fd_out[0, 0] = 0
+            fd_out[0, 1] = n
+            n_fd = 1
+
+        counts[0] = n_idr
+        counts[1] = n_fd
+        return
+
+    close_gaps(B, gap_closure)
+    remove_short_runs(B, minimum_IDR_size)
+    n_transitions = find_transitions(B, transitions)
+
+    # walk the alternating runs. Runs of 1s are IDRs and runs of 0s are gaps,
+    # but short gaps with a high enough mean disorder are folded into the 
+    # IDRs around them (Part 4); consecutive disordered runs are merged
+    inside = B[0] == 1
+    segment_start = 0
+    for i in range(n_transitions + 1):
+        if i < n_transitions:
+            segment_end = transitions[i]
+        else:
+            segment_end = n
+
+        disordered = inside
+        if not inside:
+            length = segment_end - segment_start
+            if length < minimum_folded_domain and mean_array(values, segment_start, segment_end) > disorder_threshold*0.75:
+                disordered = True
+            elif length < folded_domain_min_size_1 and mean_array(values, segment_start, segment_end) > disorder_threshold*0.35:
+                disordered = True
+            elif length < folded_domain_min_size_2 and mean_array(values, segment_start, segment_end) > disorder_threshold*0.25:
+                disordered = True
+
+        if disordered:
+            if merged_end == segment_start:
+                merged_end = segment_end
+            else:
+                if merged_start != -1:
+                    idr_out[n_idr, 0] = merged_start
+                    idr_out[n_idr, 1] = merged_end
+                    n_idr = n_idr + 1
+                merged_start = segment_start
+                merged_end = segment_end
+        else:
+            fd_out[n_fd, 0] = segment_start
+            fd_out[n_fd, 1] = segment_end
+            n_fd = n_fd + 1
+
+        inside = not inside
+        segment_start = segment_end
+
+    if merged_start != -1:
+        idr_out[n_idr, 0] = merged_start
+        idr_out[n_idr, 1] = merged_end
+        n_idr = n_idr + 1
+
+    counts[0] = n_idr
+    counts[1] = n_fd
+
+
+## ................................................................................................
+##
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def build_domains_batch(double[:] values,
+                        np.int64_t[:] offsets,
+                        double disorder_threshold,
+                        int minimum_IDR_size=12,
+                        int minimum_folded_domain=50,
+                        int gap_closure=10,
+                        bint override_folded_domain_minsize=False):
+    """
+    Batched version of build_domains_from_values(). Runs the domain 
+    decomposition for many (already smoothed) disorder profiles stored 
+    back to back in one array, in a single call that releases the GIL.
+
+    Parameters
+    -----------------
+    values : double[:]
+        Disorder profiles for every sequence, back to back
+
+    offsets : np.int64_t[:]
+        n+1 offsets such that the profile for sequence i is 
+        values[offsets[i]:offsets[i+1]]. Every profile must have at least
+        one value.
+
+    disorder_threshold : double
+        See build_domains_from_values(). MAKE SURE it is a double.
+
+    minimum_IDR_size, minimum_folded_domain, gap_closure, override_folded_domain_minsize
+        See build_domains_from_values()
+
+    Returns
+    -----------------
+    tuple
+        (idr_boundaries, idr_offsets, fd_boundaries, fd_offsets). The 
+        boundaries are int64 arrays of shape [k, 2] holding [start, end) 
+        for every IDR (or folded domain) of every sequence, in order, and
+        the IDRs of sequence i are idr_boundaries[idr_offsets[i]:idr_offsets[i+1]].
+    """
+    cdef:
+        int folded_domain_min_size_1, folded_domain_min_size_2
+        Py_ssize_t n_seqs = offsets.shape[0] - 1
+        Py_ssize_t total = values.shape[0]
+        Py_ssize_t j, k, start, end, n_idr = 0, n_fd = 0
+        np.ndarray[np.int32_t, ndim=1] B = np.empty(total, dtype=np.int32)
+        np.ndarray[np.int32_t, ndim=1] transitions = np.empty(total, dtype=np.int32)
+        np.ndarray[np.int64_t, ndim=2] idr_boundaries = np.empty((total, 2), dtype=np.int64)
+        np.ndarray[np.int64_t, ndim=2] fd_boundaries = np.empty((total, 2), dtype=np.int64)
+        np.ndarray[np.int64_t, ndim=2] counts = np.zeros((max(n_seqs, 0), 2), dtype=np.int64)
+        np.ndarray[np.int64_t, ndim=1] idr_offsets = np.zeros(max(n_seqs, 0)+1, dtype=np.int64)
+        np.ndarray[np.int64_t, ndim=1] fd_offsets = np.zeros(max(n_seqs, 0)+1, dtype=np.int64)
+        int[:] B_view = B
+        int[:] transitions_view = transitions
+        np.int64_t[:, :] idr_view = idr_boundaries
+        np.int64_t[:, :] fd_view = fd_boundaries
+        np.int64_t[:, :] counts_view = counts
+
+    if not override_folded_domain_minsize:
+        folded_domain_min_size_1 = 35
+        folded_domain_min_size_2 = 20
+    else:
+        folded_domain_min_size_1 = minimum_folded_domain
+        folded_domain_min_size_2 = minimum_folded_domain
+
+    for j in range(n_seqs):
+        if offsets[j+1] <= offsets[j]:
+            raise ValueError('Every disorder profile must have at least one value')
+    if n_seqs > 0 and offsets[n_seqs] > total:
+        raise ValueError('offsets run past the end of values')
+
+    with nogil:
+        # each sequence writes its domains into the rows of the output 
+        # arrays that line up with its own residues, so sequences are 
+        # independent of each other
+        for j in range(n_seqs):
+            start = offsets[j]
+            end = offsets[j+1]
+            decompose_one(values[start:end], B_view[start:end], transitions_view[start:end],
+                          disorder_threshold, minimum_IDR_size, minimum_folded_domain, gap_closure,
+                          folded_domain_min_size_1, folded_domain_min_size_2,
+                          idr_view[start:end], fd_view[start:end], counts_view[j])
+
+        # then compact the rows so each sequence's domains follow the last
+        for j in range(n_seqs):
+            start = offsets[j]
+            for k in range(counts_view[j, 0]):
+                idr_view[n_idr, 0] = idr_view[start+k, 0]
+                idr_view[n_idr, 1] = idr_view[start+k, 1]
+                n_idr = n_idr + 1
+            for k in range(counts_view[j, 1]):
+                fd_view[n_fd, 0] = fd_view[start+k, 0]
+                fd_view[n_fd, 1] = fd_view[start+k, 1]
+                n_fd = n_fd + 1
+
+    np.cumsum(counts[:, 0], out=idr_offsets[1:])
+    np.cumsum(counts[:, 1], out=fd_offsets[1:])
+
+    return (idr_boundaries[:n_idr].copy(), idr_offsets, fd_boundaries[:n_fd].copy(), fd_offsets)
@@ -1,5 +1,7 @@
 import numpy as np
 
+from metapredict.backend import quantization as _quantization
+
 class DisorderObject:
     """
     Simple datastructure that is returned from predict_disorder_domains
@@ -59,3 +61,193 @@ class DisorderObject:
     def __repr__(self):
         return str(self)
 
+
+
+class OffsetScores:
+    """
+    Base class for datastructures that store the scores for many sequences
+    back to back, with an offsets array recording where each sequence 
+    starts and ends. Scores for the sequence at position i are 
+    buffer[offsets[i]:offsets[i+1]].
+
+    Subclasses implement _scores_at(), which returns the scores for the
+    sequence at one position, and _summary(), used by __str__.
+    """
+
+    # dot variables listed by __str__
+    _dot_variables = ['ids', 'offsets', 'lengths']
+
+    def __init__(self, ids, offsets):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        ids : list
+            Sequence IDs, in the order the sequences were passed
+
+        offsets : np.ndarray
+            int64 array of length len(ids)+1. Scores for the sequence at
+            position i are in [offsets[i], offsets[i+1])
+        """
+        self.ids = ids
+        self.offsets = offsets
+        self._index = None
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def index(self, seq_id):
+        """
+        Returns the position of a sequence ID. If an ID appears more than
+        once the first position is returned.
+        """
+        if self._index is None:
+            self._index = {}
+            for i, local_id in enumerate(self.ids):
+                if local_id not in self._index:
+                    self._index[local_id] = i
+        return self._index[seq_id]
+
+    def _scores_at(self, i):
+        raise NotImplementedError
+
+    def _summary(self):
+        raise NotImplementedError
+
+    def __getitem__(self, seq_id):
+        return self._scores_at(self.index(seq_id))
+
+    def __iter__(self):
+        for i, seq_id in enumerate(self.ids):
+            yield seq_id, self._scores_at(i)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __str__(self):
+        rs = f"{type(self).__name__} for {len(self.ids)} sequences {self._summary()}\n"
+        rs = rs + "Available dot variables are:\n" + ''.join([f"  .{v}\n" for v in self._dot_variables])
+        return rs
+
+    def __repr__(self):
+        return str(self)
+
+
+class ColumnarScores(OffsetScores):
+    """
+    Columnar datastructure returned from batch predict_all(). Instead of one
+    small array per sequence per network, the scores for each network are 
+    stored back to back in a single float32 buffer, and an offsets array 
+    records where each sequence starts and ends. Scores for the sequence at
+    position i are buffer[offsets[i]:offsets[i+1]].
+
+    This keeps memory use and object count low for very large numbers of
+    sequences, and the buffers can be written straight into columnar 
+    formats (e.g. Arrow / Parquet list columns) without copying.
+    """
+
+    _dot_variables = ['ids', 'offsets', 'scores', 'networks', 'lengths']
+
+    def __init__(self, ids, offsets, scores):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        ids : list
+            Sequence IDs, in the order the sequences were passed
+
+        offsets : np.ndarray
+            int64 array of length len(ids)+1. Scores for the sequence at
+            position i are in [offsets[i], offsets[i+1])
+
+        scores : dict
+            Maps each network name (e.g. 'disorder_V3') to a 1D float32
+            array with the concatenated scores for every sequence
+        """
+        super().__init__(ids, offsets)
+        self.scores = scores
+
+    @property
+    def networks(self):
+        return list(self.scores.keys())
+
+    def get(self, seq_id, network):
+        """
+        Returns the scores for one sequence ID from one network. The 
+        returned array is a view into the underlying buffer.
+        """
+        i = self.index(seq_id)
+        return self.scores[network][self.offsets[i]:self.offsets[i+1]]
+
+    def _scores_at(self, i):
+        """
+        Returns a dictionary mapping network name to the scores for the
+        sequence at position i.
+        """
+        return {network: self.scores[network][self.offsets[i]:self.offsets[i+1]] for network in self.scores}
+
+    def _summary(self):
+        return f"({self.offsets[-1]} residues) from networks: {', '.join(self.networks)}"
+
+
+class RaggedScores(OffsetScores):
+    """
+    Ragged datastructure returned from batch predictions when 
+    return_format='ragged'. The scores for every sequence are stored back 
+    to back in one contiguous array (.values), and an offsets array records 
+    where each sequence starts and ends, so scores for the sequence at 
+    position i are values[offsets[i]:offsets[i+1]]. Indexing by ID returns 
+    a view into .values, not a copy.
+
+    Compared with a list or dictionary of per-sequence arrays this avoids 
+    the per-array overhead, and .values / .offsets map directly onto an 
+    Arrow or Parquet list column.
+
+    If the values are quantized (uint8 or uint16) then .scale is the score
+    represented by one integer step, and get() returns decoded float32 
+    scores.
+    """
+
+    _dot_variables = ['ids', 'offsets', 'values', 'lengths']
+
+    def __init__(self, ids, offsets, values, scale=None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        ids : list
+            Sequence IDs, in the order the sequences were passed. For a 
+            list input these are the positions in the list.
+
+        offsets : np.ndarray
+            int64 array of length len(ids)+1
+
+        values : np.ndarray
+            1D array with the concatenated scores for every sequence
+
+        scale : float or None
+            Scale factor if values are quantized, otherwise None
+        """
+        super().__init__(ids, offsets)
+        self.values = values
+        self.scale = scale
+
+    def get(self, seq_id):
+        """
+        Returns the scores for a sequence ID as float32, decoding 
+        quantized values. Unlike indexing, this returns a copy.
+        """
+        stored = self[seq_id]
+        if self.scale is not None:
+            return _quantization.dequantize(stored, self.scale)
+        return stored.astype(np.float32)
+
+    def _scores_at(self, i):
+        return self.values[self.offsets[i]:self.offsets[i+1]]
+
+    def _summary(self):
+        return f"({self.offsets[-1]} residues, {self.values.dtype})"
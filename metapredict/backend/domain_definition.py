@@ -1,6 +1,10 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import scipy
-from scipy.signal import savgol_filter
+from scipy.signal import savgol_filter, savgol_coeffs
+from scipy.ndimage import convolve1d
 from metapredict.metapredict_exceptions import DomainError
 
 
@@ -9,6 +13,8 @@ from metapredict.metapredict_exceptions import DomainError
 # This fix was added in May 2023
 try:
     from .cython.domain_definition import build_domains_from_values as CYTHON_build_domains_from_values    
+    from .cython.domain_definition import build_domains_batch as CYTHON_build_domains_batch
+    from .cython.domain_definition import advance_gap_closure as CYTHON_advance_gap_closure
 except ModuleNotFoundError as e:
     print('ERROR: Cython module was not found. This will happen if your installation did not correctly compile the cython modules')
 
@@ -17,6 +23,12 @@ except ModuleNotFoundError as e:
     def CYTHON_build_domains_from_values(a,b,c,d,e,f):
         raise ModuleNotFoundError('Could not import build_domains_from_values() in metapredict.backend.cython.domain_definition. Cython code has not compiled')
 
+    def CYTHON_build_domains_batch(*args, **kwargs):
+        raise ModuleNotFoundError('Could not import build_domains_batch() in metapredict.backend.cython.domain_definition. Cython code has not compiled')
+
+    def CYTHON_advance_gap_closure(*args, **kwargs):
+        raise ModuleNotFoundError('Could not import advance_gap_closure() in metapredict.backend.cython.domain_definition. Cython code has not compiled')
+
     
 """
 Functions for extracting out discrete disordered domains based on the linear disorder score
@@ -431,3 +443,232 @@ def get_domains(sequence,
             fds.append([d[0], d[1], sequence[d[0]:d[1]]])
 
     return [smoothed_disorder, idrs, fds]
+
+
+@functools.lru_cache(maxsize=None)
+def _savgol_kernels(window_size, polynomial_order):
+    """
+    Savitzky-Golay smoothing for a given window and polynomial order as
+    (convolution coefficients, edge operator). savgol_filter() smooths 
+    the interior of a profile by convolving it with the coefficients, and
+    the first and last window_size//2 values by fitting a polynomial to 
+    the first (last) window_size values, which is the same as multiplying
+    them by the first (last) rows of the window_size x window_size edge 
+    operator. Cached so each kernel is only computed once.
+    """
+    coefficients = savgol_coeffs(window_size, polynomial_order)
+    edge_operator = savgol_filter(np.eye(window_size), window_size, polynomial_order, axis=0)
+
+    # shared between calls, so make sure they can't be changed
+    coefficients.setflags(write=False)
+    edge_operator.setflags(write=False)
+    return coefficients, edge_operator
+
+
+@functools.lru_cache(maxsize=None)
+def _short_profile_operator(length, polynomial_order):
+    """
+    Smoothing for a profile that is no longer than the smoothing window.
+    get_domains() shrinks the window to the profile length (minus one if 
+    even) in this case, which makes smoothing a fixed length x length 
+    linear operator. Cached so each length is only computed once.
+    """
+    window_size = length
+    if window_size % 2 == 0:
+        window_size = window_size - 1
+
+    if polynomial_order >= window_size:
+        polynomial_order = window_size - 1
+
+    operator = savgol_filter(np.eye(length), window_size, polynomial_order, axis=0)
+    operator.setflags(write=False)
+    return operator
+
+
+def smooth_disorder_batch(values, offsets, minimum_IDR_size=12):
+    """
+    Smooths many disorder profiles stored back to back in one array, 
+    giving the same result as the smoothing in get_domains() on each 
+    profile (including the [0, 1] clipping). 
+
+    The interior of every profile is smoothed with a single convolution 
+    over the whole array, and the edges of every profile with one matrix 
+    product. Profiles no longer than the smoothing window are grouped by 
+    length and each group is smoothed with one matrix product, without the
+    warning get_domains() prints for each of them.
+
+    Parameters
+    -------------
+    values : np.ndarray
+        Per-residue disorder values for every sequence, back to back
+
+    offsets : np.ndarray
+        n+1 offsets such that the disorder for sequence i is 
+        values[offsets[i]:offsets[i+1]]. Every profile must have at 
+        least one value.
+
+    minimum_IDR_size : int
+        Sets the smoothing window (2*minimum_IDR_size), as in 
+        get_domains(). Default = 12.
+
+    Returns
+    ------------
+    np.ndarray
+        Smoothed disorder (float64) for every sequence, back to back
+
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+
+    # same smoothing parameters as get_domains()
+    polynomial_order = 3
+    window_size = 2*minimum_IDR_size
+
+    if window_size <= polynomial_order:
+        window_size = polynomial_order+2
+
+    # get_domains() shrinks the window for profiles no longer than this
+    short = lengths <= window_size
+    long_enough = np.flatnonzero(~short)
+
+    if window_size % 2 == 0:
+        window_size = window_size - 1
+
+    if polynomial_order >= window_size:
+        polynomial_order = window_size - 1
+
+    half = window_size // 2
+    coefficients, edge_operator = _savgol_kernels(window_size, polynomial_order)
+
+    # the interior of every profile is a convolution, which can't reach 
+    # past the end of its own profile, so smooth the whole buffer in one go
+    smoothed = convolve1d(values, coefficients, mode='constant')
+
+    # then overwrite the edges
+    if len(long_enough) > 0:
+        window = np.arange(window_size)
+        starts = offsets[:-1][long_enough][:, None] + window
+        ends = offsets[1:][long_enough][:, None] - window_size + window
+
+        smoothed[starts[:, :half]] = values[starts] @ edge_operator[:half].T
+        smoothed[ends[:, -half:]] = values[ends] @ edge_operator[-half:].T
+
+    # short profiles, one group per length. As in get_domains(), these start
+    # again from an order of 3 (before any clamping to the shorter window)
+    if np.any(short):
+        for length in np.unique(lengths[short]):
+            group = np.flatnonzero(lengths == length)
+            positions = offsets[:-1][group][:, None] + np.arange(length)
+            smoothed[positions] = values[positions] @ _short_profile_operator(int(length), 3).T
+
+    return np.clip(smoothed, a_min=0, a_max=1)
+
+
+def get_domains_batch(values,
+                      offsets,
+                      disorder_threshold=0.42,
+                      minimum_IDR_size=12,
+                      minimum_folded_domain=50,
+                      gap_closure=10,
+                      override_folded_domain_minsize=False,
+                      threads=1):
+    """
+    Batched version of get_domains() for many disorder profiles stored 
+    back to back in one array (e.g. the flat output of a prediction batch).
+    Smoothing is done for every profile at once (see 
+    smooth_disorder_batch()) and the domain decomposition runs for every 
+    profile in a single Cython call, so there is no per-sequence Python 
+    overhead. Gives the same domains as calling get_domains() on each 
+    profile (smoothing is always done in double precision, so for float32
+    input the smoothed values can differ from get_domains() in the last 
+    float32 digit).
+
+    Parameters
+    -------------
+    values : np.ndarray
+        Per-residue disorder values for every sequence, back to back
+
+    offsets : np.ndarray
+        n+1 offsets such that the disorder for sequence i is 
+        values[offsets[i]:offsets[i+1]]. Every profile must have at 
+        least one value.
+
+    disorder_threshold, minimum_IDR_size, minimum_folded_domain, gap_closure, override_folded_domain_minsize
+        See get_domains().
+
+    threads : int
+        Number of threads to run the decomposition on. The profiles are 
+        split into contiguous blocks of about the same number of residues
+        and each block is decomposed by the Cython code with the GIL 
+        released, so blocks run on separate cores. The result does not 
+        depend on the number of threads.
+        Default = 1
+
+    Returns
+    ------------
+    tuple
+
+        Returns a 5-position tuple with the following information:
+
+        [0] - Smoothed disorder for every sequence, back to back (so 
+              sequence i is at [offsets[i]:offsets[i+1]])
+
+        [1] - IDR boundaries, an int64 array of shape [k, 2] where each row 
+              is [start, end) for one IDR, grouped by sequence in order
+
+        [2] - IDR offsets. The IDRs of sequence i are rows 
+              idr_offsets[i]:idr_offsets[i+1] of [1]
+
+        [3] - Folded domain boundaries, as for [1]
+
+        [4] - Folded domain offsets, as for [2]
+
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+
+    if len(offsets) == 0 or np.any(lengths < 1):
+        raise DomainError('Every disorder profile must have at least one value')
+
+    if not isinstance(threads, int) or threads < 1:
+        raise DomainError(f'threads must be a positive integer, got {threads}')
+
+    smoothed = smooth_disorder_batch(values, offsets, minimum_IDR_size=minimum_IDR_size)
+
+    def decompose(first, last):
+        # decompose sequences first to last-1 
+        return CYTHON_build_domains_batch(smoothed[offsets[first]:offsets[last]],
+                                          offsets[first:last+1] - offsets[first],
+                                          np.double(disorder_threshold),
+                                          minimum_IDR_size=minimum_IDR_size,
+                                          minimum_folded_domain=minimum_folded_domain,
+                                          gap_closure=gap_closure,
+                                          override_folded_domain_minsize=override_folded_domain_minsize)
+
+    n_seqs = len(lengths)
+    if threads == 1 or n_seqs < 2:
+        idrs, idr_offsets, fds, fd_offsets = decompose(0, n_seqs)
+        return (smoothed, idrs, idr_offsets, fds, fd_offsets)
+
+    # a few blocks per thread, split by residue count, so one long protein
+    # doesn't leave the other threads idle
+    n_blocks = min(n_seqs, 4*threads)
+    block_edges = np.searchsorted(offsets, np.linspace(0, offsets[-1], n_blocks+1)[1:-1])
+    block_edges = np.unique(np.concatenate(([0], block_edges, [n_seqs])))
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        blocks = list(pool.map(decompose, block_edges[:-1], block_edges[1:]))
+
+    # stitch the blocks back together in order
+    idrs = np.concatenate([b[0] for b in blocks])
+    fds = np.concatenate([b[2] for b in blocks])
+
+    idr_offsets = np.zeros(n_seqs+1, dtype=np.int64)
+    np.cumsum(np.concatenate([np.diff(b[1]) for b in blocks]), out=idr_offsets[1:])
+
+    fd_offsets = np.zeros(n_seqs+1, dtype=np.int64)
+    np.cumsum(np.concatenate([np.diff(b[3]) for b in blocks]), out=fd_offsets[1:])
+
+    return (smoothed, idrs, idr_offsets, fds, fd_offsets)
@@ -0,0 +1,408 @@
+"""
+Streaming domain decomposition.
+
+DomainSegmenter runs the same domain decomposition as get_domains_batch()
+on a disorder profile that arrives a chunk at a time (e.g. as the windows
+of a very long sequence are predicted), and hands back each IDR and folded
+domain as soon as its boundaries can no longer change. Only a bounded
+look-back of the profile is kept: the last smoothing window, the positions
+the gap closure scans have not finished with, and the start of the current
+gap (only while it is short enough to be folded into the IDRs around it).
+
+The decomposition runs as a pipeline of stages, each of which only works
+on positions that every earlier stage has finished with:
+
+    1. Savitzky-Golay smoothing. Interior positions need half a window of
+       look-ahead, and the last half window is only smoothed at the end.
+    2. Binarization and the gap closure scans, one per gap size. These are
+       the close_gaps() scans from the Cython code, picked up where they
+       left off.
+    3. Removal of short IDRs, one run of 1s at a time (as remove_short_runs()).
+    4. Folding short gaps into the IDRs around them and merging adjacent
+       IDRs (Part 4 of the decomposition).
+
+Profiles that turn out to be too short for the normal decomposition are
+decomposed in one go by get_domains_batch() when finish() is called.
+"""
+
+import numpy as np
+from scipy.ndimage import convolve1d
+
+from metapredict.backend import domain_definition as _domain_definition
+from metapredict.metapredict_exceptions import DomainError
+
+
+class DomainSegmenter:
+    """
+    Stateful domain decomposition of a disorder profile that is passed in
+    a chunk at a time. The IDRs and folded domains are the same as those
+    get_domains_batch() (and so get_domains()) finds for the full profile.
+
+        segmenter = DomainSegmenter(disorder_threshold=0.5)
+        for chunk in score_chunks:
+            for kind, start, end in segmenter.add(chunk):
+                ...
+        for kind, start, end in segmenter.finish():
+            ...
+
+    Domains are (kind, start, end) tuples, where kind is 'disordered' or
+    'folded' and start and end use Python slice indexing. They are returned
+    in order along the sequence. All the domains found so far are also
+    kept in .disordered_domain_boundaries and .folded_domain_boundaries.
+    """
+
+    def __init__(self,
+                 disorder_threshold=0.5,
+                 minimum_IDR_size=12,
+                 minimum_folded_domain=50,
+                 gap_closure=10,
+                 override_folded_domain_minsize=False):
+        """
+        Parameters
+        -----------
+        disorder_threshold : float
+            Value that defines what 'disordered' is. Note the default here
+            is the threshold for the V3 network.
+            Default = 0.5
+
+        minimum_IDR_size, minimum_folded_domain, gap_closure, override_folded_domain_minsize
+            See get_domains()
+        """
+        for name, value in [('minimum_IDR_size', minimum_IDR_size), ('minimum_folded_domain', minimum_folded_domain), ('gap_closure', gap_closure)]:
+            if not isinstance(value, (int, np.integer)) or value < 0:
+                raise DomainError(f'{name} must be a non-negative integer, got {value}')
+
+        self.disorder_threshold = float(disorder_threshold)
+        self.minimum_IDR_size = int(minimum_IDR_size)
+        self.minimum_folded_domain = int(minimum_folded_domain)
+        self.gap_closure = int(gap_closure)
+        self.override_folded_domain_minsize = override_folded_domain_minsize
+
+        # smoothing window, as in get_domains()
+        polynomial_order = 3
+        window_size = 2*self.minimum_IDR_size
+        if window_size <= polynomial_order:
+            window_size = polynomial_order+2
+
+        # the normal decomposition is only used for profiles longer than the
+        # smoothing window, at least minimum_IDR_size long and long enough
+        # for every gap closure scan, so nothing is done until we know that
+        self.minimum_stream_length = max(window_size+1, self.minimum_IDR_size, 3*self.gap_closure+1)
+
+        if window_size % 2 == 0:
+            window_size = window_size - 1
+        if polynomial_order >= window_size:
+            polynomial_order = window_size - 1
+        self._window = window_size
+        self._half = window_size // 2
+        self._coefficients, self._edge_operator = _domain_definition._savgol_kernels(window_size, polynomial_order)
+
+        # gap lengths and thresholds for folding gaps into IDRs (Part 4)
+        if not override_folded_domain_minsize:
+            folded_domain_min_size_1 = 35
+            folded_domain_min_size_2 = 20
+        else:
+            folded_domain_min_size_1 = self.minimum_folded_domain
+            folded_domain_min_size_2 = self.minimum_folded_domain
+
+        self._rescue_rules = [(self.minimum_folded_domain, self.disorder_threshold*0.75),
+                              (folded_domain_min_size_1, self.disorder_threshold*0.35),
+                              (folded_domain_min_size_2, self.disorder_threshold*0.25)]
+        self._max_rescue_length = max(r[0] for r in self._rescue_rules)
+
+        self.length = 0
+        self.finished = False
+        self.disordered_domain_boundaries = []
+        self.folded_domain_boundaries = []
+
+        # each buffer holds the positions from its base onwards
+        self._started = False
+        self._raw = np.zeros(0, dtype=np.float64)
+        self._raw_base = 0
+        self._smoothed = np.zeros(0, dtype=np.float64)
+        self._smoothed_base = 0
+        self._B = np.zeros(0, dtype=np.int32)
+        self._B_base = 0
+        self._n_smoothed = 0
+
+        # position of the next window for each gap closure scan, and how
+        # many positions every scan has finished with
+        self._scan_positions = [0]*self.gap_closure
+        self._n_final = 0
+
+        # short IDR removal
+        self._run_position = 0
+        self._last_value = 0
+        self._run_start = None
+        self._prev_end = -2
+        self._prev_length = -1
+        self._prev_removed = False
+
+        # gap folding and merging. _gap_head holds the smoothed disorder
+        # for the start of the gap that begins at _gap_start
+        self._gap_start = 0
+        self._gap_head = np.zeros(0, dtype=np.float64)
+        self._idr_start = None
+
+    def add(self, scores):
+        """
+        Adds the next chunk of per-residue disorder scores.
+
+        Parameters
+        -----------
+        scores : array-like
+            Disorder scores for the next residues
+
+        Returns
+        --------
+        list
+            (kind, start, end) tuples for the domains that were finalized
+            by this chunk (often none)
+        """
+        if self.finished:
+            raise DomainError('Cannot add scores to a DomainSegmenter after finish()')
+
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+        self._raw = np.concatenate((self._raw, scores))
+        self.length = self.length + len(scores)
+
+        domains = []
+        if not self._started:
+            if self.length < self.minimum_stream_length:
+                return domains
+            self._started = True
+
+        self._advance(domains, final=False)
+        return domains
+
+    def finish(self):
+        """
+        Marks the end of the profile.
+
+        Returns
+        --------
+        list
+            (kind, start, end) tuples for every domain not returned yet
+        """
+        if self.finished:
+            raise DomainError('DomainSegmenter.finish() was already called')
+        self.finished = True
+
+        if self.length == 0:
+            raise DomainError('No disorder scores were added to the DomainSegmenter')
+
+        domains = []
+
+        # profiles too short to stream are decomposed in one go
+        if not self._started:
+            _, idrs, _, fds, _ = _domain_definition.get_domains_batch(self._raw,
+                                                                      np.array([0, self.length], dtype=np.int64),
+                                                                      disorder_threshold=self.disorder_threshold,
+                                                                      minimum_IDR_size=self.minimum_IDR_size,
+                                                                      minimum_folded_domain=self.minimum_folded_domain,
+                                                                      gap_closure=self.gap_closure,
+                                                                      override_folded_domain_minsize=self.override_folded_domain_minsize)
+            found = [('disordered', int(d[0]), int(d[1])) for d in idrs] + [('folded', int(d[0]), int(d[1])) for d in fds]
+            for kind, start, end in sorted(found, key=lambda d: d[1]):
+                self._emit(kind, start, end, domains)
+            return domains
+
+        self._advance(domains, final=True)
+
+        # the last run of 1s ends at the end of the sequence
+        if self._run_start is not None:
+            self._close_run(self._run_start, self.length, False, domains)
+            self._run_start = None
+
+        # and so does the last gap
+        n = self.length
+        gap_start = self._gap_start
+        if n > gap_start and self._rescue_gap(n - gap_start):
+            if self._idr_start is None:
+                self._idr_start = gap_start
+            self._emit('disordered', self._idr_start, n, domains)
+        else:
+            if self._idr_start is not None:
+                self._emit('disordered', self._idr_start, gap_start, domains)
+            if n > gap_start:
+                self._emit('folded', gap_start, n, domains)
+
+        return domains
+
+    def _emit(self, kind, start, end, domains):
+        domains.append((kind, start, end))
+        if kind == 'disordered':
+            self.disordered_domain_boundaries.append([start, end])
+        else:
+            self.folded_domain_boundaries.append([start, end])
+
+    def _advance(self, domains, final):
+        """
+        Runs every stage of the pipeline as far as it can go.
+        """
+        n = self.length
+        window = self._window
+        half = self._half
+
+        # 1. smoothing. The first half window is a polynomial fit to the
+        # first window of scores and the interior a convolution; the last
+        # half window is only known at the end
+        new_values = []
+        if self._n_smoothed == 0:
+            new_values.append(self._raw[:window] @ self._edge_operator[:half].T)
+            self._n_smoothed = half
+
+        first = self._n_smoothed
+        last = n - half
+        if last > first:
+            raw = self._raw[first - half - self._raw_base:last + half - self._raw_base]
+            new_values.append(convolve1d(raw, self._coefficients, mode='constant')[half:-half])
+            self._n_smoothed = last
+
+        if final:
+            new_values.append(self._raw[n - window - self._raw_base:] @ self._edge_operator[-half:].T)
+            self._n_smoothed = n
+
+        if len(new_values) > 0:
+            smoothed = np.clip(np.concatenate(new_values), a_min=0, a_max=1)
+            self._smoothed = np.concatenate((self._smoothed, smoothed))
+            self._B = np.concatenate((self._B, (smoothed > self.disorder_threshold).astype(np.int32)))
+            self._refresh_gap_head()
+
+        # 2. gap closure. Each scan can look at windows that every scan for a
+        # smaller gap size has finished with
+        limit = self._n_smoothed
+        for g in range(1, self.gap_closure+1):
+            position = _domain_definition.CYTHON_advance_gap_closure(self._B,
+                                                                     g,
+                                                                     self._scan_positions[g-1] - self._B_base,
+                                                                     limit - self._B_base)
+            self._scan_positions[g-1] = position + self._B_base
+
+            if not final:
+                limit = self._scan_positions[g-1]
+
+        self._n_final = limit
+
+        # 3. short IDR removal, one run of 1s at a time
+        values = self._B[self._run_position - self._B_base:self._n_final - self._B_base]
+        if len(values) > 0:
+            changes = np.flatnonzero(np.diff(values, prepend=self._last_value)) + self._run_position
+            for position in changes.tolist():
+                if self._B[position - self._B_base] == 1:
+                    self._run_start = position
+                else:
+                    # followed by a 0, so only at the edge if it starts at 0
+                    self._close_run(self._run_start, position, self._run_start > 0, domains)
+                    self._run_start = None
+
+            self._last_value = values[-1]
+            self._run_position = self._n_final
+
+        # drop everything no stage needs any more
+        keep = self._run_position
+        self._B = self._B[keep - self._B_base:]
+        self._smoothed = self._smoothed[keep - self._smoothed_base:]
+        self._B_base = keep
+        self._smoothed_base = keep
+
+        keep = max(self._raw_base, n - window)
+        self._raw = self._raw[keep - self._raw_base:]
+        self._raw_base = keep
+
+    def _close_run(self, start, end, interior, domains):
+        """
+        Decides whether a run of 1s is removed as too short, exactly as
+        remove_short_runs() in the Cython code, and passes on kept runs.
+        """
+        length = end - start
+        removed = False
+
+        if length <= self.minimum_IDR_size:
+            if not interior or not (self._prev_removed and self._prev_length == length and start - self._prev_end == 1):
+                removed = True
+
+        self._prev_end = end
+        self._prev_length = length
+        self._prev_removed = removed and interior
+
+        if not removed:
+            self._kept_run(start, end, domains)
+
+    def _kept_run(self, start, end, domains):
+        """
+        4. Handles the gap before a run of 1s that was kept: either folds
+        it into the IDRs around it or closes the current IDR and emits the
+        gap as a folded domain.
+        """
+        gap_start = self._gap_start
+        if start > gap_start:
+            if self._rescue_gap(start - gap_start):
+                if self._idr_start is None:
+                    self._idr_start = gap_start
+            else:
+                if self._idr_start is not None:
+                    self._emit('disordered', self._idr_start, gap_start, domains)
+                self._emit('folded', gap_start, start, domains)
+                self._idr_start = start
+
+        elif self._idr_start is None:
+            self._idr_start = start
+
+        # the next gap starts where this run ends
+        self._gap_start = end
+        self._gap_head = np.zeros(0, dtype=np.float64)
+        self._refresh_gap_head()
+
+    def _refresh_gap_head(self):
+        """
+        Extends _gap_head with any newly smoothed values that a gap starting
+        at _gap_start could need.
+        """
+        have = self._gap_start + len(self._gap_head)
+        want = min(self._gap_start + self._max_rescue_length, self._n_smoothed)
+        if want > have:
+            self._gap_head = np.concatenate((self._gap_head, self._smoothed[have - self._smoothed_base:want - self._smoothed_base]))
+
+    def _rescue_gap(self, length):
+        """
+        Whether a gap of this length starting at _gap_start is folded into
+        the IDRs around it.
+        """
+        if length >= self._max_rescue_length:
+            return False
+
+        # summed in order, as in the Cython code, so ties break the same way
+        total = 0.0
+        for value in self._gap_head[:length].tolist():
+            total += value
+        mean = total / length
+
+        for max_length, threshold in self._rescue_rules:
+            if length < max_length and mean > threshold:
+                return True
+        return False
+
+
+def iter_domains(chunks, **kwargs):
+    """
+    Runs a DomainSegmenter over an iterable of disorder score chunks and
+    yields each domain as soon as it is finalized.
+
+    Parameters
+    -----------
+    chunks : iterable
+        Chunks of per-residue disorder scores, in order
+
+    **kwargs
+        Passed to DomainSegmenter()
+
+    Yields
+    --------
+    tuple
+        (kind, start, end) for each domain, in order along the sequence
+    """
+    segmenter = DomainSegmenter(**kwargs)
+    for chunk in chunks:
+        yield from segmenter.add(chunk)
+    yield from segmenter.finish()
@@ -20,6 +20,83 @@ Licensed under the MIT license.
 import numpy as np
 import torch
 
+# ONE HOT encoding per standard amino acid
+ONE_HOT = {'A': 0, 'C': 1, 'D': 2, 'E': 3, 'F': 4, 'G': 5, 'H': 6, 'I': 7, 'K': 8, 'L': 9,
+           'M': 10, 'N': 11, 'P': 12, 'Q': 13, 'R': 14, 'S': 15, 'T': 16, 'V': 17, 'W': 18, 'Y': 19}
+
+# 256-entry byte lookup table that maps an ASCII code to its one-hot index. Lowercase
+# letters map to the same index as their uppercase counterpart (one_hot() has always
+# uppercased the input), and every other byte maps to -1 so invalid residues can be
+# found with a single vectorized comparison.
+_LOOKUP = np.full(256, -1, dtype=np.int8)
+for _aa, _idx in ONE_HOT.items():
+    _LOOKUP[ord(_aa)] = _idx
+    _LOOKUP[ord(_aa.lower())] = _idx
+
+# identity used to expand indices into one-hot vectors with a single gather
+_IDENTITY = np.eye(20, dtype=np.float32)
+
+# index used to pad batches of encoded indices. The networks expand this
+# index to an all-zero input vector (see architectures.py), which matches
+# the zero padding used for one-hot batches.
+PAD_INDEX = 20
+
+
+def _raise_invalid(seq):
+    """
+    Raise the same ValueError that one_hot() has always raised, reporting the first
+    residue in the (uppercased) sequence that is not a standard amino acid. Only
+    called once we already know the sequence is invalid, so a Python loop is fine.
+    """
+    seq = seq.upper()
+    for aa in seq:
+        if aa not in ONE_HOT:
+            raise ValueError('Invalid amino acid detected: ' + aa)
+
+    # should never get here, but just in case
+    raise ValueError('Invalid amino acid detected')
+
+
+def encode_indices(seq):
+    """Convert an amino acid sequence to an array of one-hot indices
+
+    The whole sequence is converted in one go by viewing the string as bytes
+    and indexing into a 256-entry lookup table, so there is no per-residue
+    Python overhead.
+
+    Parameters
+    ----------
+    seq : str
+            A sequence of amino acids (single letter code, any case)
+
+    Returns
+    -------
+    np.ndarray
+            A 1D int8 array where each element is the index (0-19) of the
+            residue in the one-hot encoding
+
+    Raises
+    ------
+    ValueError
+            If the sequence contains a non-canonical amino acid
+    """
+    try:
+        raw = np.frombuffer(seq.encode('ascii'), dtype=np.uint8)
+    except UnicodeEncodeError:
+        # one_hot() has always uppercased first, so give non-ASCII characters
+        # that uppercase to a valid residue the same treatment
+        try:
+            raw = np.frombuffer(seq.upper().encode('ascii'), dtype=np.uint8)
+        except UnicodeEncodeError:
+            _raise_invalid(seq)
+
+    indices = _LOOKUP[raw]
+    if len(indices) > 0 and indices.min() < 0:
+        _raise_invalid(seq)
+
+    return indices
+
+
 def one_hot(seq):
     """Convert an amino acid sequence to a PyTorch tensor of one-hot vectors
 
@@ -39,21 +116,82 @@ def one_hot(seq):
     torch.IntTensor
             a PyTorch tensor representing the encoded sequence
     """
-    # make sequence uppercase
-    seq=seq.upper()
-    
-    # ONE HOT encoding per standard amino acid
-    ONE_HOT = {'A': 0, 'C': 1, 'D': 2, 'E': 3, 'F': 4, 'G': 5, 'H': 6, 'I': 7, 'K': 8, 'L': 9,
-                   'M': 10, 'N': 11, 'P': 12, 'Q': 13, 'R': 14, 'S': 15, 'T': 16, 'V': 17, 'W': 18, 'Y': 19}
-    l = len(seq)
-    m = np.zeros((l, 20))
-
-    # try to encode, if there's an invalid amino acid, raise an exception. 
-    try:
-        for i in range(l):
-            m[i, ONE_HOT[seq[i]]] = 1
-    except:
-        error_str = 'Invalid amino acid detected: ' + seq[i]
-        raise ValueError(error_str)
-    return torch.from_numpy(m)
+    # kept as float64 for backwards compatibility; use one_hot_float32 for predictions
+    return torch.from_numpy(_IDENTITY[encode_indices(seq)].astype(np.float64))
+
+
+def one_hot_float32(seq):
+    """Convert an amino acid sequence to a float32 PyTorch tensor of one-hot vectors
+
+    Same encoding as one_hot(), but built through the byte lookup table and
+    returned directly as float32 (the dtype the networks use) so no
+    intermediate float64 matrix or .float() copy is needed.
+
+    Parameters
+    ----------
+    seq : str
+            A sequence of amino acids (single letter code)
+
+    Returns
+    -------
+    torch.FloatTensor
+            a [len(seq) x 20] float32 tensor representing the encoded sequence
+    """
+    return torch.from_numpy(_IDENTITY[encode_indices(seq)])
+
+
+def one_hot_batch(seqs):
+    """Encode a batch of sequences into a single zero-padded one-hot tensor
+
+    The output tensor is allocated once at its final [batch x max_length x 20]
+    size and each sequence is written into its row, which avoids building a
+    separate tensor per sequence and then copying everything again in
+    torch.nn.utils.rnn.pad_sequence.
+
+    Parameters
+    ----------
+    seqs : list of str
+            Sequences of amino acids (single letter code)
+
+    Returns
+    -------
+    torch.FloatTensor
+            a [len(seqs) x max_length x 20] float32 tensor where positions
+            past the end of a sequence are all zeros (same as pad_sequence
+            with batch_first=True)
+    """
+    max_length = max(len(s) for s in seqs) if len(seqs) > 0 else 0
+    padded = np.zeros((len(seqs), max_length, 20), dtype=np.float32)
+
+    for i, s in enumerate(seqs):
+        padded[i, np.arange(len(s)), encode_indices(s)] = 1
+
+    return torch.from_numpy(padded)
+
+
+def encode_indices_batch(seqs):
+    """Encode a batch of sequences into a single padded tensor of int8 indices
+
+    This is the compact counterpart of one_hot_batch(): each residue takes a
+    single byte rather than 20 float32 values, so moving a batch to the GPU
+    copies 80x less data. The networks expand the indices back into one-hot
+    vectors on the device (see BRNN_MtM.embed_indices).
+
+    Parameters
+    ----------
+    seqs : list of str
+            Sequences of amino acids (single letter code)
+
+    Returns
+    -------
+    torch.Tensor
+            a [len(seqs) x max_length] int8 tensor where positions past the
+            end of a sequence are set to PAD_INDEX
+    """
+    max_length = max(len(s) for s in seqs) if len(seqs) > 0 else 0
+    padded = np.full((len(seqs), max_length), PAD_INDEX, dtype=np.int8)
+
+    for i, s in enumerate(seqs):
+        padded[i, :len(s)] = encode_indices(s)
 
+    return torch.from_numpy(padded)
@@ -10,7 +10,7 @@ import matplotlib
 import matplotlib.pyplot as plt
 
 from metapredict.metapredict_exceptions import MetapredictError
-from metapredict.backend.predictor import predict, predict_pLDDT
+from metapredict.backend.predictor import predict, predict_pLDDT, predict_multi, parse_network_name
 from metapredict.parameters import DEFAULT_NETWORK, DEFAULT_NETWORK_PLDDT
 from metapredict.backend.network_parameters import metapredict_networks
 
@@ -133,8 +133,14 @@ def graph(sequence,
     #set n_res to lenght of seq
     n_res = len(sequence)
 
-    # set yValues equal to the predicted disorder from the sequence (normalized)
-    if disorder_scores == True:
+    # set yValues equal to the predicted disorder from the sequence (normalized).
+    # If we need both disorder and pLDDT scores, get them in one go
+    if pLDDT_scores == True and disorder_scores==True:
+        disorder_name = parse_network_name(f'disorder_{version}')[0]
+        pLDDT_name = parse_network_name(f'pLDDT_{pLDDT_version}')[0]
+        multi_scores = predict_multi(sequence, networks=[disorder_name, pLDDT_name], return_numpy=False)
+        yValues = multi_scores[disorder_name]
+    elif disorder_scores == True:
         yValues = predict(sequence, version=version, return_numpy=False)
         
     # if a name is set, the figure will hold that name as the identifier
@@ -245,7 +251,7 @@ def graph(sequence,
     if pLDDT_scores == True and disorder_scores==True:
 
         # get confidence scores
-        pLDDT_scores = predict_pLDDT(sequence, version=pLDDT_version)
+        pLDDT_scores = multi_scores[pLDDT_name]
         twin1 = axes.twinx()
         af1, = twin1.plot(xValues, pLDDT_scores, color = confidence_line_color, label="Predicted AF2pLDDT")
         twin1.set_ylim(0, 100)
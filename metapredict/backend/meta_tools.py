@@ -8,6 +8,7 @@ import protfasta
 # local imports
 from metapredict.metapredict_exceptions import MetapredictError
 from metapredict.backend.network_parameters import metapredict_networks, pplddt_networks
+from metapredict.backend import quantization as _quantization
 
 
 def valid_range(inval, minval, maxval):
@@ -15,7 +16,7 @@ def valid_range(inval, minval, maxval):
         raise MetapredictError(f'Value {inval:1.3f} is outside of range [{minval:1.3f}, {maxval:1.3f}]')
 
 
-def write_csv(input_dict, output_file):
+def write_csv(input_dict, output_file, append=False):
     """
     Function that writes the scores in an input dictionary out to a standardized CVS file format.
 
@@ -28,6 +29,11 @@ def write_csv(input_dict, output_file):
     output_file : str
         Location and filename for the output file. Assumes .csv is provided.
 
+    append : bool
+        If True, entries are appended to output_file instead of overwriting it. 
+        Used when writing predictions out chunk by chunk.
+        Default = False
+
     Returns
     --------
     None
@@ -36,9 +42,14 @@ def write_csv(input_dict, output_file):
 
     """
 
+    if append:
+        mode = 'a'
+    else:
+        mode = 'w'
+
     # try and open the file and throw exception if anything goes wrong
     try:
-        fh = open(output_file, 'w')
+        fh = open(output_file, mode)
     except Exception:
         raise MetapredictError(f'Unable to write to file destination {output_file:s}')
 
@@ -61,6 +72,227 @@ def write_csv(input_dict, output_file):
     fh.close()
 
 
+def get_output_format(output_format, output_file):
+    """
+    Works out the output file format. If output_format is None the format
+    is inferred from the output_file extension (.parquet or .pq for 
+    Parquet, .mpsa for a score archive, anything else for CSV).
+
+    Parameters
+    -----------
+    output_format : str or None
+        'csv', 'parquet', 'archive' or None
+
+    output_file : str or None
+        Output filename
+
+    Returns
+    --------
+    str
+        'csv', 'parquet' or 'archive'
+    """
+    if output_format is None:
+        extension = ''
+        if output_file is not None:
+            extension = os.path.splitext(str(output_file))[1].lower()
+
+        if extension in ('.parquet', '.pq'):
+            return 'parquet'
+        elif extension == '.mpsa':
+            return 'archive'
+        return 'csv'
+
+    output_format = str(output_format).lower()
+    if output_format not in ('csv', 'parquet', 'archive'):
+        raise MetapredictError(f"output_format must be 'csv', 'parquet' or 'archive', got {output_format}")
+
+    return output_format
+
+
+def _import_pyarrow():
+    """
+    Imports pyarrow, which is an optional dependency only needed for 
+    Parquet output.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise MetapredictError('Writing Parquet files requires pyarrow, which is not installed. Install it with: pip install pyarrow')
+
+    return pyarrow, pyarrow.parquet
+
+
+class ParquetScoreWriter:
+    """
+    Writes per-residue scores to a Parquet file, one row per sequence, 
+    with columns id (string), sequence (string), length (int32), scores 
+    (list<float32>, or list<uint8> / list<uint16> if quantized) and, 
+    optionally, idrs (list<list<int32>> of [start, end) IDR boundaries). 
+    Each call to write() adds one row group, so chunks of predictions can 
+    be streamed to disk as they are made. For quantized scores the scale 
+    factor is stored in the file metadata under 'metapredict_score_scale'.
+
+    Requires pyarrow.
+    """
+
+    def __init__(self, output_file, include_idrs=False, quantize=None, max_value=1.0):
+        """
+        Parameters
+        -----------
+        output_file : str
+            Location and filename for the output file
+
+        include_idrs : bool
+            Whether to add the idrs column
+
+        quantize : str or None
+            If 'uint8' or 'uint16', scores are stored quantized
+
+        max_value : float
+            Largest possible score, used for quantization (1 for disorder,
+            100 for pLDDT)
+        """
+        self.pa, pq = _import_pyarrow()
+
+        score_type = self.pa.float32()
+        metadata = None
+        if quantize is not None:
+            quantize = _quantization.check_quantized_dtype(quantize)
+            score_type = self.pa.from_numpy_dtype(quantize)
+            metadata = {'metapredict_score_scale': str(_quantization.quantization_scale(quantize, max_value))}
+
+        fields = [self.pa.field('id', self.pa.string()),
+                  self.pa.field('sequence', self.pa.string()),
+                  self.pa.field('length', self.pa.int32()),
+                  self.pa.field('scores', self.pa.list_(score_type))]
+        if include_idrs:
+            fields.append(self.pa.field('idrs', self.pa.list_(self.pa.list_(self.pa.int32()))))
+
+        self.schema = self.pa.schema(fields, metadata=metadata)
+        self.include_idrs = include_idrs
+        self.quantize = quantize
+        self.max_value = max_value
+
+        try:
+            self.writer = pq.ParquetWriter(output_file, self.schema)
+        except Exception:
+            raise MetapredictError(f'Unable to write to file destination {output_file}')
+
+    def write(self, sequences, ragged, idrs=None):
+        """
+        Writes one row group.
+
+        Parameters
+        -----------
+        sequences : list
+            Sequences, in the same order as ragged.ids
+
+        ragged : RaggedScores
+            Scores, as returned by predict() with return_format='ragged'.
+            The values are handed to Arrow without copying if they are 
+            already float32.
+
+        idrs : list or None
+            For each sequence, a list of [start, end) IDR boundaries. 
+            Required if the writer was made with include_idrs=True.
+
+        Returns
+        --------
+        None
+        """
+        if len(sequences) == 0:
+            return
+
+        # list<float32> uses int32 offsets
+        if ragged.offsets[-1] > np.iinfo(np.int32).max:
+            raise MetapredictError('Too many residues to write in a single Parquet row group, please set chunk_size')
+
+        values = ragged.values
+        if ragged.scale is not None:
+            values = _quantization.dequantize(values, ragged.scale)
+        if self.quantize is not None:
+            values = _quantization.quantize(values, self.quantize, self.max_value)
+        else:
+            values = np.asarray(values, dtype=np.float32)
+
+        pa = self.pa
+        offsets = pa.array(ragged.offsets.astype(np.int32))
+        scores = pa.ListArray.from_arrays(offsets, pa.array(values))
+
+        columns = [pa.array([str(i) for i in ragged.ids], type=pa.string()),
+                   pa.array(sequences, type=pa.string()),
+                   pa.array(ragged.lengths.astype(np.int32)),
+                   scores]
+        if self.include_idrs:
+            columns.append(pa.array(idrs, type=pa.list_(pa.list_(pa.int32()))))
+
+        self.writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_fasta_chunks(filepath, chunk_size, invalid_sequence_action='convert'):
+    """
+    Generator that reads a FASTA file a chunk at a time, so that only 
+    chunk_size records are held in memory at once. Records are read with
+    protfasta's streaming reader and sanitized as they are read.
+
+    As with protfasta.read_fasta(), a duplicate header raises an exception.
+    To keep memory bounded, headers are only checked against the other
+    headers in the same chunk, so a duplicate that falls in a different
+    chunk is not detected.
+
+    Parameters
+    -----------
+    filepath : str
+        Path to the FASTA file
+
+    chunk_size : int
+        Maximum number of records per chunk
+
+    invalid_sequence_action : str
+        How to deal with sequences that contain non-standard amino acids.
+        Passed to protfasta. Default is 'convert'.
+
+    Yields
+    --------
+    dict
+        Dictionary of header to sequence for the next chunk_size records
+        (fewer for the last chunk), in file order.
+
+    Raises
+    --------
+    MetapredictError
+        If a header is repeated within a chunk.
+    """
+
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise MetapredictError(f'chunk_size must be a positive integer, got {chunk_size}')
+
+    if not hasattr(protfasta, 'read_fasta_stream'):
+        raise MetapredictError('Reading FASTA files in chunks requires a version of protfasta that provides read_fasta_stream(). Please upgrade protfasta.')
+
+    chunk = {}
+    for header, seq in protfasta.read_fasta_stream(filepath, invalid_sequence_action=invalid_sequence_action):
+        if header in chunk:
+            raise MetapredictError(f'Duplicate FASTA header found in {filepath}: {header}')
+        chunk[header] = seq
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = {}
+
+    if len(chunk) > 0:
+        yield chunk
+
+
 def valid_shaded_region(shaded_regions, n_res):
     """
     Function that ensures that the passed shaded region are readable and make sense.
@@ -365,7 +597,58 @@ def valid_version(version_specified, prediction_type):
 
 
 
-def write_caid_format(input_dict, output_path, version):
+def _format_caid_entry(entry_id, sequence, scores, cutoff_value):
+    """
+    Internal function that formats one entry of a CAID file (header line
+    plus one line per residue) as a single string. The binary column is
+    computed with numpy and each line is formatted in one %-format step,
+    so the entry can be written with a single write().
+
+    Parameters
+    ----------
+    entry_id : str
+        Entry ID. A '>' is added if it does not already start with one.
+
+    sequence : str
+        Amino acid sequence
+
+    scores : array-like
+        Per-residue disorder scores
+
+    cutoff_value : float
+        Residues with a score >= cutoff_value are classified as disordered
+
+    Returns
+    -------
+    str
+        The formatted entry
+    """
+    if entry_id[0] != '>':
+        entry_id = '>'+entry_id
+
+    scores = np.asarray(scores)
+    n = len(sequence)
+
+    # compare in the dtype of the scores, as get_binary_prediction() would
+    binary = (scores[:n] >= cutoff_value).astype(np.int64).tolist()
+    values = np.asarray(scores[:n], dtype=np.float64)
+
+    # for scores in [0, 9.999) '%.3f' gives exactly what the original 
+    # formatting (str(round(score, 3)) padded with 0s to 5 characters) did.
+    # Anything else keeps the original formatting so output is unchanged.
+    if n == 0 or (values.min() >= 0 and values.max() < 9.999):
+        score_format = '%.3f'
+        values = values.tolist()
+    else:
+        score_format = '%s'
+        values = [str(round(v, 3)).ljust(5, '0') for v in values.tolist()]
+
+    line_format = f'%d\t%s\t{score_format}\t%d\n'
+    body = ''.join(map(line_format.__mod__, zip(range(1, n+1), sequence, values, binary)))
+    return f'{entry_id}\n{body}'
+
+
+def write_caid_format(input_dict, output_path, version, single_file=False, append=False):
     '''
     Function that takes in a dictionary and outputs a file in the format as 
     specified by IDPcentrail Critical Assessment of Intrinsic protein Disorder
@@ -393,11 +676,22 @@ def write_caid_format(input_dict, output_path, version):
     output_path : str
         the path where to save each generated file. The function will save a file
         for each entry in the input_dict. The file will be saved in the format
-        entry_id.caid
+        entry_id.caid. If single_file is True, this is instead the path of the
+        file to write.
 
     version : str
         The version of the network used to make the predictions. Options are 'v1', 'v2', 'v3'
 
+    single_file : bool
+        If True, all entries are written one after another into a single 
+        multi-entry CAID file at output_path rather than one file per entry.
+        Default = False
+
+    append : bool
+        If True and single_file is True, entries are appended to output_path
+        rather than overwriting it. 
+        Default = False
+
     Returns
     -------
     None
@@ -406,14 +700,8 @@ def write_caid_format(input_dict, output_path, version):
 
     '''
 
-    # first make a list of all of the keys in the dict
-    entry_ids = []
-
-    for entry_id in input_dict.keys():
-        entry_ids.append(entry_id)
-
     # make sure output_path is a dir
-    if os.path.isdir(output_path)==False:
+    if single_file == False and os.path.isdir(output_path)==False:
         raise MetapredictError(f'Please specify output_path as a directory to save generated files. {output_path} is not a valid directory.')
 
     version=valid_version(version, prediction_type='disorder')
@@ -427,36 +715,22 @@ def write_caid_format(input_dict, output_path, version):
     else:
         raise Exception('invalid version detected!')
 
+    # write every entry into one file
+    if single_file:
+        mode = 'a' if append else 'w'
+        try:
+            with open(output_path, mode) as fh:
+                for cur_id, value in input_dict.items():
+                    fh.write(_format_caid_entry(cur_id, value[0], value[1], cutoff_value))
+        except FileNotFoundError:
+            raise MetapredictError(f'Unable to write to file destination {output_path}')
+        return
+
     # now iterate through the dict and write one file per sequence. 
-    for ids in entry_ids:
-        cur_id = ids
-        if cur_id[0] != '>':
-            write_cur_id_header = '>'+cur_id
-        else:
-            write_cur_id_header = cur_id
-        cur_sequence = input_dict[cur_id][0]
-        cur_scores = input_dict[cur_id][1]
-        
-        # open the file to write to
+    for cur_id, value in input_dict.items():
         with open(f'{output_path}/{cur_id}.caid', 'w') as current_output:
+            current_output.write(_format_caid_entry(cur_id, value[0], value[1], cutoff_value))
 
-            # write entry id
-            current_output.write(f'{write_cur_id_header}\n')
-
-            # for each residue write the position, residue, score, and classification
-            for res_and_score_index in range(0, len(cur_sequence)):
-                cur_residue = cur_sequence[res_and_score_index]
-                cur_score = cur_scores[res_and_score_index]
-                cur_binary = get_binary_prediction(cur_score, cutoff_value=cutoff_value)
-                write_score=str(round(float(cur_score),3))
-                if len(write_score) < 5:
-                    for i in range(0, 5-len(write_score)):
-                        write_score=write_score+'0'
-
-                # write as tsv the caid formatted info
-                current_output.write(f'{res_and_score_index+1}\t{cur_residue}\t{write_score}\t{cur_binary}\n')
-        
-        current_output.close()
 
 # check max length
 def exceeds_max_length(data, max_length=65535):
@@ -0,0 +1,516 @@
+"""
+Persistent on-disk cache for disorder and pLDDT predictions.
+
+Predictions are stored in a single SQLite database inside a user-specified
+directory. Each entry is keyed by a digest of the sequence together with a
+tag that identifies the network (prediction type, version and weights file)
+and every setting that changes the returned values (normalization, rounding
+and so on), so changing any of those simply results in cache misses rather
+than stale scores.
+
+The cache is size-bounded: once the stored scores exceed max_size_mb, the
+least recently used entries are evicted.
+
+This module also holds a small in-memory LRU (memory_cache) used to serve
+repeated single-sequence predictions without touching the network at all.
+"""
+
+import os
+import copy
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metapredict.parameters import MEMORY_CACHE_SIZE
+from metapredict.metapredict_exceptions import MetapredictError
+
+
+# name of the database file created inside the cache directory
+CACHE_FILENAME = 'metapredict_cache.sqlite'
+
+
+def sequence_digest(sequence):
+    """
+    Returns the hex SHA-256 digest of an amino acid sequence.
+
+    Parameters
+    -----------
+    sequence : str
+        Amino acid sequence
+
+    Returns
+    --------
+    str
+        Hex digest of the sequence
+    """
+    return hashlib.sha256(sequence.encode('utf-8')).hexdigest()
+
+
+def build_cache_tag(prediction_type, version, weights, **settings):
+    """
+    Builds the part of the cache key that identifies the network and the
+    settings used for a prediction.
+
+    Parameters
+    -----------
+    prediction_type : str
+        'disorder' or 'pLDDT'
+
+    version : str
+        Network version (e.g. 'V3')
+
+    weights : str
+        Filename of the network weights, as listed in network_parameters
+
+    **settings
+        Any keyword settings that change the returned scores. These are
+        sorted by name so the order they are passed in does not matter.
+
+    Returns
+    --------
+    str
+        Tag string used in cache keys
+    """
+    tag = f'{prediction_type}|{version}|{weights}'
+    for name in sorted(settings):
+        tag = tag + f'|{name}={settings[name]}'
+    return tag
+
+
+class PredictionCache:
+    """
+    Size-bounded, persistent key-value store of per-residue prediction
+    scores. Can be passed as the cache argument to the prediction functions
+    (a directory path can also be passed, in which case a PredictionCache
+    is opened for the duration of that call).
+
+    Hit and miss counters are kept for the lifetime of the object and can
+    be read through the hits and misses attributes or the stats() method.
+    """
+
+    def __init__(self, cache_dir, max_size_mb=1024):
+        """
+        Parameters
+        -----------
+        cache_dir : str
+            Directory where the cache database lives. Created if it does
+            not exist.
+
+        max_size_mb : float
+            Maximum total size of the stored scores in megabytes. When this
+            is exceeded the least recently used entries are evicted.
+            Default = 1024.
+        """
+        if max_size_mb <= 0:
+            raise MetapredictError('max_size_mb must be greater than 0')
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError:
+            raise MetapredictError(f'Unable to create cache directory {cache_dir}')
+
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, CACHE_FILENAME)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, dtype TEXT NOT NULL, '
+                           'data BLOB NOT NULL, nbytes INTEGER NOT NULL, last_used INTEGER NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)')
+        self._conn.commit()
+
+        # access counter used for LRU ordering. Starts after the most recent entry
+        # so that recency carries over between sessions.
+        last = self._conn.execute('SELECT MAX(last_used) FROM scores').fetchone()[0]
+        self._clock = 0 if last is None else last
+
+    # ..........................................................................................
+    #
+    def _tick(self):
+        self._clock = self._clock + 1
+        return self._clock
+
+    # ..........................................................................................
+    #
+    @staticmethod
+    def make_key(sequence, tag):
+        """
+        Builds the cache key for a sequence predicted with the network and
+        settings described by tag (see build_cache_tag).
+
+        Parameters
+        -----------
+        sequence : str
+            Amino acid sequence
+
+        tag : str
+            Network/settings tag
+
+        Returns
+        --------
+        str
+            Cache key
+        """
+        return f'{sequence_digest(sequence)}|{tag}'
+
+    # ..........................................................................................
+    #
+    def get_many(self, sequences, tag):
+        """
+        Looks up a collection of sequences.
+
+        Parameters
+        -----------
+        sequences : iterable of str
+            Sequences to look up
+
+        tag : str
+            Network/settings tag (see build_cache_tag)
+
+        Returns
+        --------
+        dict
+            Dictionary mapping each sequence that was found to a numpy
+            array of scores. Sequences not in the cache are not included.
+        """
+        sequences = list(sequences)
+        found = {}
+        used = []
+
+        # query in chunks to stay well under SQLite's limit on bound parameters
+        chunk = 500
+        for i in range(0, len(sequences), chunk):
+            key2seq = {self.make_key(s, tag): s for s in sequences[i:i+chunk]}
+            placeholders = ','.join('?'*len(key2seq))
+            rows = self._conn.execute(f'SELECT key, dtype, data FROM scores WHERE key IN ({placeholders})',
+                                      list(key2seq.keys())).fetchall()
+            for key, dtype, data in rows:
+                found[key2seq[key]] = np.frombuffer(data, dtype=np.dtype(dtype)).copy()
+                used.append((self._tick(), key))
+
+        # update recency of anything we hit
+        if len(used) > 0:
+            self._conn.executemany('UPDATE scores SET last_used=? WHERE key=?', used)
+            self._conn.commit()
+
+        self.hits = self.hits + len(found)
+        self.misses = self.misses + len(sequences) - len(found)
+
+        return found
+
+    # ..........................................................................................
+    #
+    def get(self, sequence, tag):
+        """
+        Looks up a single sequence.
+
+        Parameters
+        -----------
+        sequence : str
+            Sequence to look up
+
+        tag : str
+            Network/settings tag (see build_cache_tag)
+
+        Returns
+        --------
+        np.ndarray or None
+            Array of scores, or None if the sequence is not in the cache
+        """
+        return self.get_many([sequence], tag).get(sequence)
+
+    # ..........................................................................................
+    #
+    def put_many(self, scores, tag):
+        """
+        Stores scores for a collection of sequences and then evicts least
+        recently used entries if the cache is over its size limit.
+
+        Parameters
+        -----------
+        scores : dict
+            Dictionary mapping sequence to a numpy array of scores
+
+        tag : str
+            Network/settings tag (see build_cache_tag)
+
+        Returns
+        --------
+        None
+        """
+        rows = []
+        for s in scores:
+            arr = np.ascontiguousarray(scores[s])
+            rows.append((self.make_key(s, tag), arr.dtype.str, arr.tobytes(), arr.nbytes, self._tick()))
+
+        if len(rows) == 0:
+            return
+
+        self._conn.executemany('INSERT OR REPLACE INTO scores (key, dtype, data, nbytes, last_used) VALUES (?,?,?,?,?)', rows)
+        self._conn.commit()
+        self._evict()
+
+    # ..........................................................................................
+    #
+    def put(self, sequence, values, tag):
+        """
+        Stores scores for a single sequence.
+
+        Parameters
+        -----------
+        sequence : str
+            Amino acid sequence
+
+        values : np.ndarray
+            Scores for the sequence
+
+        tag : str
+            Network/settings tag (see build_cache_tag)
+
+        Returns
+        --------
+        None
+        """
+        self.put_many({sequence: values}, tag)
+
+    # ..........................................................................................
+    #
+    def _evict(self):
+        """
+        Removes least recently used entries until the total size of the
+        stored scores is within max_size_bytes.
+        """
+        total = self.size_bytes()
+        if total <= self.max_size_bytes:
+            return
+
+        to_delete = []
+        for key, nbytes in self._conn.execute('SELECT key, nbytes FROM scores ORDER BY last_used ASC'):
+            if total <= self.max_size_bytes:
+                break
+            to_delete.append((key,))
+            total = total - nbytes
+
+        self._conn.executemany('DELETE FROM scores WHERE key=?', to_delete)
+        self._conn.commit()
+        self.evictions = self.evictions + len(to_delete)
+
+    # ..........................................................................................
+    #
+    def size_bytes(self):
+        """
+        Returns the total size (in bytes) of the scores stored in the cache.
+        """
+        total = self._conn.execute('SELECT SUM(nbytes) FROM scores').fetchone()[0]
+        return 0 if total is None else total
+
+    # ..........................................................................................
+    #
+    def stats(self):
+        """
+        Returns a dictionary with the hit, miss and eviction counters along
+        with the number of entries and total size of the cache.
+        """
+        entries = self._conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'size_bytes': self.size_bytes(),
+                'max_size_bytes': self.max_size_bytes}
+
+    # ..........................................................................................
+    #
+    def clear(self):
+        """
+        Removes every entry from the cache and resets the counters.
+        """
+        self._conn.execute('DELETE FROM scores')
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ..........................................................................................
+    #
+    def close(self):
+        """
+        Closes the underlying database connection.
+        """
+        self._conn.close()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __str__(self):
+        return f'PredictionCache at {self.path} with {len(self)} entries'
+
+    def __repr__(self):
+        return str(self)
+
+
+def open_cache(cache):
+    """
+    Helper used by the prediction functions to accept either a
+    PredictionCache or a directory path.
+
+    Parameters
+    -----------
+    cache : PredictionCache, str or None
+        An existing cache, a directory for a cache, or None
+
+    Returns
+    --------
+    tuple
+        (PredictionCache or None, bool) where the bool is True if the cache
+        was opened here and should be closed by the caller when done.
+    """
+    if cache is None:
+        return None, False
+    elif isinstance(cache, PredictionCache):
+        return cache, False
+    elif isinstance(cache, (str, os.PathLike)):
+        return PredictionCache(cache), True
+    else:
+        raise MetapredictError('cache must be None, a PredictionCache, or a path to a cache directory')
+
+
+# ..........................................................................................
+#
+class MemoryCache:
+    """
+    Bounded in-process LRU cache used for repeated single-sequence
+    predictions. Values are either score arrays or DisorderObjects.
+
+    Score arrays are stored as read-only arrays and a copy is handed back
+    on every hit, so callers can modify what they get back without
+    corrupting the cache. DisorderObjects are copied (along with their
+    scores and domain boundaries) when stored and again on every hit, so
+    repeated calls return equal but independent objects.
+
+    Every method takes an internal lock, so one MemoryCache can be shared
+    between threads.
+    """
+
+    def __init__(self, max_entries=MEMORY_CACHE_SIZE):
+        """
+        Parameters
+        -----------
+        max_entries : int
+            Maximum number of entries to keep. 0 disables the cache.
+        """
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resize(max_entries)
+
+    def enabled(self):
+        """
+        Returns True if the cache can hold any entries.
+        """
+        return self.max_entries > 0
+
+    def resize(self, max_entries):
+        """
+        Sets the maximum number of entries, evicting the least recently
+        used entries if the cache is now over the limit.
+
+        Parameters
+        -----------
+        max_entries : int
+            Maximum number of entries to keep. 0 disables the cache.
+        """
+        if not isinstance(max_entries, int) or max_entries < 0:
+            raise MetapredictError('max_entries must be an int >= 0')
+
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions = self.evictions + 1
+
+    def get(self, key):
+        """
+        Returns a copy of the value stored under key, or None if key is not
+        in the cache.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses = self.misses + 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits = self.hits + 1
+            value = self._entries[key]
+
+        if isinstance(value, np.ndarray):
+            return value.copy()
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        """
+        Stores value under key, evicting the least recently used entry if
+        the cache is full. Does nothing if the cache is disabled.
+        """
+        if self.max_entries == 0:
+            return
+
+        if isinstance(value, np.ndarray):
+            value = value.copy()
+            value.flags.writeable = False
+        else:
+            value = copy.deepcopy(value)
+
+        with self._lock:
+            if self.max_entries == 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions = self.evictions + 1
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Returns a dictionary with the hit, miss and eviction counters along
+        with the current and maximum number of entries.
+        """
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._entries),
+                    'max_entries': self.max_entries}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# the per-process cache used by predict() and predict_pLDDT()
+memory_cache = MemoryCache(MEMORY_CACHE_SIZE)
@@ -12,20 +12,30 @@ import os
 import re
 from packaging import version as packaging_version
 import time
+import atexit
+import multiprocessing
+import queue
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import torch
 from torch.utils.data import DataLoader
 from tqdm import tqdm
 import gc
+import functools
 
 # local imports
 from metapredict.backend.meta_tools import exceeds_max_length
 from metapredict.backend.data_structures import DisorderObject as _DisorderObject
+from metapredict.backend.data_structures import ColumnarScores as _ColumnarScores
+from metapredict.backend.data_structures import RaggedScores as _RaggedScores
 from metapredict.backend import domain_definition as _domain_definition
 from metapredict.backend.network_parameters import metapredict_networks, pplddt_networks
 from metapredict.parameters import DEFAULT_NETWORK, DEFAULT_NETWORK_PLDDT, MAX_CUDA_LENGTH
 from metapredict.backend import encode_sequence
 from metapredict.backend import architectures
+from metapredict.backend import prediction_cache as _prediction_cache
+from metapredict.backend import windowing as _windowing
+from metapredict.backend import quantization as _quantization
 from metapredict.metapredict_exceptions import MetapredictError
 
 # ....................................................................................
@@ -119,6 +129,68 @@ def build_DisorderObject(s,
     return _DisorderObject(s, disorder, IDRs, FDs, return_numpy=return_numpy)
 
 
+# ....................................................................................
+#
+def build_DisorderObjects(pred_dict,
+                          disorder_threshold=0.5,
+                          minimum_IDR_size=12,
+                          minimum_folded_domain=50,
+                          gap_closure=10,
+                          override_folded_domain_minsize=False,
+                          return_numpy=True,
+                          threads=1):
+    """
+    Batched version of build_DisorderObject(). Runs the domain 
+    decomposition for every sequence in one call (see 
+    domain_definition.get_domains_batch()) and builds a DisorderObject 
+    for each sequence.
+
+    Parameters
+    ----------------
+    pred_dict : dict
+        Dictionary mapping each amino acid sequence to its disorder scores
+
+    disorder_threshold, minimum_IDR_size, minimum_folded_domain, gap_closure, override_folded_domain_minsize, return_numpy
+        See build_DisorderObject()
+
+    threads : int
+        Number of threads the decomposition is split across. 
+        Default = 1
+
+    Returns
+    ----------------
+    dict
+        Dictionary mapping each sequence to its DisorderObject
+
+    """
+    seqs = list(pred_dict.keys())
+    if len(seqs) == 0:
+        return {}
+
+    offsets = np.zeros(len(seqs)+1, dtype=np.int64)
+    np.cumsum([len(pred_dict[s]) for s in seqs], out=offsets[1:])
+    values = np.concatenate([np.asarray(pred_dict[s], dtype=np.float64) for s in seqs])
+
+    _, idrs, idr_offsets, fds, fd_offsets = _domain_definition.get_domains_batch(values,
+                                                                                 offsets,
+                                                                                 disorder_threshold=disorder_threshold,
+                                                                                 minimum_IDR_size=minimum_IDR_size,
+                                                                                 minimum_folded_domain=minimum_folded_domain,
+                                                                                 gap_closure=gap_closure,
+                                                                                 override_folded_domain_minsize=override_folded_domain_minsize,
+                                                                                 threads=threads)
+    idrs = idrs.tolist()
+    fds = fds.tolist()
+
+    seq2DisorderObject = {}
+    for i, s in enumerate(seqs):
+        IDRs = idrs[idr_offsets[i]:idr_offsets[i+1]]
+        FDs = fds[fd_offsets[i]:fd_offsets[i+1]]
+        seq2DisorderObject[s] = _DisorderObject(s, pred_dict[s], IDRs, FDs, return_numpy=return_numpy)
+
+    return seq2DisorderObject
+
+
 # ....................................................................................
 #
 def size_filter(inseqs):
@@ -244,6 +316,94 @@ def check_device(use_device, default_device='cuda'):
     # if we made it here, raise error
     raise MetapredictError("There is a problem with the check_device function in metapredict/backend/predictor.py.\nPlease raise an issue because you shouldn't be able to see this message.")
 
+def check_devices(use_device, default_device='cuda'):
+    '''
+    Function that resolves the device argument into a list of devices. 
+    In addition to everything check_device() accepts, use_device can be 
+    a list of devices (e.g. ['cuda:0', 'cuda:1']) or 'cuda:all' for every
+    visible CUDA device. Each device is checked with check_device().
+
+    Parameters
+    ---------------
+    use_device : int, str, list or None
+        Identifier(s) for the device(s) to be used for predictions. 
+
+    default_device : str
+        The default device to use if use_device=None. See check_device().
+
+    Returns
+    ---------------
+    list
+        List of unique device strings, in the order given. 
+    '''
+    if isinstance(use_device, (list, tuple)):
+        if len(use_device) == 0:
+            raise MetapredictError('An empty list of devices was passed.')
+        devices = [check_device(d, default_device=default_device) for d in use_device]
+
+    elif isinstance(use_device, str) and use_device.lower() == 'cuda:all':
+        if torch.cuda.is_available()==False:
+            raise MetapredictError('cuda:all was specified as the device, but torch.cuda.is_available() returned False.')
+        devices = [f'cuda:{i}' for i in range(torch.cuda.device_count())]
+
+    else:
+        devices = [check_device(use_device, default_device=default_device)]
+
+    # remove duplicates while keeping the order
+    return list(dict.fromkeys(devices))
+
+
+
+def set_up_windowing(inputs, devices, window_length, window_overlap, silence_warnings=False):
+    """
+    Works out the window length used to split long sequences for a batch
+    prediction (see backend/windowing.py). On CUDA, sequences longer than 
+    MAX_CUDA_LENGTH are windowed automatically (with a warning) unless the
+    user has set their own window length.
+
+    Parameters
+    ---------------
+    inputs : str, list or dict
+        The sequences being predicted
+
+    devices : list
+        Device strings the prediction will run on
+
+    window_length : int or None
+        Window length requested by the user
+
+    window_overlap : int
+        Minimum overlap between neighbouring windows
+
+    silence_warnings : bool
+        Whether to hide the warning printed when windowing kicks in 
+        automatically
+
+    Returns
+    ---------------
+    int or None
+        Window length to use, or None if sequences are not windowed. Raises
+        a MetapredictError if a sequence is too long to run on a CUDA 
+        device even after windowing.
+    """
+    if window_length is None and isinstance(inputs, str)==False:
+        if any(['cuda' in d for d in devices]):
+            window_length = MAX_CUDA_LENGTH
+            if silence_warnings==False and exceeds_max_length(inputs, max_length=MAX_CUDA_LENGTH):
+                print(f'Warning: sequences longer than {MAX_CUDA_LENGTH} residues are too long to run on CUDA in one go, so they are being predicted in overlapping windows. Windowed scores can differ from a full-length CPU prediction (see window_length).')
+    if window_length is not None:
+        _windowing.check_window_settings(window_length, window_overlap)
+
+    # check if using gpu, specifically cuda. Only an issue if we are not windowing
+    # long sequences into short enough pieces.
+    for device_string in devices:
+        if 'cuda' in device_string:
+            if (window_length is None or window_length > MAX_CUDA_LENGTH) and exceeds_max_length(inputs, max_length=MAX_CUDA_LENGTH):
+                raise MetapredictError(f'One of the input sequences is too long to run on GPU ({device_string}). The max length for a sequence on a CUDA GPU is {MAX_CUDA_LENGTH}.\nPlease use CPU if you want to run sequences longer than 65535 amino acids, or set window_length to at most {MAX_CUDA_LENGTH}.')
+
+    return window_length
+
+
 def take_care_of_version(version_input):
     '''
     Function to take care of the version to use when specifying
@@ -276,6 +436,141 @@ def take_care_of_version(version_input):
     return version_input
 
 
+def _scores_to_list(scores, round_values):
+    '''
+    Converts a 1D array of scores to a list, as returned when
+    return_numpy=False.
+
+    Parameters
+    ---------------
+    scores : np.ndarray
+        1D array of per-residue scores
+
+    round_values : bool
+        Whether the values were rounded to 4 decimal places
+
+    Returns
+    ---------------
+    list
+        The scores as a list of floats
+    '''
+    if round_values==True:
+        # need to round again because the np.round doesn't 
+        # keep the rounded values when we convert to list. 
+        return [round(float(x), 4) for x in scores]
+    else:
+        return scores.tolist()
+
+
+def check_return_format(return_format, ragged_dtype, inputs, return_domains=False):
+    '''
+    Checks the return_format and ragged_dtype options of predict() and
+    predict_pLDDT().
+
+    Parameters
+    ---------------
+    return_format : str or None
+        None for the default return types or 'ragged' for a RaggedScores
+        object
+
+    ragged_dtype : str or np.dtype
+        dtype of the values array if return_format='ragged'. Must be 
+        float32, float16, or one of the quantized dtypes uint8 or uint16.
+
+    inputs : str, list or dict
+        The inputs passed to predict() / predict_pLDDT()
+
+    return_domains : bool
+        Whether DisorderObjects were requested
+
+    Returns
+    ---------------
+    np.dtype or None
+        The dtype to use for the ragged values, or None if 
+        return_format is None
+    '''
+    if return_format is None:
+        return None
+
+    if return_format != 'ragged':
+        raise MetapredictError(f"return_format must be None or 'ragged', got {return_format}")
+
+    if isinstance(inputs, str):
+        raise MetapredictError("return_format='ragged' is only available for lists or dictionaries of sequences")
+
+    if return_domains:
+        raise MetapredictError("return_format='ragged' cannot be combined with return_domains=True")
+
+    try:
+        dtype = np.dtype(ragged_dtype)
+    except TypeError:
+        raise MetapredictError(f'ragged_dtype must be float32, float16, uint8 or uint16, got {ragged_dtype}')
+    if dtype.name not in ('float32', 'float16') + _quantization.QUANTIZED_DTYPES:
+        raise MetapredictError(f'ragged_dtype must be float32, float16, uint8 or uint16, got {ragged_dtype}')
+
+    return dtype
+
+
+def build_ragged_scores(inputs, pred_dict, dtype, max_value=1.0):
+    '''
+    Packs per-sequence predictions into a RaggedScores object once every
+    prediction is done. Entries are removed from pred_dict as they are 
+    copied, but the per-sequence arrays are mostly views into per-batch 
+    output buffers, which are only freed once every sequence in the batch
+    has been copied. Peak memory is therefore the same as for the default
+    return format, plus the packed values array.
+
+    Parameters
+    ---------------
+    inputs : list or dict
+        The inputs passed to predict() / predict_pLDDT(). Sets the order 
+        of the output and the IDs (positions for a list, keys for a dict).
+
+    pred_dict : dict
+        Maps each unique sequence to its scores
+
+    dtype : np.dtype
+        dtype of the values array. uint8 and uint16 values are quantized
+        (see backend/quantization.py).
+
+    max_value : float
+        Largest possible score, used to set the quantization scale. 
+        1 for disorder and 100 for pLDDT (unless returned as decimals).
+
+    Returns
+    ---------------
+    RaggedScores
+    '''
+    if isinstance(inputs, dict):
+        ids = list(inputs.keys())
+        sequences = list(inputs.values())
+    else:
+        ids = list(range(len(inputs)))
+        sequences = inputs
+
+    offsets = np.zeros(len(sequences)+1, dtype=np.int64)
+    np.cumsum(np.fromiter((len(s) for s in sequences), dtype=np.int64, count=len(sequences)), out=offsets[1:])
+
+    # positions of the last occurrence of each sequence, after which its 
+    # scores are no longer needed
+    last_position = {s: i for i, s in enumerate(sequences)}
+
+    scale = None
+    if _quantization.is_quantized_dtype(dtype):
+        scale = _quantization.quantization_scale(dtype, max_value)
+
+    values = np.empty(offsets[-1], dtype=dtype)
+    for i, s in enumerate(sequences):
+        if scale is None:
+            values[offsets[i]:offsets[i+1]] = pred_dict[s]
+        else:
+            values[offsets[i]:offsets[i+1]] = _quantization.quantize(pred_dict[s], dtype, max_value)
+        if last_position[s] == i:
+            del pred_dict[s]
+
+    return _RaggedScores(ids, offsets, values, scale=scale)
+
+
 
 # function to load model
 # A variable to store the loaded model
@@ -312,166 +607,902 @@ def get_model(model_name, params, predictor_path, device):
     loaded_models[model_name] = model
     return model
 
-# ....................................................................................
 
-def predict(inputs,
-            version=DEFAULT_NETWORK,
-            use_device=None,
-            normalized=True,
-            round_values=True,
-            return_numpy=True,
-            return_domains=False,
-            disorder_threshold=None,
-            minimum_IDR_size=12,
-            minimum_folded_domain=50,
-            gap_closure=10,
-            override_folded_domain_minsize=False,
-            use_slow = False,
-            print_performance=False,
-            show_progress_bar = False,
-            force_disable_batch=False,
-            disable_pack_n_pad = False,
-            silence_warnings = False,
-            default_to_device = 'cuda'):
+
+def next_batch_end(sorted_seqs, start, batch_size, max_tokens=None):
     """
-    Batch mode predictor which takes advantage of PyTorch
-    parallelization such that whether it's on a GPU or a 
-    CPU, predictions for a set of sequences are performed
-    rapidly.
+    Works out where the next batch of a length-sorted (longest first) list 
+    of sequences ends.
 
     Parameters
-    ----------
-    inputs : string list or dictionary
-        An individual sequence or a collection of sequences 
-        that are presented either as a list of sequences or 
-        a dictionary of key-value pairs where values are sequences.
+    ---------------
+    sorted_seqs : list
+        Sequences sorted by length, longest first
 
-    version : string
-        The network to use for prediction. Default is DEFAULT_NETWORK,
-        which is defined at the top of /parameters.
-        Options currently include V1, V2, or V3. 
+    start : int
+        Index of the first sequence in the batch
 
-    use_device : int or str 
-        Identifier for the device to be used for predictions. 
-        Possible inputs: 'cpu', 'mps', 'cuda', or an int that corresponds to
-        the index of a specific cuda-enabled GPU. If 'cuda' is specified and
-        cuda.is_available() returns False, instead of falling back to CPU, 
-        metapredict will raise an Exception so you know that you are not
-        using CUDA as you were expecting. 
-        Default: None
-            When set to None, we will check if there is a cuda-enabled
-            GPU. If there is, we will try to use that GPU. 
-            If you set the value to be an int, we will use cuda:int as the device
-            where int is the int you specify. The GPU numbering is 0 indexed, so 0 
-            corresponds to the first GPU and so on. Only specify this if you
-            know which GPU you want to use. 
-            * Note: MPS is only supported in Pytorch 2.1 or later. If I remember
-            right it might have been beta supported in 2.0 *.
+    batch_size : int
+        Number of sequences per batch. Only used if max_tokens is None.
 
-    normalized : bool
-        Whether or not to normalize disorder values to between 0 and 1. 
-        Default : True
-    
-    round_values : bool
-        Whether to round the values to 4 decimal places. 
-        Default : True
+    max_tokens : int or None
+        If set, the batch holds as many sequences as fit into max_tokens 
+        padded residues (i.e. number of sequences x longest sequence). A 
+        batch always holds at least one sequence. 
 
-    return_numpy : bool
-        Whether to return a numpy array or a list for single predictions. 
-        Default : True    
+    Returns
+    ---------------
+    int
+        Index one past the last sequence in the batch
+    """
+    if max_tokens is None:
+        n = batch_size
+    else:
+        n = max(1, max_tokens // len(sorted_seqs[start]))
+    return min(start + n, len(sorted_seqs))
 
-    return_domains : bool
-        Flag which, if set to true, means we return DisorderDomain
-        objects instead of simply the disorder scores. These
-        domain objects include the boundaries between IDRs and 
-        folded domains, the disorder scores, and the individual
-        sequences for IDRs and folded domains. This adds a small
-        amount of overhead to the prediction, but typically only
-        increase prediction time by 10-15%.
-    
-    disorder_threshold : float
-        Used only if return_domains = True.
-        Default is set to None because there are different threshold
-        values depending on the network (V1 = 0.42, V2=0.5). You can
-        override this value. 
 
-    minimum_IDR_size : int
-        Used only if return_domains = True.
+def is_out_of_memory_error(e):
+    """
+    Returns True if an exception raised by torch is an out-of-memory error.
+    torch.cuda.OutOfMemoryError only exists in newer versions of PyTorch
+    (and is a RuntimeError), so we check the message too.
+    """
+    return isinstance(e, RuntimeError) and 'out of memory' in str(e).lower()
 
-        Defines the smallest possible IDR. This is a hard limit - 
-        i.e. we CANNOT get IDRs smaller than this. Default = 12.
 
+def back_off_batch_limit(e, batch, device, batch_size, max_tokens, silence_warnings=False):
+    """
+    Handles an exception raised while running a batch through the network.
+    If the device ran out of memory, halves whichever batch limit is in use
+    (batch_size, or max_tokens if set) so the batch can be retried; any 
+    other error, or running out of memory on a single sequence, is re-raised.
 
-    minimum_folded_domain : int
-        Used only if return_domains = True.
+    Parameters
+    ---------------
+    e : RuntimeError
+        The exception raised by torch
 
-        Defines where we expect the limit of small folded domains 
-        to be. This is NOT a hard limit and functions to modulate
-        the removal of large gaps (i.e. gaps less than this size 
-        are treated less strictly). Note that, in addition, 
-        gaps < 35 are evaluated with a threshold of 
-        0.35*disorder_threshold and gaps < 20 are evaluated with 
-        a threshold of 0.25*disorder_threshold. These two 
-        lengthscales were decided based on the fact that 
-        coiled-coiled regions (which are IDRs in isolation) 
-        often show up with reduced apparent disorder within IDRs, 
-        and but can be as short as 20-30 residues. 
-        The folded_domain_threshold is used based on the 
-        idea that it allows a 'shortest reasonable' folded domain 
-        to be identified. Default=50.
+    batch : list
+        Sequences in the batch that failed
 
-    gap_closure : int
-        Used only if return_domains = True.
+    device : torch.device
+        Device the batch was run on
 
-        Defines the largest gap that would be 'closed'. Gaps here 
-        refer to a scenario in which you have two groups of 
-        disordered residues seprated by a 'gap' of un-disordered 
-        residues. In general large gap sizes will favour larger 
-        contigous IDRs. It's worth noting that gap_closure becomes 
-        relevant only when minimum_region_size becomes very small 
-        (i.e. < 5) because really gaps emerge when the smoothed 
-        disorder fit is "noisy", but when smoothed gaps
-        are increasingly rare. Default=10.
+    batch_size : int
+        Number of sequences per batch, if max_tokens is None
 
-    override_folded_domain_minsize : bool
-        By default this function includes a fail-safe check that
-        assumes folded domains really shouldn't be less than 
-        35 or 20 residues. However, for some approaches we may 
-        wish to over-ride these thresholds to match the passed 
-        minimum_folded_domain value. If this flag is set to 
-        True this override occurs. This is generally not 
-        recommended unless you expect there to be well-defined 
-        sharp boundaries which could define small (20-30) 
-        residue folded domains. This is not provided as an option 
-        in the normal predict_disorder_domains for metapredict. 
-        Default = False. 
+    max_tokens : int or None
+        Padded residues per batch
 
-    use_slow : bool
-        Flag which, if passed, means we force a Python 
-        implementation of our domain decomposition algorithm 
-        instead of the MUCH faster Cython/C implementation. 
-        Useful for debugging. Default = False
-                
-    print_performance : bool
-        Flag which means the function prints the time taken 
-        for the two stages in the prediction algorithm. Again 
-        useful for profiling and debugging. Default = False
+    silence_warnings : bool
+        Whether to hide the message printed when the device runs out of 
+        memory
 
-    show_progress_bar : bool
-        Flag which, if set to True, means a progress bar is printed as 
-        predictions are made, while if False no progress bar is printed.
-        Default  =  True
+    Returns
+    ---------------
+    tuple
+        (batch_size, max_tokens) to use for the retry
+    """
+    # nothing left to shrink, or some other error
+    if not is_out_of_memory_error(e) or len(batch) == 1:
+        raise e
 
-    force_disable_batch : bool
-        Whether to override any use of batch predictions and predict
-        sequences individually.
-        Default = False
+    if max_tokens is None:
+        batch_size = max(1, batch_size//2)
+    else:
+        max_tokens = max_tokens//2
+    if device.type == 'cuda':
+        torch.cuda.empty_cache()
+    if silence_warnings==False:
+        print(f'Ran out of memory on {device} with a batch of {len(batch)} sequences, retrying with smaller batches.')
+    return batch_size, max_tokens
 
-    disable_pack_n_pad : bool
-        Whether to disable the use of pack_n_pad in the prediction
-        algorithm. This is useful for debugging and profiling. Also gives
-        us a way for people to use older versions of torch. 
-        Default = False
+
+def packed_forward(model, batch, device, used_lightning, postprocess=None):
+    """
+    Runs a batch of length-sorted (longest first) sequences through the 
+    network using pack-n-pad. Post-processing runs on the device and only
+    the real (un-padded) residues are copied back, as one flat buffer.
+
+    Parameters
+    ---------------
+    model : BRNN_MtM or BRNN_MtM_lightning
+        The network
+
+    batch : list
+        Sequences, sorted by length with the longest first
+
+    device : torch.device
+        Device the network is on
+
+    used_lightning : bool
+        Whether the network is a BRNN_MtM_lightning network
+
+    postprocess : function or None
+        Applied to the flat output tensor on the device (e.g. clipping and
+        rounding), see packed_forward_flat()
+
+    Returns
+    ---------------
+    tuple
+        (np.ndarray of the scores for every sequence back to back, 
+        np.ndarray of offsets such that the scores for batch[i] are 
+        flat[offsets[i]:offsets[i+1]])
+    """
+    outputs, offsets = packed_forward_networks([(model, used_lightning, postprocess)], batch, device)
+    return outputs[0], offsets
+
+
+def packed_forward_networks(networks, batch, device):
+    """
+    Same as packed_forward() but runs several networks over the batch. The
+    batch is encoded and moved to the device once and shared by all of the
+    networks.
+
+    Parameters
+    ---------------
+    networks : list
+        List of (model, used_lightning, postprocess) tuples, one per 
+        network. See packed_forward() for each of these.
+
+    batch : list
+        Sequences, sorted by length with the longest first
+
+    device : torch.device
+        Device the networks are on
+
+    Returns
+    ---------------
+    tuple
+        (list with one np.ndarray of flat scores per network, np.ndarray
+        of offsets such that the scores for batch[i] are 
+        flat[offsets[i]:offsets[i+1]])
+    """
+    # Encode the batch straight into one tensor padded to the longest sequence in the batch
+    seqs_padded = encode_sequence.encode_indices_batch(batch)
+    lengths = [len(seq) for seq in batch]
+
+    # move the int8 indices to the device and expand them into
+    # the one-hot input there; this copies 80x less data than
+    # moving a float32 one-hot tensor.
+    seqs_padded = seqs_padded.to(device)
+
+    outputs = [packed_forward_flat(model, seqs_padded, lengths, used_lightning, postprocess).cpu().numpy()
+               for model, used_lightning, postprocess in networks]
+    return outputs, length_offsets(lengths)
+
+
+def length_offsets(lengths):
+    """
+    Returns the offsets (n+1 values, starting at 0) of sequences with the
+    given lengths stored back to back in one flat array.
+    """
+    offsets = np.zeros(len(lengths)+1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def postprocess_tensor(outputs, normalized=True, round_values=True, max_value=1, multiplier=1, disorder_range=None):
+    """
+    Post-processing of raw network outputs as a torch tensor, so it can 
+    run on the device before the scores are copied back. Matches the numpy
+    post-processing in predict() and predict_pLDDT().
+
+    Parameters
+    ---------------
+    outputs : torch.Tensor
+        Raw network outputs
+
+    normalized : bool
+        Whether to clip the scores to between 0 and max_value
+
+    round_values : bool
+        Whether to round to 4 decimal places
+
+    max_value : float
+        Upper bound used when normalized is True
+
+    multiplier : float
+        Raw outputs are multiplied by this first (pLDDT networks)
+
+    disorder_range : tuple or None
+        If set, (base, top) pLDDT scores used to convert pLDDT scores into
+        a disorder-like score between 0 and 1
+
+    Returns
+    ---------------
+    torch.Tensor
+        Post-processed scores
+    """
+    if multiplier != 1:
+        outputs = outputs*multiplier
+
+    # convert to disorder score if needed
+    if disorder_range is not None:
+        base, top = disorder_range
+        outputs = outputs-base
+        outputs = outputs*(1/(top-base))
+        outputs = 1-outputs
+
+    if normalized == True:
+        outputs = outputs.clamp(0, max_value)
+    if round_values == True:
+        outputs = torch.round(outputs, decimals=4)
+    return outputs
+
+
+def _output_head(model, outputs, used_lightning):
+    """
+    Applies the layers after the LSTM. These work on each residue
+    independently, so outputs can be padded [batch, length, features] or
+    packed [residues, features].
+    """
+    if used_lightning==False:
+        return model.fc(outputs)
+
+    outputs = model.layer_norm(outputs)
+    for layer in model.linear_layers:
+        outputs = layer(outputs)
+    return outputs
+
+
+def packed_forward_flat(model, seqs_padded, lengths, used_lightning, postprocess=None):
+    """
+    Runs an encoded batch through the network using pack-n-pad and returns
+    the scores without padding: the output layers are applied to the packed
+    LSTM output (so padded positions are never computed) and the packed 
+    residues are reordered into one flat tensor with the sequences back to
+    back, which stays on the device.
+
+    Parameters
+    ---------------
+    model : BRNN_MtM or BRNN_MtM_lightning
+        The network
+
+    seqs_padded : torch.Tensor
+        int8 residue indices from encode_sequence.encode_indices_batch(), 
+        already on the same device as the network
+
+    lengths : list
+        Length of each sequence, longest first
+
+    used_lightning : bool
+        Whether the network is a BRNN_MtM_lightning network
+
+    postprocess : function or None
+        Function applied to the flat tensor on the device, e.g. clipping 
+        and rounding. Must work elementwise.
+
+    Returns
+    ---------------
+    torch.Tensor
+        1D tensor (on the device) with the scores for every sequence back
+        to back
+    """
+    device = seqs_padded.device
+
+    with torch.no_grad():
+        packed_seqs = torch.nn.utils.rnn.pack_padded_sequence(model.embed_indices(seqs_padded), lengths, batch_first=True, enforce_sorted=True)
+        packed_outputs, _ = model.lstm(packed_seqs)
+        outputs = _output_head(model, packed_outputs.data, used_lightning).flatten()
+
+        # packed data is time-major: all sequences' first residue, then all
+        # second residues, and so on. Residue t of sequence i is at 
+        # time_starts[t] + i.
+        batch_sizes = packed_outputs.batch_sizes
+        time_starts = (torch.cumsum(batch_sizes, 0) - batch_sizes).to(device)
+        lengths_tensor = torch.as_tensor(lengths, device=device)
+        seq_index = torch.repeat_interleave(torch.arange(len(lengths), device=device), lengths_tensor)
+        seq_starts = torch.as_tensor(length_offsets(lengths)[:-1], device=device)
+        position = torch.arange(len(seq_index), device=device) - torch.repeat_interleave(seq_starts, lengths_tensor)
+        outputs = outputs[time_starts[position] + seq_index]
+
+        if postprocess is not None:
+            outputs = postprocess(outputs)
+
+    return outputs
+
+
+def encode_pinned(batch):
+    """
+    Encodes a batch (as encode_sequence.encode_indices_batch()) into page-
+    locked (pinned) host memory, so it can be copied to a CUDA device 
+    asynchronously. Run on a background thread while the previous batch
+    is on the GPU.
+    """
+    return encode_sequence.encode_indices_batch(batch).pin_memory()
+
+
+def cuda_forward_async(networks, pinned, lengths, device, copy_stream):
+    """
+    Runs one pinned, encoded batch through one or more networks on a CUDA 
+    device without blocking the host. The input is copied on copy_stream,
+    the forward passes run on the current stream once the copy is done, 
+    and the outputs are copied back into pinned host memory on copy_stream.
+    All of these are queued and the function returns straight away; the 
+    outputs can be read once the returned event has completed.
+
+    Parameters
+    ---------------
+    networks : list
+        List of (model, used_lightning, postprocess) tuples, one per 
+        network, see packed_forward_networks()
+
+    pinned : torch.Tensor
+        Batch from encode_pinned()
+
+    lengths : list
+        Length of each sequence, longest first
+
+    device : torch.device
+        CUDA device the networks are on
+
+    copy_stream : torch.cuda.Stream
+        Stream used for host to device and device to host copies
+
+    Returns
+    ---------------
+    tuple
+        (list with one torch.Tensor of flat, un-padded outputs in pinned 
+        host memory per network, torch.cuda.Event recorded after the 
+        outputs have been copied)
+    """
+    compute_stream = torch.cuda.current_stream(device)
+
+    # host to device
+    with torch.cuda.stream(copy_stream):
+        seqs_padded = pinned.to(device, non_blocking=True)
+    compute_stream.wait_stream(copy_stream)
+    seqs_padded.record_stream(compute_stream)
+
+    host_outputs = []
+    for model, used_lightning, postprocess in networks:
+        outputs = packed_forward_flat(model, seqs_padded, lengths, used_lightning, postprocess)
+
+        # device to host, which can overlap with the next forward pass
+        host = torch.empty(outputs.shape, dtype=outputs.dtype, pin_memory=True)
+        copy_stream.wait_stream(compute_stream)
+        with torch.cuda.stream(copy_stream):
+            host.copy_(outputs, non_blocking=True)
+            outputs.record_stream(copy_stream)
+        host_outputs.append(host)
+
+    with torch.cuda.stream(copy_stream):
+        done = torch.cuda.Event()
+        done.record(copy_stream)
+
+    return host_outputs, done
+
+
+def iter_network_batches(networks, sorted_seqs, device, batch_size, max_tokens=None, silence_warnings=False):
+    """
+    Generator that runs a length-sorted (longest first) list of sequences 
+    through one or more networks with pack-n-pad, one batch at a time. 
+    Each batch is encoded and moved to the device once and shared by all
+    of the networks. Batches are either batch_size sequences or, if 
+    max_tokens is set, as many sequences as fit into max_tokens padded 
+    residues. If the device runs out of memory the limit is halved and the
+    batch is retried.
+
+    On CUDA devices the batches are pipelined: while batch N is on the GPU
+    batch N+1 is encoded into pinned memory on a background thread, inputs
+    and outputs are copied asynchronously on a separate stream, and batch 
+    N-1 is handed back to the caller (for rounding etc.) while batch N 
+    runs. Everywhere else each batch goes through packed_forward_networks().
+
+    Parameters
+    ---------------
+    networks : list
+        List of (model, used_lightning, postprocess) tuples, one per 
+        network. postprocess is applied to the outputs on the device 
+        before they are copied back (e.g. clipping and rounding), see 
+        packed_forward_flat(), and can be None.
+
+    sorted_seqs : list
+        Sequences, sorted by length with the longest first
+
+    device : torch.device
+        Device the networks are on
+
+    batch_size : int
+        Number of sequences per batch, if max_tokens is None
+
+    max_tokens : int or None
+        Padded residues per batch
+
+    silence_warnings : bool
+        Whether to hide the message printed when the device runs out of 
+        memory
+
+    Yields
+    ---------------
+    tuple
+        (batch, list with one np.ndarray per network of the scores for the
+        batch back to back with no padding, np.ndarray of offsets such that
+        the scores for batch[i] are flat[offsets[i]:offsets[i+1]]), in the 
+        same order as sorted_seqs
+    """
+    pipelined = device.type == 'cuda'
+    if pipelined:
+        copy_stream = torch.cuda.Stream(device=device)
+        encoder = ThreadPoolExecutor(max_workers=1)
+
+    # batch that has been queued on the GPU but not yet returned, and the 
+    # batch (start, end) being encoded in the background
+    in_flight = None
+    prefetched = None
+
+    try:
+        batch_start = 0
+        while batch_start < len(sorted_seqs):
+            batch_end = next_batch_end(sorted_seqs, batch_start, batch_size, max_tokens)
+            batch = sorted_seqs[batch_start:batch_end]
+
+            try:
+                if pipelined:
+                    # use the prefetched batch unless the batch size changed after running out of memory
+                    if prefetched is not None and prefetched[0] == (batch_start, batch_end):
+                        pinned = prefetched[1].result()
+                    else:
+                        pinned = encode_pinned(batch)
+                    prefetched = None
+
+                    # start encoding the next batch, assuming this one fits
+                    if batch_end < len(sorted_seqs):
+                        next_end = next_batch_end(sorted_seqs, batch_end, batch_size, max_tokens)
+                        prefetched = ((batch_end, next_end), encoder.submit(encode_pinned, sorted_seqs[batch_end:next_end]))
+
+                    lengths = [len(seq) for seq in batch]
+                    host_outputs, done = cuda_forward_async(networks, pinned, lengths, device, copy_stream)
+                else:
+                    outputs, offsets = packed_forward_networks(networks, batch, device)
+
+            except RuntimeError as e:
+                batch_size, max_tokens = back_off_batch_limit(e, batch, device, batch_size, max_tokens, silence_warnings)
+                continue
+
+            if pipelined:
+                # hand back the previous batch while this one runs
+                if in_flight is not None:
+                    yield _finish_in_flight(in_flight)
+                in_flight = (batch, host_outputs, done, length_offsets(lengths))
+            else:
+                yield batch, outputs, offsets
+
+            batch_start = batch_end
+
+        if in_flight is not None:
+            yield _finish_in_flight(in_flight)
+
+    finally:
+        if pipelined:
+            encoder.shutdown(wait=True)
+
+
+def iter_packed_batches(model, sorted_seqs, device, used_lightning, batch_size, max_tokens=None, silence_warnings=False, postprocess=None):
+    """
+    Same as iter_network_batches() for a single network. Yields (batch, 
+    np.ndarray of the scores for the batch back to back with no padding,
+    np.ndarray of offsets).
+
+    Parameters
+    ---------------
+    model : BRNN_MtM or BRNN_MtM_lightning
+        The network
+
+    used_lightning : bool
+        Whether the network is a BRNN_MtM_lightning network
+
+    postprocess : function or None
+        Applied to the outputs on the device before they are copied back
+        (e.g. clipping and rounding), see packed_forward_flat()
+
+    See iter_network_batches() for the other parameters.
+    """
+    for batch, outputs, offsets in iter_network_batches([(model, used_lightning, postprocess)], sorted_seqs, device, 
+                                                        batch_size, max_tokens, silence_warnings):
+        yield batch, outputs[0], offsets
+
+
+def _finish_in_flight(in_flight):
+    """
+    Waits for a batch queued by cuda_forward_async() and returns 
+    (batch, list of np.ndarrays of flat outputs, offsets). The outputs 
+    are copied out of the pinned buffers into ordinary memory, because 
+    callers keep views into them and page-locked memory should only hold
+    batches that are in flight.
+    """
+    batch, host_outputs, done, offsets = in_flight
+    done.synchronize()
+    return batch, [host.numpy().copy() for host in host_outputs], offsets
+
+
+# ....................................................................................
+# CPU process pool. Pools are expensive to start (each worker has to import torch)
+# so, like the models, the pool is kept around and reused between calls. Only one 
+# pool is kept at a time, since each pool already uses every core; asking for a 
+# different number of workers replaces it.
+process_pool = None
+process_pool_size = 0
+
+
+def _init_worker(num_threads):
+    """
+    Initializer for CPU worker processes. Pins the number of intra-op threads
+    so that workers do not oversubscribe the host.
+    """
+    torch.set_num_threads(num_threads)
+
+
+def _predict_worker(task):
+    """
+    Runs in a worker process. Predicts one chunk of sequences on the CPU and
+    returns a dictionary mapping sequence to scores. The model is loaded 
+    once per worker (through get_model) on the first call.
+
+    Parameters
+    ---------------
+    task : tuple
+        (predict_function_name, sequences, keyword arguments)
+
+    Returns
+    ---------------
+    dict
+        Dictionary mapping sequence to a numpy array of scores
+    """
+    function_name, seqs, kwargs = task
+    if function_name == 'disorder':
+        results = predict(seqs, use_device='cpu', return_numpy=True, return_domains=False, **kwargs)
+    else:
+        results = predict_pLDDT(seqs, use_device='cpu', return_numpy=True, **kwargs)
+    return {s: scores for s, scores in results}
+
+
+def get_process_pool(num_workers):
+    """
+    Returns a (cached) pool of num_workers CPU worker processes. Each worker
+    gets an equal share of the available cores for its torch threads. If a
+    pool with a different number of workers is running it is shut down 
+    first, so the host is never oversubscribed by several pools.
+
+    Parameters
+    ---------------
+    num_workers : int
+        Number of worker processes
+
+    Returns
+    ---------------
+    multiprocessing.pool.Pool
+    """
+    global process_pool, process_pool_size
+    if process_pool is not None and process_pool_size != num_workers:
+        close_process_pool()
+
+    if process_pool is None:
+        num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+
+        # use spawn so workers never inherit torch's threading state from a fork
+        context = multiprocessing.get_context('spawn')
+        process_pool = context.Pool(num_workers, initializer=_init_worker, initargs=(num_threads,))
+        process_pool_size = num_workers
+    return process_pool
+
+
+def close_process_pool():
+    """
+    Shuts down the CPU worker pool started by predict() or predict_pLDDT(),
+    if there is one.
+    """
+    global process_pool, process_pool_size
+    if process_pool is not None:
+        pool = process_pool
+        process_pool = None
+        process_pool_size = 0
+        pool.terminate()
+        pool.join()
+
+atexit.register(close_process_pool)
+
+
+def predict_with_process_pool(function_name, sequence_list, num_workers, batch_size, pbar=None, **kwargs):
+    """
+    Predicts a list of sequences on the CPU across a pool of worker 
+    processes. Sequences are sorted by length and split into chunks of 
+    batch_size (or max_tokens residues, if passed), i.e. exactly the batches 
+    the single-process predictor would build, and chunks are handed out longest first so the workers stay 
+    evenly loaded.
+
+    Parameters
+    ---------------
+    function_name : str
+        'disorder' or 'pLDDT'
+
+    sequence_list : list
+        List of unique sequences
+
+    num_workers : int
+        Number of worker processes
+
+    batch_size : int
+        Number of sequences per chunk
+
+    pbar : tqdm or None
+        Progress bar to update (one tick per sequence). Default = None
+
+    **kwargs
+        Passed on to predict() or predict_pLDDT() in the workers
+
+    Returns
+    ---------------
+    dict
+        Dictionary mapping sequence to a numpy array of scores
+    """
+    sorted_seqs = sorted(sequence_list, key=len, reverse=True)
+    kwargs['num_workers'] = 1
+    kwargs['silence_warnings'] = True
+
+    tasks = []
+    start = 0
+    while start < len(sorted_seqs):
+        end = next_batch_end(sorted_seqs, start, batch_size, kwargs.get('max_tokens'))
+        tasks.append((function_name, sorted_seqs[start:end], kwargs))
+        start = end
+
+    pred_dict = {}
+    pool = get_process_pool(num_workers)
+    for result in pool.imap_unordered(_predict_worker, tasks):
+        pred_dict.update(result)
+        if pbar is not None:
+            pbar.update(len(result))
+
+    return pred_dict
+
+
+def predict_on_devices(function_name, sequence_list, devices, batch_size, pbar=None, **kwargs):
+    """
+    Predicts a list of sequences data-parallel across several devices 
+    (typically multiple GPUs). Sequences are sorted by length and split into 
+    chunks of batch_size (or max_tokens residues, if passed), which go into a shared queue, longest first. One 
+    thread per device takes chunks off the queue until it is empty, so 
+    faster (or less loaded) devices simply end up doing more of the work.
+    Each device uses its own copy of the network (cached in loaded_models 
+    under a device-specific name), and because PyTorch releases the GIL 
+    while running kernels the devices run concurrently.
+
+    Parameters
+    ---------------
+    function_name : str
+        'disorder' or 'pLDDT'
+
+    sequence_list : list
+        List of unique sequences
+
+    devices : list
+        List of device strings
+
+    batch_size : int
+        Number of sequences per chunk
+
+    pbar : tqdm or None
+        Progress bar to update (one tick per sequence). Default = None
+
+    **kwargs
+        Passed on to predict() or predict_pLDDT() for each chunk
+
+    Returns
+    ---------------
+    dict
+        Dictionary mapping sequence to a numpy array of scores
+    """
+    sorted_seqs = sorted(sequence_list, key=len, reverse=True)
+    kwargs['silence_warnings'] = True
+
+    work = queue.Queue()
+    start = 0
+    while start < len(sorted_seqs):
+        end = next_batch_end(sorted_seqs, start, batch_size, kwargs.get('max_tokens'))
+        work.put(sorted_seqs[start:end])
+        start = end
+
+    def device_worker(device_string):
+        local_dict = {}
+        while True:
+            try:
+                seqs = work.get_nowait()
+            except queue.Empty:
+                return local_dict
+
+            if function_name == 'disorder':
+                results = predict(seqs, use_device=device_string, return_numpy=True, return_domains=False, **kwargs)
+            else:
+                results = predict_pLDDT(seqs, use_device=device_string, return_numpy=True, **kwargs)
+
+            for seq, scores in results:
+                local_dict[seq] = scores
+
+            if pbar is not None:
+                pbar.update(len(seqs))
+
+    pred_dict = {}
+    with ThreadPoolExecutor(max_workers=len(devices)) as executor:
+        futures = [executor.submit(device_worker, d) for d in devices]
+        for f in futures:
+            pred_dict.update(f.result())
+
+    return pred_dict
+
+# ....................................................................................
+
+def predict(inputs,
+            version=DEFAULT_NETWORK,
+            use_device=None,
+            normalized=True,
+            round_values=True,
+            return_numpy=True,
+            return_domains=False,
+            disorder_threshold=None,
+            minimum_IDR_size=12,
+            minimum_folded_domain=50,
+            gap_closure=10,
+            override_folded_domain_minsize=False,
+            use_slow = False,
+            print_performance=False,
+            show_progress_bar = False,
+            force_disable_batch=False,
+            disable_pack_n_pad = False,
+            silence_warnings = False,
+            default_to_device = 'cuda',
+            cache = None,
+            num_workers = 1,
+            domain_threads = 1,
+            max_tokens = None,
+            window_length = None,
+            window_overlap = 500,
+            return_format = None,
+            ragged_dtype = 'float32'):
+    """
+    Batch mode predictor which takes advantage of PyTorch
+    parallelization such that whether it's on a GPU or a 
+    CPU, predictions for a set of sequences are performed
+    rapidly.
+
+    Parameters
+    ----------
+    inputs : string list or dictionary
+        An individual sequence or a collection of sequences 
+        that are presented either as a list of sequences or 
+        a dictionary of key-value pairs where values are sequences.
+
+    version : string
+        The network to use for prediction. Default is DEFAULT_NETWORK,
+        which is defined at the top of /parameters.
+        Options currently include V1, V2, or V3. 
+
+    use_device : int, str or list 
+        Identifier for the device to be used for predictions. 
+        Possible inputs: 'cpu', 'mps', 'cuda', or an int that corresponds to
+        the index of a specific cuda-enabled GPU. If 'cuda' is specified and
+        cuda.is_available() returns False, instead of falling back to CPU, 
+        metapredict will raise an Exception so you know that you are not
+        using CUDA as you were expecting. 
+        For batch predictions, a list of devices (e.g. ['cuda:0', 'cuda:1'])
+        or 'cuda:all' (every visible CUDA GPU) can also be passed, in which
+        case batches are split across the devices.
+        Default: None
+            When set to None, we will check if there is a cuda-enabled
+            GPU. If there is, we will try to use that GPU. 
+            If you set the value to be an int, we will use cuda:int as the device
+            where int is the int you specify. The GPU numbering is 0 indexed, so 0 
+            corresponds to the first GPU and so on. Only specify this if you
+            know which GPU you want to use. 
+            * Note: MPS is only supported in Pytorch 2.1 or later. If I remember
+            right it might have been beta supported in 2.0 *.
+
+    normalized : bool
+        Whether or not to normalize disorder values to between 0 and 1. 
+        Default : True
+    
+    round_values : bool
+        Whether to round the values to 4 decimal places. 
+        Default : True
+
+    return_numpy : bool
+        Whether to return a numpy array or a list for single predictions. 
+        Default : True    
+
+    return_domains : bool
+        Flag which, if set to true, means we return DisorderDomain
+        objects instead of simply the disorder scores. These
+        domain objects include the boundaries between IDRs and 
+        folded domains, the disorder scores, and the individual
+        sequences for IDRs and folded domains. This adds a small
+        amount of overhead to the prediction, but typically only
+        increase prediction time by 10-15%.
+    
+    disorder_threshold : float
+        Used only if return_domains = True.
+        Default is set to None because there are different threshold
+        values depending on the network (V1 = 0.42, V2=0.5). You can
+        override this value. 
+
+    minimum_IDR_size : int
+        Used only if return_domains = True.
+
+        Defines the smallest possible IDR. This is a hard limit - 
+        i.e. we CANNOT get IDRs smaller than this. Default = 12.
+
+
+    minimum_folded_domain : int
+        Used only if return_domains = True.
+
+        Defines where we expect the limit of small folded domains 
+        to be. This is NOT a hard limit and functions to modulate
+        the removal of large gaps (i.e. gaps less than this size 
+        are treated less strictly). Note that, in addition, 
+        gaps < 35 are evaluated with a threshold of 
+        0.35*disorder_threshold and gaps < 20 are evaluated with 
+        a threshold of 0.25*disorder_threshold. These two 
+        lengthscales were decided based on the fact that 
+        coiled-coiled regions (which are IDRs in isolation) 
+        often show up with reduced apparent disorder within IDRs, 
+        and but can be as short as 20-30 residues. 
+        The folded_domain_threshold is used based on the 
+        idea that it allows a 'shortest reasonable' folded domain 
+        to be identified. Default=50.
+
+    gap_closure : int
+        Used only if return_domains = True.
+
+        Defines the largest gap that would be 'closed'. Gaps here 
+        refer to a scenario in which you have two groups of 
+        disordered residues seprated by a 'gap' of un-disordered 
+        residues. In general large gap sizes will favour larger 
+        contigous IDRs. It's worth noting that gap_closure becomes 
+        relevant only when minimum_region_size becomes very small 
+        (i.e. < 5) because really gaps emerge when the smoothed 
+        disorder fit is "noisy", but when smoothed gaps
+        are increasingly rare. Default=10.
+
+    override_folded_domain_minsize : bool
+        By default this function includes a fail-safe check that
+        assumes folded domains really shouldn't be less than 
+        35 or 20 residues. However, for some approaches we may 
+        wish to over-ride these thresholds to match the passed 
+        minimum_folded_domain value. If this flag is set to 
+        True this override occurs. This is generally not 
+        recommended unless you expect there to be well-defined 
+        sharp boundaries which could define small (20-30) 
+        residue folded domains. This is not provided as an option 
+        in the normal predict_disorder_domains for metapredict. 
+        Default = False. 
+
+    use_slow : bool
+        Flag which, if passed, means we force a Python 
+        implementation of our domain decomposition algorithm 
+        instead of the MUCH faster Cython/C implementation. 
+        Useful for debugging. Default = False
+                
+    print_performance : bool
+        Flag which means the function prints the time taken 
+        for the two stages in the prediction algorithm. Again 
+        useful for profiling and debugging. Default = False
+
+    show_progress_bar : bool
+        Flag which, if set to True, means a progress bar is printed as 
+        predictions are made, while if False no progress bar is printed.
+        Default  =  True
+
+    force_disable_batch : bool
+        Whether to override any use of batch predictions and predict
+        sequences individually.
+        Default = False
+
+    disable_pack_n_pad : bool
+        Whether to disable the use of pack_n_pad in the prediction
+        algorithm. This is useful for debugging and profiling. Also gives
+        us a way for people to use older versions of torch. 
+        Default = False
 
     silence_warnings : bool
         whether to silence warnings such as the one about compatibility
@@ -485,6 +1516,86 @@ def predict(inputs,
         For example, we could make default device 'gpu' where it will check for 
         cuda or mps and use either if available and then otherwise fall back to CPU.
 
+    cache : PredictionCache or str
+        Optional persistent prediction cache, either a PredictionCache
+        (see backend/prediction_cache.py) or a path to a directory in which
+        one should be created. Sequences already in the cache are not sent
+        to the network, and new predictions are added to the cache. Cached
+        scores are keyed by sequence, network version and the settings that
+        change the returned values. 
+        Default = None (no caching)
+
+    num_workers : int
+        Number of CPU worker processes to split batch predictions across.
+        Sequences are sorted by length and handed out to the workers one
+        batch at a time; each worker loads the network once and uses an
+        equal share of the available cores. Only used for batch predictions
+        on the CPU. The worker pool is kept alive between calls so only the
+        first call pays the start-up cost; calling with a different number
+        of workers replaces it. Workers are started with 'spawn', which
+        re-imports the calling script, so scripts that use num_workers > 1
+        must run their predictions under an if __name__ == '__main__': 
+        guard.
+        Default = 1 (predict in this process)
+
+    domain_threads : int
+        Number of threads used for the domain decomposition when 
+        return_domains=True and many sequences are predicted. The 
+        decomposition runs in Cython with the GIL released, so on 
+        proteome-scale jobs this spreads it across cores. Results are 
+        identical for any number of threads. Ignored if use_slow=True.
+        Default = 1
+
+    max_tokens : int
+        If set, pack-n-pad batches hold as many sequences as fit into 
+        max_tokens padded residues (number of sequences x longest sequence
+        in the batch) instead of a fixed number of sequences. This keeps 
+        batches of long proteins from running out of memory while letting
+        batches of short peptides be much bigger. In either mode, if the 
+        device runs out of memory the limit is halved and the batch is 
+        retried.
+        Default = None (use the batch_size of the network)
+
+    window_length : int
+        If set, any sequence longer than window_length is split into 
+        overlapping windows of this length. The windows are predicted along
+        with the rest of the batch and the scores are stitched back together,
+        crossfading between windows in the overlaps. If None and predicting 
+        on a CUDA device, sequences longer than MAX_CUDA_LENGTH are windowed
+        automatically (with window_length=MAX_CUDA_LENGTH) instead of raising
+        an exception, and a warning is printed. Only used for batch 
+        predictions (lists or dictionaries). Each window only sees part of
+        the sequence, so windowed scores differ from a full-length 
+        prediction: on a 20,000 residue sequence, 10,000 residue windows 
+        gave disorder scores that were off by 0.02 on average and by up to
+        0.26, and 5,000 residue windows by 0.07 on average and by up to 
+        0.74. Windowed scores are never added to the prediction cache.
+        Default = None
+
+    window_overlap : int
+        Minimum number of residues by which neighbouring windows overlap.
+        Default = 500
+
+    return_format : str
+        If set to 'ragged', batch predictions are returned as a single
+        RaggedScores object instead of a list or dictionary: one 
+        contiguous array of scores for every sequence, an int64 offsets 
+        array and a list of IDs (positions in the input list, or the 
+        input dictionary keys). Indexing the object by ID returns a view
+        into the scores array. The scores are packed once every 
+        prediction is done, so this makes the result smaller but does not
+        lower peak memory during the call. Not available for single 
+        sequences or with return_domains=True. 
+        Default = None
+
+    ragged_dtype : str
+        dtype of the scores array when return_format='ragged'. Either 
+        'float32' or 'float16', or 'uint8' or 'uint16' to store quantized
+        scores (see metapredict/backend/quantization.py for the scale 
+        factors). For quantized scores, result.scale is the score per 
+        integer step and result.get(id) returns decoded float32 scores.
+        Default = 'float32'
+
     Returns
     -------------
     DisorderDomain object str dict or list
@@ -550,161 +1661,120 @@ def predict(inputs,
     # get params
     params=net['parameters']
 
-    ##
-    ## FIGURE OUT WHERE WE ARE DOING THE PREDICTIONS
-    ##
-    ## ....................................................................................    
-
-    # if a single sequence, just use cpu. Using GPU for a single sequence would be silly.
-    if isinstance(inputs, str)==True:
-        device_string='cpu'
-    else:
-        device_string = check_device(use_device, default_device=default_to_device)
-
-    # check if using gpu, specifically cuda
-    if 'cuda' in device_string:
-        if exceeds_max_length(inputs, max_length=MAX_CUDA_LENGTH):
-            raise MetapredictError(f'One of the input sequences is too long to run on GPU. The max length for a sequence on a CUDA GPU is {MAX_CUDA_LENGTH}.\nPlease use CPU if you want to run sequences longer than 65535 amino acids.')
+    if not isinstance(num_workers, int) or num_workers < 1:
+        raise MetapredictError(f'num_workers must be a positive integer, got {num_workers}')
 
-    # set device
-    device=torch.device(device_string)
+    if not isinstance(domain_threads, int) or domain_threads < 1:
+        raise MetapredictError(f'domain_threads must be a positive integer, got {domain_threads}')
 
-    # see if we need to mess with packing / padding
-    if disable_pack_n_pad==False:
-        if packaging_version.parse(torch.__version__) < packaging_version.parse("1.11.0"):
-            disable_pack_n_pad=True
-            # only warn if user hasn't turned off warning. 
-            if silence_warnings==False:
-                print('Pytorch version is <= 1.11.0. Disabling pack-n-pad functionality. This might slow down predictions.')
+    if max_tokens is not None and (not isinstance(max_tokens, int) or max_tokens < 1):
+        raise MetapredictError(f'max_tokens must be None or a positive integer, got {max_tokens}')
 
-    ##
-    ## LOAD IN THE NETWORK
-    ##
-    ## ....................................................................................    
+    ragged_dtype = check_return_format(return_format, ragged_dtype, inputs, return_domains=return_domains)
 
-    # load model
-    model = get_model(model_name=f'disorder_{version}', 
-                        params=params, 
-                        predictor_path=predictor_path, 
-                        device=device)
+    # the cache tag identifies the network and every setting that changes 
+    # the returned values.
+    cache_tag = _prediction_cache.build_cache_tag('disorder', version, net['weights'],
+                                                  normalized=normalized, round_values=round_values)
 
-    # set to eval mode
-    model.eval()
-
-    # make sure network is on correct device. 
-    model.to(device)
-        
-    ##
-    ## START PREDICTIONS
-    ##
-    ## .................................................................................... 
-
-    # now we can start up the predictions. 
-    # if a single prediction, we can just ignore the batch stuff. 
-    if isinstance(inputs, str)==True:
-        # if we want to print the performance, start tracking time per prediction. 
-        if print_performance:
-            start_time = time.time()        
-        
-        # encode the sequence
-        seq_vector = encode_sequence.one_hot(inputs)    
-        seq_vector = seq_vector.to(device)
-        seq_vector = seq_vector.view(1, len(seq_vector), -1)
+    # repeated single sequences are served from the in-memory LRU without
+    # loading the network at all. DisorderObjects are cached separately 
+    # because they also depend on the domain decomposition settings.
+    memory_cache = _prediction_cache.memory_cache
+    use_memory_cache = isinstance(inputs, str) and memory_cache.enabled()
+    if use_memory_cache:
+        if return_domains:
+            domains_key = (inputs, cache_tag, 'domains', disorder_threshold, minimum_IDR_size,
+                           minimum_folded_domain, gap_closure, use_slow, return_numpy)
+            DO = memory_cache.get(domains_key)
+            if DO is not None:
+                return DO
+        else:
+            outputs = memory_cache.get((inputs, cache_tag))
+            if outputs is not None:
+                if return_numpy==False:
+                    outputs = _scores_to_list(outputs, round_values)
+                return outputs
 
-        # get output values from the seq_vector based on the network (brnn_network)
-        with torch.no_grad():
-            outputs = model(seq_vector.float()).detach().cpu().numpy()[0]
-
-        # Take care of rounding and normalization
-        if normalized == True and round_values==True:
-            outputs=np.round(np.clip(outputs, a_min=0, a_max=1),4)
-        elif normalized==True and round_values==False:
-            outputs=np.clip(outputs, a_min=0, a_max=1)
-        elif normalized==False and round_values==True:
-            outputs=np.round(outputs, 4)
-        # if both ==False, we don't need to do anything. 
-        
-        # make list if user wants a list instead of a np.array
-        if return_numpy==False:
-            if round_values==True:
-                # need to round again because the np.round doesn't 
-                # keep the rounded values when we convert to list. 
-                outputs = [round(float(x), 4) for x in outputs.flatten()]
-            else:
-                # otherwise just return the flattened array as a list. 
-                outputs=outputs.flatten().tolist()
+    # open the prediction cache if one was requested.
+    cache, close_cache = _prediction_cache.open_cache(cache)
+    try:
+        ##
+        ## FIGURE OUT WHERE WE ARE DOING THE PREDICTIONS
+        ##
+        ## ....................................................................................    
 
+        # if a single sequence, just use cpu. Using GPU for a single sequence would be silly.
+        if isinstance(inputs, str)==True:
+            devices=['cpu']
         else:
-            # if we want a numpy array, we need to make sure it's a 1D array
-            outputs=outputs.flatten()
+            devices = check_devices(use_device, default_device=default_to_device)
 
-        # print performance
-        if print_performance:
-            end_time = time.time()
-            print(f"Time taken for prediction on {device}: {end_time - start_time} seconds") 
+        # on CUDA, sequences that are too long are split into overlapping windows
+        # automatically unless the user has set their own window length.
+        window_length = set_up_windowing(inputs, devices, window_length, window_overlap, silence_warnings)
 
+        # set device. If we have more than one device, this is the one used for 
+        # anything that is not split across devices.
+        device_string = devices[0]
+        device=torch.device(device_string)
 
-        # see if need to build disorder_domsins
-        if return_domains:
-            outputs= build_DisorderObject(inputs, outputs, 
-                                            disorder_threshold=disorder_threshold,
-                                            minimum_IDR_size=minimum_IDR_size, 
-                                            minimum_folded_domain=minimum_folded_domain,
-                                            gap_closure=gap_closure,use_slow=use_slow,
-                                            return_numpy=return_numpy)
-        # return the output
-        return outputs
+        # see if we need to mess with packing / padding
+        if disable_pack_n_pad==False:
+            if packaging_version.parse(torch.__version__) < packaging_version.parse("1.11.0"):
+                disable_pack_n_pad=True
+                # only warn if user hasn't turned off warning. 
+                if silence_warnings==False:
+                    print('Pytorch version is <= 1.11.0. Disabling pack-n-pad functionality. This might slow down predictions.')
 
-    else:
-        # otherwise we need to do batch predictions. 
-        ## Prepare data by generate a list (sequence_list)
-        ## which contains non-redundant sequences 
-        ##   
-        if isinstance(inputs, dict):
-            mode = 'dictionary'
-            seq2id = {}
-            for k in inputs:
-                s = inputs[k]
-                if s not in seq2id:
-                    seq2id[s] = [k]
-                else:
-                    seq2id[s].append(k)
-            sequence_list = list(seq2id.keys())
-        elif isinstance(inputs, list):
-            mode = 'list'
-            sequence_list = list(set(inputs))
-        else:
-            raise Exception('Invalid data type passed - expect a single sequence or a list or dictionary of sequences')
+        ##
+        ## LOAD IN THE NETWORK
+        ##
+        ## ....................................................................................    
 
-        # if we want to print the performance, start tracking time per prediction. 
-        if print_performance:
-            start_time = time.time()   
+        # load model
+        # models are cached per device so that several devices can be used at once
+        model = get_model(model_name=f'disorder_{version}_{device_string}', 
+                            params=params, 
+                            predictor_path=predictor_path, 
+                            device=device)
 
-        # initialize the return dictionary that maps sequence to
-        # disorder profile
-        pred_dict = {}
+        # set to eval mode
+        model.eval()
 
-        # check if we are disabling batch predictions. If we are, we need to
-        # do all predictions individually
-        if force_disable_batch==True:
-            tot_num_seqs=len(sequence_list)
-            # see if a progress bar is wanted
-            if show_progress_bar:
-                pbar = tqdm(total=len(sequence_list))
-                # set pbar update amount
-                pbar_update_amount=int(0.1*tot_num_seqs)
-                if pbar_update_amount==0:
-                    pbar_update_amount=1
-            # iterate through sequence list
-            for cur_seq_num, seq in enumerate(sequence_list):
-                # encode the sequence
-                seq_vector = encode_sequence.one_hot(seq)
+        # make sure network is on correct device. 
+        model.to(device)
+        
+        ##
+        ## START PREDICTIONS
+        ##
+        ## .................................................................................... 
+
+        # now we can start up the predictions. 
+        # if a single prediction, we can just ignore the batch stuff. 
+        if isinstance(inputs, str)==True:
+            # if we want to print the performance, start tracking time per prediction. 
+            if print_performance:
+                start_time = time.time()        
+        
+            # check the caches before running the network. If we are here with
+            # the memory cache on, we missed on the DisorderObject but may still
+            # have the scores.
+            outputs = None
+            if use_memory_cache and return_domains:
+                outputs = memory_cache.get((inputs, cache_tag))
+
+            if outputs is None and cache is not None:
+                outputs = cache.get(inputs, cache_tag)
+
+            if outputs is None:
+                # encode the sequence as int8 residue indices
+                seq_vector = encode_sequence.encode_indices_batch([inputs])
                 seq_vector = seq_vector.to(device)
-                seq_vector = seq_vector.view(1, len(seq_vector), -1)
 
                 # get output values from the seq_vector based on the network (brnn_network)
                 with torch.no_grad():
-                    outputs = model(seq_vector.float()).detach().cpu().numpy()[0].flatten()
+                    outputs = model.forward_indices(seq_vector).detach().cpu().numpy()[0]
 
                 # Take care of rounding and normalization
                 if normalized == True and round_values==True:
@@ -714,224 +1784,343 @@ def predict(inputs,
                 elif normalized==False and round_values==True:
                     outputs=np.round(outputs, 4)
                 # if both ==False, we don't need to do anything. 
-                
-                # make list if user wants a list instead of a np.array
-                if return_numpy==False:
-                    if round_values==True:
-                        # need to round again because the np.round doesn't 
-                        # keep the rounded values when we convert to list. 
-                        outputs = [round(float(x), 4) for x in outputs.flatten()]
-                    else:
-                        # otherwise just return the flattened array as a list. 
-                        outputs=outputs.flatten().tolist()
 
-                # add to dict
-                pred_dict[seq]=outputs
-                # update progress bar
-                if show_progress_bar:
-                    if cur_seq_num % (pbar_update_amount)==0:
-                        pbar.update(pbar_update_amount)
-
-        else:         
-            # if we are disabling pack-n-pad functionalitity...
-            if disable_pack_n_pad==True:
-                # build a dictionary where keys are sequence length
-                # and values is a list of sequences of that exact length
-                size_filtered =  size_filter(sequence_list)
-                
-                # set progress bar info
-                if show_progress_bar:
-                    pbar = tqdm(total=len(size_filtered))
-
-                # iterate through local size
-                for local_size in size_filtered:
-                    local_seqs = size_filtered[local_size]
-                    # load the data
-                    seq_loader = DataLoader(local_seqs, batch_size=params['batch_size'], shuffle=False)
-
-                    # iterate through batches in seq_loader
-                    for batch in seq_loader:
-                        # Pad the sequence vector to have the same length as the longest sequence in the batch
-                        seqs_padded = torch.nn.utils.rnn.pad_sequence([encode_sequence.one_hot(seq).float() for seq in batch], batch_first=True)
-                        seqs_padded = seqs_padded.to(device)
-
-                        # Forward pass, then send to CPU for numpy rounding / normalization
-                        with torch.no_grad():
-                            outputs = model.forward(seqs_padded).detach().cpu().numpy()
-                        
-                        # Save predictions
-                        for j, seq in enumerate(batch):
-                            if normalized==True and round_values==True:
-                                prediction=np.squeeze(np.round(np.clip(outputs[j][0:len(seq)], a_min=0, a_max=1),4))
-                            elif normalized==True and round_values==False:
-                                prediction=np.squeeze(np.clip(outputs[j][0:len(seq)], a_min=0, a_max=1))
-                            elif normalized==False and round_values==True:
-                                prediction=np.squeeze(np.round(outputs[j][0:len(seq)]))
-                            else:
-                                prediction=np.squeeze(outputs[j][0:len(seq)])
-
-                            # make list if user wants a list instead of a np.array
-                            if return_numpy==False:
-                                if round_values==True:
-                                    # need to round again because the np.round doesn't 
-                                    # keep the rounded values when we convert to list. 
-                                    prediction = [round(float(x), 4) for x in prediction.flatten()]
-                                else:
-                                    # otherwise just return the flattened array as a list. 
-                                    prediction=prediction.flatten().tolist()
+                # we need to make sure it's a 1D array
+                outputs=outputs.flatten()
 
-                            # see if we need to make prediction a list
-                            pred_dict[seq] = prediction
-                    
-                    # update the progress bar
-                    if show_progress_bar:
-                        pbar.update(1)
-            else:
-                # sort the seqs by length, makes pack-n-pad stuff more efficient
-                sequence_list.sort(key=len, reverse=True)
-                # we will be using pack-n-pad.
-                # load seqs into DataLoader
-                seq_loader = DataLoader(sequence_list, batch_size=params['batch_size'], shuffle=False) 
-                num_batches=len(seq_loader)
-                
-                # set progress bar info if we are going to display it. 
-                # have to do this differently because you can't iterate over DataLoader
-                # and get tqdm to update. 
-                if show_progress_bar:
-                    pbar = tqdm(total=num_batches)
+                if cache is not None:
+                    cache.put(inputs, outputs, cache_tag)
 
-                # iterate through each batch
-                for batch in seq_loader:
-                    # Pad the sequence vector to have the same length as the longest sequence in the batch
-                    seqs_padded = torch.nn.utils.rnn.pad_sequence([encode_sequence.one_hot(seq).float() for seq in batch], batch_first=True)
-                    lengths = [len(seq) for seq in batch]
+            if use_memory_cache:
+                memory_cache.put((inputs, cache_tag), outputs)
 
-                    # pack padded sequences
-                    packed_seqs = torch.nn.utils.rnn.pack_padded_sequence(seqs_padded, lengths, batch_first=True, enforce_sorted=True)
-                    
-                    # move packed seqs to device. 
-                    packed_seqs = packed_seqs.to(device)
+            # make list if user wants a list instead of a np.array
+            if return_numpy==False:
+                outputs = _scores_to_list(outputs, round_values)
+
+            # print performance
+            if print_performance:
+                end_time = time.time()
+                print(f"Time taken for prediction on {device}: {end_time - start_time} seconds") 
 
-                    # lstm forward pass.
-                    with torch.no_grad():
-                        outputs, _ = model.lstm(packed_seqs)
 
-                    # unpack the packed sequence
-                    outputs, _ = torch.nn.utils.rnn.pad_packed_sequence(outputs, batch_first=True)
+            # see if need to build disorder_domsins
+            if return_domains:
+                outputs= build_DisorderObject(inputs, outputs, 
+                                                disorder_threshold=disorder_threshold,
+                                                minimum_IDR_size=minimum_IDR_size, 
+                                                minimum_folded_domain=minimum_folded_domain,
+                                                gap_closure=gap_closure,use_slow=use_slow,
+                                                return_numpy=return_numpy)
+                if use_memory_cache:
+                    memory_cache.put(domains_key, outputs)
 
-                    # get final outputs by calling fc.
-                    if params['used_lightning']==False:
-                        outputs = model.fc(outputs)
+            # return the output
+            return outputs
+
+        else:
+            # otherwise we need to do batch predictions. 
+            ## Prepare data by generate a list (sequence_list)
+            ## which contains non-redundant sequences 
+            ##   
+            if isinstance(inputs, dict):
+                mode = 'dictionary'
+                seq2id = {}
+                for k in inputs:
+                    s = inputs[k]
+                    if s not in seq2id:
+                        seq2id[s] = [k]
                     else:
-                        outputs = model.layer_norm(outputs)
-                        for layer in model.linear_layers:
-                            outputs = layer(outputs)
-                    
-                    # move to cpu
-                    outputs = outputs.detach().cpu().numpy()
+                        seq2id[s].append(k)
+                sequence_list = list(seq2id.keys())
+            elif isinstance(inputs, list):
+                mode = 'list'
+                sequence_list = list(set(inputs))
+            else:
+                raise Exception('Invalid data type passed - expect a single sequence or a list or dictionary of sequences')
+
+            # if we want to print the performance, start tracking time per prediction. 
+            if print_performance:
+                start_time = time.time()   
+
+            # initialize the return dictionary that maps sequence to
+            # disorder profile
+            pred_dict = {}
+
+            # if we have a cache, pull out everything already predicted so that
+            # only the cache misses are sent to the network
+            if cache is not None:
+                pred_dict = cache.get_many(sequence_list, cache_tag)
+                sequence_list = [s for s in sequence_list if s not in pred_dict]
+                cache_misses = sequence_list
+
+            # split any sequences that are too long into overlapping windows. 
+            # The windows are predicted like any other sequence and stitched 
+            # back together once all predictions are done
+            long_seqs = {}
+            if window_length is not None:
+                requested = set(sequence_list) | set(pred_dict.keys())
+                sequence_list, long_seqs = _windowing.split_long_sequences(sequence_list, window_length, window_overlap)
+                window_only = [s for s in sequence_list if s not in requested]
+
+            # if we have more than one device, split the batches across the devices
+            if len(devices) > 1 and len(sequence_list) > 0:
+                pbar = None
+                if show_progress_bar:
+                    pbar = tqdm(total=len(sequence_list))
+
+                pred_dict.update(predict_on_devices('disorder', sequence_list, devices, params['batch_size'], pbar=pbar,
+                                                    version=version, normalized=normalized, round_values=round_values,
+                                                    force_disable_batch=force_disable_batch,
+                                                    disable_pack_n_pad=disable_pack_n_pad,
+                                                    max_tokens=max_tokens))
+
+            # if we have been asked for more than one CPU worker, split the batches
+            # across a pool of worker processes
+            elif num_workers > 1 and device.type == 'cpu' and len(sequence_list) > 0:
+                pbar = None
+                if show_progress_bar:
+                    pbar = tqdm(total=len(sequence_list))
+
+                pred_dict.update(predict_with_process_pool('disorder', sequence_list, num_workers, params['batch_size'], pbar=pbar,
+                                                           version=version, normalized=normalized, round_values=round_values,
+                                                           force_disable_batch=force_disable_batch,
+                                                           disable_pack_n_pad=disable_pack_n_pad,
+                                                           max_tokens=max_tokens))
+
+            # check if we are disabling batch predictions. If we are, we need to
+            # do all predictions individually
+            elif force_disable_batch==True:
+                tot_num_seqs=len(sequence_list)
+                # see if a progress bar is wanted
+                if show_progress_bar:
+                    pbar = tqdm(total=len(sequence_list))
+                    # set pbar update amount
+                    pbar_update_amount=int(0.1*tot_num_seqs)
+                    if pbar_update_amount==0:
+                        pbar_update_amount=1
+                # iterate through sequence list
+                for cur_seq_num, seq in enumerate(sequence_list):
+                    # encode the sequence as int8 residue indices
+                    seq_vector = encode_sequence.encode_indices_batch([seq])
+                    seq_vector = seq_vector.to(device)
+
+                    # get output values from the seq_vector based on the network (brnn_network)
+                    with torch.no_grad():
+                        outputs = model.forward_indices(seq_vector).detach().cpu().numpy()[0].flatten()
 
-                    # clean up / normalize
+                    # Take care of rounding and normalization
                     if normalized == True and round_values==True:
                         outputs=np.round(np.clip(outputs, a_min=0, a_max=1),4)
                     elif normalized==True and round_values==False:
                         outputs=np.clip(outputs, a_min=0, a_max=1)
                     elif normalized==False and round_values==True:
-                        outputs=np.round(outputs, 4)                
-                    
-                    # get individual seqs ignoring padded parts. 
-                    for seq_num, length in enumerate(lengths):
-                        curoutput=outputs[seq_num][0:length].flatten()
-                        seq = batch[seq_num]
-                    
-                        # make list if user wants a list instead of a np.array
-                        if return_numpy==False:
-                            if round_values==True:
-                                # need to round again because the np.round doesn't 
-                                # keep the rounded values when we convert to list. 
-                                curoutput = [round(float(x), 4) for x in curoutput.flatten()]
-                            else:
-                                # otherwise just return the flattened array as a list. 
-                                curoutput=curoutput.flatten().tolist()
-
-                        # add to dict
-                        pred_dict[seq]=curoutput
+                        outputs=np.round(outputs, 4)
+                    # if both ==False, we don't need to do anything. 
+                
 
+                    # add to dict
+                    pred_dict[seq]=outputs
                     # update progress bar
                     if show_progress_bar:
-                        pbar.update(1)
+                        if cur_seq_num % (pbar_update_amount)==0:
+                            pbar.update(pbar_update_amount)
+
+            else:         
+                # if we are disabling pack-n-pad functionalitity...
+                if disable_pack_n_pad==True:
+                    # build a dictionary where keys are sequence length
+                    # and values is a list of sequences of that exact length
+                    size_filtered =  size_filter(sequence_list)
+                
+                    # set progress bar info
+                    if show_progress_bar:
+                        pbar = tqdm(total=len(size_filtered))
+
+                    # iterate through local size
+                    for local_size in size_filtered:
+                        local_seqs = size_filtered[local_size]
+                        # load the data
+                        seq_loader = DataLoader(local_seqs, batch_size=params['batch_size'], shuffle=False)
+
+                        # iterate through batches in seq_loader
+                        for batch in seq_loader:
+                            # Encode the batch straight into one tensor padded to the longest sequence in the batch
+                            seqs_padded = encode_sequence.encode_indices_batch(batch)
+                            seqs_padded = seqs_padded.to(device)
+
+                            # Forward pass, then send to CPU for numpy rounding / normalization
+                            with torch.no_grad():
+                                outputs = model.forward_indices(seqs_padded).detach().cpu().numpy()
+                        
+                            # Save predictions
+                            for j, seq in enumerate(batch):
+                                if normalized==True and round_values==True:
+                                    prediction=np.round(np.clip(outputs[j][0:len(seq)], a_min=0, a_max=1),4).flatten()
+                                elif normalized==True and round_values==False:
+                                    prediction=np.clip(outputs[j][0:len(seq)], a_min=0, a_max=1).flatten()
+                                elif normalized==False and round_values==True:
+                                    prediction=np.round(outputs[j][0:len(seq)]).flatten()
+                                else:
+                                    prediction=outputs[j][0:len(seq)].flatten()
 
-        # close pbar
-        if show_progress_bar:
-            pbar.close()
 
-        # if printing performance
-        if print_performance:
-            end_time = time.time()
-            print(f"\nTime taken for predictions on {device}: {end_time - start_time} seconds") 
-        
+                                pred_dict[seq] = prediction
+                    
+                        # update the progress bar
+                        if show_progress_bar:
+                            pbar.update(1)
+                else:
+                    # sort the seqs by length, makes pack-n-pad stuff more efficient
+                    sequence_list.sort(key=len, reverse=True)
+
+                    # we will be using pack-n-pad. Batches are either a fixed number of 
+                    # sequences (batch_size) or, if max_tokens is set, as many sequences as
+                    # fit into max_tokens padded residues. If the device runs out of memory 
+                    # the limit is halved and the batch is retried.
+                    batch_size = params['batch_size']
+                    token_budget = max_tokens
+
+                    # set progress bar info if we are going to display it. 
+                    # Counts sequences because the number of batches is not known
+                    # up front when batching by tokens.
+                    if show_progress_bar:
+                        pbar = tqdm(total=len(sequence_list))
 
-        ##
-        ## PREDICTION DONE
-        ##
-        ## ....................................................................................
+                    # iterate through each batch (pipelined on CUDA, see iter_packed_batches)
+                    # Normalization and rounding run on the device, and only the
+                    # real residues come back, as one flat array per batch
+                    postprocess = functools.partial(postprocess_tensor, normalized=normalized, round_values=round_values)
 
-        # if we've requested IDR domains
-        if return_domains:
+                    for batch, outputs, offsets in iter_packed_batches(model, sequence_list, device, params['used_lightning'],
+                                                                       batch_size, token_budget, silence_warnings, postprocess):
 
-            # we're going to first build a dictionary to map sequence to DisorderObject - this ensures
-            # we only build one DO per sequence, even if we have multiple repetitve sequences
-            seq2DisorderObject = {}
-
-            # for each sequence in the prediction dictionary. Note this loop may take a second...
-            start_time = time.time()
-            for s in pred_dict:
-                seq2DisorderObject[s] = build_DisorderObject(s,
-                                                             pred_dict[s],
-                                                             disorder_threshold=disorder_threshold,
-                                                             minimum_IDR_size=minimum_IDR_size, 
-                                                             minimum_folded_domain=minimum_folded_domain,
-                                                             gap_closure=gap_closure,
-                                                             use_slow=use_slow, return_numpy=return_numpy)
-
-            end_time = time.time()
-            if print_performance:
-                print(f"Time taken for domain decomposition: {end_time - start_time} seconds")
+                        # each sequence's scores are a view into the batch's flat array
+                        for seq_num, seq in enumerate(batch):
+                            pred_dict[seq]=outputs[offsets[seq_num]:offsets[seq_num+1]]
 
-            # finally, if we passed in a dictionary then return a dictionary with the same
-            # ID mapping (even if two IDs map to the same sequence)
-            if mode == 'dictionary':
-                return_dict = {}
-                for s in seq2id:
-                    # for each ID associated with that sequence, assign the disorder object
-                    for seq_id in seq2id[s]:
-                        return_dict[seq_id] = seq2DisorderObject[s]
-                return return_dict
+                        # update progress bar
+                        if show_progress_bar:
+                            pbar.update(len(batch))
 
-            # and if we passed a list return a list in the same order it came in, even if
-            # there are duplicates
-            elif mode == 'list':
-                return_list = []
-                for s in inputs:
-                    return_list.append(seq2DisorderObject[s])
-                return return_list
-            else:
-                raise Exception('How did we get here? What did we do wrong? Is this the darkest timeline? Probably')
+            # close pbar
+            if show_progress_bar:
+                pbar.close()
+
+            # stitch the windows for any long sequences back together, and then
+            # drop windows that were not also sequences we were asked to predict
+            if len(long_seqs) > 0:
+                for s in long_seqs:
+                    starts = long_seqs[s]
+                    stitched = _windowing.stitch_windows(len(s), starts, [pred_dict[s[i:i+window_length]] for i in starts])
+                    if round_values==True:
+                        stitched = np.round(stitched, 4)
+                    pred_dict[s] = stitched
+
+                for s in window_only:
+                    del pred_dict[s]
+
+            # add the new predictions to the cache. Windowed sequences are left
+            # out, because their scores depend on the window settings and would
+            # otherwise be served in place of a full-length prediction later
+            if cache is not None:
+                cache.put_many({s: pred_dict[s] for s in cache_misses if s not in long_seqs}, cache_tag)
+
+            # pack everything into one ragged array if requested
+            if return_format == 'ragged':
+                ragged = build_ragged_scores(inputs, pred_dict, ragged_dtype)
+                if print_performance:
+                    end_time = time.time()
+                    print(f"\nTime taken for predictions on {device}: {end_time - start_time} seconds") 
+                return ragged
+
+            # make lists if user wants lists instead of np.arrays
+            if return_numpy==False:
+                for s in pred_dict:
+                    pred_dict[s] = _scores_to_list(pred_dict[s], round_values)
+
+            # if printing performance
+            if print_performance:
+                end_time = time.time()
+                print(f"\nTime taken for predictions on {device}: {end_time - start_time} seconds") 
+        
 
-        # just return scores with no domains
-        else:
-            if mode == 'dictionary':
-                return_dict = {}
-                for s in seq2id:
-                    for seq_id in seq2id[s]:
-                        return_dict[seq_id] = [s, pred_dict[s]]                
-                return return_dict
-            elif mode == 'list':
-                return_list = []
-                for s in inputs:
-                    return_list.append([s, pred_dict[s]])
-                return return_list
+            ##
+            ## PREDICTION DONE
+            ##
+            ## ....................................................................................
+
+            # if we've requested IDR domains
+            if return_domains:
+
+                # we're going to first build a dictionary to map sequence to DisorderObject - this ensures
+                # we only build one DO per sequence, even if we have multiple repetitve sequences
+                seq2DisorderObject = {}
+
+                # for each sequence in the prediction dictionary
+                start_time = time.time()
+                if use_slow:
+                    for s in pred_dict:
+                        seq2DisorderObject[s] = build_DisorderObject(s,
+                                                                     pred_dict[s],
+                                                                     disorder_threshold=disorder_threshold,
+                                                                     minimum_IDR_size=minimum_IDR_size, 
+                                                                     minimum_folded_domain=minimum_folded_domain,
+                                                                     gap_closure=gap_closure,
+                                                                     use_slow=use_slow, return_numpy=return_numpy)
+                else:
+                    # decompose every sequence in one batched call
+                    seq2DisorderObject = build_DisorderObjects(pred_dict,
+                                                               disorder_threshold=disorder_threshold,
+                                                               minimum_IDR_size=minimum_IDR_size, 
+                                                               minimum_folded_domain=minimum_folded_domain,
+                                                               gap_closure=gap_closure,
+                                                               return_numpy=return_numpy,
+                                                               threads=domain_threads)
+
+                end_time = time.time()
+                if print_performance:
+                    print(f"Time taken for domain decomposition: {end_time - start_time} seconds")
+
+                # finally, if we passed in a dictionary then return a dictionary with the same
+                # ID mapping (even if two IDs map to the same sequence)
+                if mode == 'dictionary':
+                    return_dict = {}
+                    for s in seq2id:
+                        # for each ID associated with that sequence, assign the disorder object
+                        for seq_id in seq2id[s]:
+                            return_dict[seq_id] = seq2DisorderObject[s]
+                    return return_dict
+
+                # and if we passed a list return a list in the same order it came in, even if
+                # there are duplicates
+                elif mode == 'list':
+                    return_list = []
+                    for s in inputs:
+                        return_list.append(seq2DisorderObject[s])
+                    return return_list
+                else:
+                    raise Exception('How did we get here? What did we do wrong? Is this the darkest timeline? Probably')
+
+            # just return scores with no domains
             else:
-                raise Exception('How did we get here? What did we do wrong? Is this the darkest timeline? Definitely')
+                if mode == 'dictionary':
+                    return_dict = {}
+                    for s in seq2id:
+                        for seq_id in seq2id[s]:
+                            return_dict[seq_id] = [s, pred_dict[s]]                
+                    return return_dict
+                elif mode == 'list':
+                    return_list = []
+                    for s in inputs:
+                        return_list.append([s, pred_dict[s]])
+                    return return_list
+                else:
+                    raise Exception('How did we get here? What did we do wrong? Is this the darkest timeline? Definitely')
+    finally:
+        # close the cache if we opened it, even if the prediction failed
+        if close_cache:
+            cache.close()
 
 
 
@@ -952,7 +2141,14 @@ def predict_pLDDT(inputs,
             return_as_disorder_score=False,
             plddt_base=0.35,
             plddt_top=0.95,
-            default_to_device = 'cuda'):
+            default_to_device = 'cuda',
+            cache = None,
+            num_workers = 1,
+            max_tokens = None,
+            window_length = None,
+            window_overlap = 500,
+            return_format = None,
+            ragged_dtype = 'float32'):
     """
     Batch mode predictor which takes advantage of PyTorch
     parallelization such that whether it's on a GPU or a 
@@ -979,13 +2175,16 @@ def predict_pLDDT(inputs,
         scores representative of actual pLDDT scores. 
         Default is False. 
 
-    use_device : int or str 
+    use_device : int, str or list 
         Identifier for the device to be used for predictions. 
         Possible inputs: 'cpu', 'mps', 'cuda', or an int that corresponds to
         the index of a specific cuda-enabled GPU. If 'cuda' is specified and
         cuda.is_available() returns False, instead of falling back to CPU, 
         metapredict will raise an Exception so you know that you are not
         using CUDA as you were expecting. 
+        For batch predictions, a list of devices (e.g. ['cuda:0', 'cuda:1'])
+        or 'cuda:all' (every visible CUDA GPU) can also be passed, in which
+        case batches are split across the devices.
         Default: None
             When set to None, we will check if there is a cuda-enabled
             GPU. If there is, we will try to use that GPU. 
@@ -1054,6 +2253,78 @@ def predict_pLDDT(inputs,
         For example, we could make default device 'gpu' where it will check for 
         cuda or mps and use either if available and then otherwise fall back to CPU.
 
+    cache : PredictionCache or str
+        Optional persistent prediction cache, either a PredictionCache
+        (see backend/prediction_cache.py) or a path to a directory in which
+        one should be created. Sequences already in the cache are not sent
+        to the network, and new predictions are added to the cache. Cached
+        scores are keyed by sequence, network version and the settings that
+        change the returned values. 
+        Default = None (no caching)
+
+    num_workers : int
+        Number of CPU worker processes to split batch predictions across.
+        Sequences are sorted by length and handed out to the workers one
+        batch at a time; each worker loads the network once and uses an
+        equal share of the available cores. Only used for batch predictions
+        on the CPU. The worker pool is kept alive between calls so only the
+        first call pays the start-up cost; calling with a different number
+        of workers replaces it. Workers are started with 'spawn', which
+        re-imports the calling script, so scripts that use num_workers > 1
+        must run their predictions under an if __name__ == '__main__': 
+        guard.
+        Default = 1 (predict in this process)
+
+    max_tokens : int
+        If set, pack-n-pad batches hold as many sequences as fit into 
+        max_tokens padded residues (number of sequences x longest sequence
+        in the batch) instead of a fixed number of sequences. This keeps 
+        batches of long proteins from running out of memory while letting
+        batches of short peptides be much bigger. In either mode, if the 
+        device runs out of memory the limit is halved and the batch is 
+        retried.
+        Default = None (use the batch_size of the network)
+
+    window_length : int
+        If set, any sequence longer than window_length is split into 
+        overlapping windows of this length. The windows are predicted along
+        with the rest of the batch and the scores are stitched back together,
+        crossfading between windows in the overlaps. If None and predicting 
+        on a CUDA device, sequences longer than MAX_CUDA_LENGTH are windowed
+        automatically (with window_length=MAX_CUDA_LENGTH) instead of raising
+        an exception, and a warning is printed. Only used for batch 
+        predictions (lists or dictionaries). Each window only sees part of
+        the sequence, so windowed scores differ from a full-length 
+        prediction: on a 20,000 residue sequence, 10,000 residue windows 
+        gave disorder scores that were off by 0.02 on average and by up to
+        0.26, and 5,000 residue windows by 0.07 on average and by up to 
+        0.74. Windowed scores are never added to the prediction cache.
+        Default = None
+
+    window_overlap : int
+        Minimum number of residues by which neighbouring windows overlap.
+        Default = 500
+
+    return_format : str
+        If set to 'ragged', batch predictions are returned as a single
+        RaggedScores object instead of a list or dictionary: one 
+        contiguous array of scores for every sequence, an int64 offsets 
+        array and a list of IDs (positions in the input list, or the 
+        input dictionary keys). Indexing the object by ID returns a view
+        into the scores array. The scores are packed once every 
+        prediction is done, so this makes the result smaller but does not
+        lower peak memory during the call. Not available for single 
+        sequences or with return_domains=True. 
+        Default = None
+
+    ragged_dtype : str
+        dtype of the scores array when return_format='ragged'. Either 
+        'float32' or 'float16', or 'uint8' or 'uint16' to store quantized
+        scores (see metapredict/backend/quantization.py for the scale 
+        factors). For quantized scores, result.scale is the score per 
+        integer step and result.get(id) returns decoded float32 scores.
+        Default = 'float32'
+
     Returns
     -------------
     dict or list
@@ -1097,178 +2368,131 @@ def predict_pLDDT(inputs,
 
     # load and setup the network (same code as used by the non-batch version)
     PATH = os.path.dirname(os.path.realpath(__file__))
-    predictor_path = f"{PATH}/ppLDDT/networks/{net['weights']}"
-    # get params
-    params=net['parameters']
-
-    # make sure that we set return_decimals to True if we are doing disorder prediction using plddt scores
-    if return_as_disorder_score==True:
-        return_decimals=True
-
-    # see if we are return pLDDT values or raw decimal values.
-    if return_decimals==True:
-        if version=='V1':
-            multiplier=0.01
-        else:
-            multiplier=1
-        max_val_clipped=1
-    else:
-        if version=='V1':
-            multiplier=1
-        else:
-            multiplier=100
-        max_val_clipped=100       
-
-    ##
-    ## FIGURE OUT WHERE WE ARE DOING THE PREDICTIONS
-    ##
-    ## ....................................................................................    
-
-    # if a single sequence, just use cpu. Using GPU for a single sequence would be silly.
-    if isinstance(inputs, str)==True:
-        device_string='cpu'
-    else:
-        device_string = check_device(use_device, default_device=default_to_device)
-    
-    # set device
-    device=torch.device(device_string)
-
-    # see if we need to mess with packing / padding
-    if disable_pack_n_pad==False:
-        if packaging_version.parse(torch.__version__) < packaging_version.parse("1.11.0"):
-            disable_pack_n_pad=True
-            # only warn if user hasn't turned off warning. 
-            if silence_warnings==False:
-                print('Pytorch version is <= 1.11.0. Disabling pack-n-pad functionality. This might slow down predictions.')
+    predictor_path = f"{PATH}/ppLDDT/networks/{net['weights']}"
+    # get params
+    params=net['parameters']
 
+    if not isinstance(num_workers, int) or num_workers < 1:
+        raise MetapredictError(f'num_workers must be a positive integer, got {num_workers}')
 
-    ##
-    ## LOAD IN THE NETWORK
-    ##
-    ## ....................................................................................    
+    if max_tokens is not None and (not isinstance(max_tokens, int) or max_tokens < 1):
+        raise MetapredictError(f'max_tokens must be None or a positive integer, got {max_tokens}')
 
-    # load network. We do this differently depending on if we used
-    # pytorch or pytorch-lightning to make the network. 
-    model = get_model(model_name=f'pLDDT_{version}', 
-                    params=params, 
-                    predictor_path=predictor_path, 
-                    device=device)
+    ragged_dtype = check_return_format(return_format, ragged_dtype, inputs)
 
-    # set to eval mode
-    model.eval()
+    # make sure that we set return_decimals to True if we are doing disorder prediction using plddt scores
+    if return_as_disorder_score==True:
+        return_decimals=True
 
-    # make sure network is on correct device. 
-    model.to(device)
-        
-    ##
-    ## START PREDICTIONS
-    ##
-    ## .................................................................................... 
+    # the cache tag identifies the network and every setting that changes 
+    # the returned values.
+    cache_tag = _prediction_cache.build_cache_tag('pLDDT', version, net['weights'],
+                                                  normalized=normalized, round_values=round_values,
+                                                  return_decimals=return_decimals,
+                                                  return_as_disorder_score=return_as_disorder_score,
+                                                  plddt_base=plddt_base, plddt_top=plddt_top)
+
+    # repeated single sequences are served from the in-memory LRU without
+    # loading the network at all.
+    memory_cache = _prediction_cache.memory_cache
+    use_memory_cache = isinstance(inputs, str) and memory_cache.enabled()
+    if use_memory_cache:
+        outputs = memory_cache.get((inputs, cache_tag))
+        if outputs is not None:
+            if return_numpy==False:
+                outputs = _scores_to_list(outputs, round_values)
+            return outputs
+
+    # open the prediction cache if one was requested.
+    cache, close_cache = _prediction_cache.open_cache(cache)
+    try:
+        # see if we are return pLDDT values or raw decimal values.
+        if return_decimals==True:
+            if version=='V1':
+                multiplier=0.01
+            else:
+                multiplier=1
+            max_val_clipped=1
+        else:
+            if version=='V1':
+                multiplier=1
+            else:
+                multiplier=100
+            max_val_clipped=100       
 
-    # now we can start up the predictions. 
-    # if a single prediction, we can just ignore the batch stuff. 
-    if isinstance(inputs, str)==True:
-        # if we want to print the performance, start tracking time per prediction. 
-        if print_performance:
-            start_time = time.time()        
-        
-        # encode the sequence
-        seq_vector = encode_sequence.one_hot(inputs)
-        seq_vector = seq_vector.to(device)
-        seq_vector = seq_vector.view(1, len(seq_vector), -1)
+        ##
+        ## FIGURE OUT WHERE WE ARE DOING THE PREDICTIONS
+        ##
+        ## ....................................................................................    
 
-        # get output values from the seq_vector based on the network (brnn_network)
-        with torch.no_grad():
-            outputs = model(seq_vector.float()).detach().cpu().numpy()[0]*multiplier
-
-        # convert to disorder score if needed. 
-        if return_as_disorder_score==True:
-            # this normalizes so the pLDDT score ends up being renormalized
-            # to be between 0 and 1, converted into an effective disorder score
-            outputs = outputs-plddt_base
-            outputs = outputs*(1/(plddt_top-plddt_base))
-            # means value of 1 = disordered and 0 is disordered
-            outputs = 1-outputs 
-
-        # Take care of rounding and normalization
-        if normalized == True and round_values==True:
-            outputs=np.round(np.clip(outputs, a_min=0, a_max=max_val_clipped),4)
-        elif normalized==True and round_values==False:
-            outputs=np.clip(outputs, a_min=0, a_max=max_val_clipped)
-        elif normalized==False and round_values==True:
-            outputs=np.round(outputs, 4)
-
-        # make list if user wants a list instead of a np.array
-        if return_numpy==False:
-            if round_values==True:
-                # need to round again because the np.round doesn't 
-                # keep the rounded values when we convert to list. 
-                outputs = [round(float(x), 4) for x in outputs.flatten()]
-            else:
-                # otherwise just return the flattened array as a list. 
-                outputs=outputs.flatten().tolist()
+        # if a single sequence, just use cpu. Using GPU for a single sequence would be silly.
+        if isinstance(inputs, str)==True:
+            devices=['cpu']
         else:
-            # if we want a numpy array, we need to make sure it's a 1D array
-            outputs=outputs.flatten()
+            devices = check_devices(use_device, default_device=default_to_device)
 
-        # print performance
-        if print_performance:
-            end_time = time.time()
-            print(f"Time taken for prediction on {device}: {end_time - start_time} seconds") 
+        # on CUDA, sequences that are too long are split into overlapping windows
+        # automatically unless the user has set their own window length.
+        window_length = set_up_windowing(inputs, devices, window_length, window_overlap, silence_warnings)
+    
+        # set device. If we have more than one device, this is the one used for 
+        # anything that is not split across devices.
+        device_string = devices[0]
+        device=torch.device(device_string)
 
-        # return the output
-        return outputs
+        # see if we need to mess with packing / padding
+        if disable_pack_n_pad==False:
+            if packaging_version.parse(torch.__version__) < packaging_version.parse("1.11.0"):
+                disable_pack_n_pad=True
+                # only warn if user hasn't turned off warning. 
+                if silence_warnings==False:
+                    print('Pytorch version is <= 1.11.0. Disabling pack-n-pad functionality. This might slow down predictions.')
 
-    else:
-        # otherwise we need to do batch predictions. 
-        ## Prepare data by generate a list (sequence_list)
-        ## which contains non-redundant sequences 
-        ##   
-        if isinstance(inputs, dict):
-            mode = 'dictionary'
-            seq2id = {}
-            for k in inputs:
-                s = inputs[k]
-                if s not in seq2id:
-                    seq2id[s] = [k]
-                else:
-                    seq2id[s].append(k)
-            sequence_list = list(seq2id.keys())
-        elif isinstance(inputs, list):
-            mode = 'list'
-            sequence_list = list(set(inputs))
-        else:
-            raise Exception('Invalid data type passed - expect a single sequence or a list or dictionary of sequences')
 
-        # if we want to print the performance, start tracking time per prediction. 
-        if print_performance:
-            start_time = time.time()   
+        ##
+        ## LOAD IN THE NETWORK
+        ##
+        ## ....................................................................................    
+
+        # load network. We do this differently depending on if we used
+        # pytorch or pytorch-lightning to make the network. 
+        # models are cached per device so that several devices can be used at once
+        model = get_model(model_name=f'pLDDT_{version}_{device_string}', 
+                        params=params, 
+                        predictor_path=predictor_path, 
+                        device=device)
 
-        # initialize the return dictionary that maps sequence to
-        # disorder profile
-        pred_dict = {}
+        # set to eval mode
+        model.eval()
 
-        # check if we are disabling batch predictions. If we are, we need to
-        # do all predictions individually
-        if force_disable_batch==True:
-            tot_num_seqs=len(sequence_list)
-            # see if a progress bar is wanted
-            if show_progress_bar:
-                pbar = tqdm(total=len(sequence_list))
-                # set pbar update amount
-                pbar_update_amount=int(0.1*tot_num_seqs)
-                if pbar_update_amount==0:
-                    pbar_update_amount=1
-            # iterate through sequence list
-            for cur_seq_num, seq in enumerate(sequence_list):
-                # encode the sequence
-                seq_vector = encode_sequence.one_hot(seq)
+        # make sure network is on correct device. 
+        model.to(device)
+        
+        ##
+        ## START PREDICTIONS
+        ##
+        ## .................................................................................... 
+
+        # now we can start up the predictions. 
+        # if a single prediction, we can just ignore the batch stuff. 
+        if isinstance(inputs, str)==True:
+            # if we want to print the performance, start tracking time per prediction. 
+            if print_performance:
+                start_time = time.time()        
+        
+            # check the cache before running the network
+            outputs = None
+            if cache is not None:
+                outputs = cache.get(inputs, cache_tag)
+
+            if outputs is None:
+                # encode the sequence as int8 residue indices
+                seq_vector = encode_sequence.encode_indices_batch([inputs])
                 seq_vector = seq_vector.to(device)
-                seq_vector = seq_vector.view(1, len(seq_vector), -1)
 
                 # get output values from the seq_vector based on the network (brnn_network)
                 with torch.no_grad():
-                    outputs = model(seq_vector.float()).detach().cpu().numpy()[0].flatten()*multiplier
+                    outputs = model.forward_indices(seq_vector).detach().cpu().numpy()[0]*multiplier
 
                 # convert to disorder score if needed. 
                 if return_as_disorder_score==True:
@@ -1286,131 +2510,124 @@ def predict_pLDDT(inputs,
                     outputs=np.clip(outputs, a_min=0, a_max=max_val_clipped)
                 elif normalized==False and round_values==True:
                     outputs=np.round(outputs, 4)
-                # if both ==False, we don't need to do anything. 
-                
-                # make list if user wants a list instead of a np.array
-                if return_numpy==False:
-                    if round_values==True:
-                        # need to round again because the np.round doesn't 
-                        # keep the rounded values when we convert to list. 
-                        outputs = [round(x, 4) for x in outputs.flatten()]
-                    else:
-                        # otherwise just return the flattened array as a list. 
-                        outputs=outputs.flatten().tolist()
 
-                # add to dict
-                pred_dict[seq]=outputs
-                # update progress bar
-                if show_progress_bar:
-                    if cur_seq_num % (pbar_update_amount)==0:
-                        pbar.update(pbar_update_amount)
-
-        else:         
-            # if we are disabling pack-n-pad functionalitity...
-            if disable_pack_n_pad==True:
-                # build a dictionary where keys are sequence length
-                # and values is a list of sequences of that exact length
-                size_filtered =  size_filter(sequence_list)
-                
-                # set progress bar info
-                if show_progress_bar:
-                    pbar = tqdm(total=len(size_filtered))
-
-                # iterate through local size
-                for local_size in size_filtered:
-                    local_seqs = size_filtered[local_size]
-                    # load the data
-                    seq_loader = DataLoader(local_seqs, batch_size=params['batch_size'], shuffle=False)
-
-                    # iterate through batches in seq_loader
-                    for batch in seq_loader:
-                        # Pad the sequence vector to have the same length as the longest sequence in the batch
-                        seqs_padded = torch.nn.utils.rnn.pad_sequence([encode_sequence.one_hot(seq).float() for seq in batch], batch_first=True)
-                        seqs_padded = seqs_padded.to(device)
-
-                        # Forward pass, then send to CPU for numpy rounding / normalization
-                        with torch.no_grad():
-                            outputs = model.forward(seqs_padded).detach().cpu().numpy()*multiplier
-
-                        # convert to disorder score if needed. 
-                        if return_as_disorder_score==True:
-                            # this normalizes so the pLDDT score ends up being renormalized
-                            # to be between 0 and 1, converted into an effective disorder score
-                            outputs = outputs-plddt_base
-                            outputs = outputs*(1/(plddt_top-plddt_base))
-                            # means value of 1 = disordered and 0 is disordered
-                            outputs = 1-outputs                         
-
-                        # Save predictions
-                        for j, seq in enumerate(batch):
-                            if normalized==True and round_values==True:
-                                prediction=np.squeeze(np.round(np.clip(outputs[j][0:len(seq)], a_min=0, a_max=max_val_clipped),4))
-                            elif normalized==True and round_values==False:
-                                prediction=np.squeeze(np.clip(outputs[j][0:len(seq)], a_min=0, a_max=max_val_clipped))
-                            elif normalized==False and round_values==True:
-                                prediction=np.squeeze(np.round(outputs[j][0:len(seq)]))
-                            else:
-                                prediction=np.squeeze(outputs[j][0:len(seq)])
-
-                            # make list if user wants a list instead of a np.array
-                            if return_numpy==False:
-                                if round_values==True:
-                                    # need to round again because the np.round doesn't 
-                                    # keep the rounded values when we convert to list. 
-                                    prediction = [round(x, 4) for x in prediction.flatten()]
-                                else:
-                                    # otherwise just return the flattened array as a list. 
-                                    prediction=prediction.flatten().tolist()
+                # we need to make sure it's a 1D array
+                outputs=outputs.flatten()
 
-                            # see if we need to make prediction a list
-                            pred_dict[seq] = prediction
-                    
-                    # update the progress bar
-                    if show_progress_bar:
-                        pbar.update(1)
-            else:
-                # sort the seqs by length, makes pack-n-pad stuff more efficient
-                sequence_list.sort(key=len, reverse=True)
-                # we will be using pack-n-pad.
-                # load seqs into DataLoader
-                seq_loader = DataLoader(sequence_list, batch_size=params['batch_size'], shuffle=False) 
-                num_batches=len(seq_loader)
-                
-                # set progress bar info if we are going to display it. 
-                # have to do this differently because you can't iterate over DataLoader
-                # and get tqdm to update. 
-                if show_progress_bar:
-                    pbar = tqdm(total=num_batches)
+                if cache is not None:
+                    cache.put(inputs, outputs, cache_tag)
 
-                # iterate through each batch
-                for batch in seq_loader:
-                    # Pad the sequence vector to have the same length as the longest sequence in the batch
-                    seqs_padded = torch.nn.utils.rnn.pad_sequence([encode_sequence.one_hot(seq).float() for seq in batch], batch_first=True)
-                    lengths = [len(seq) for seq in batch]
+            if use_memory_cache:
+                memory_cache.put((inputs, cache_tag), outputs)
 
-                    # pack padded sequences
-                    packed_seqs = torch.nn.utils.rnn.pack_padded_sequence(seqs_padded, lengths, batch_first=True, enforce_sorted=True)
-                    
-                    # move packed seqs to device. 
-                    packed_seqs = packed_seqs.to(device)
+            # make list if user wants a list instead of a np.array
+            if return_numpy==False:
+                outputs = _scores_to_list(outputs, round_values)
 
-                    # lstm forward pass.
-                    with torch.no_grad():
-                        outputs, _ = model.lstm(packed_seqs)
+            # print performance
+            if print_performance:
+                end_time = time.time()
+                print(f"Time taken for prediction on {device}: {end_time - start_time} seconds") 
 
-                    # unpack the packed sequence
-                    outputs, _ = torch.nn.utils.rnn.pad_packed_sequence(outputs, batch_first=True)
+            # return the output
+            return outputs
 
-                    # get final outputs by calling fc.
-                    if params['used_lightning']==False:
-                        outputs = model.fc(outputs)
+        else:
+            # otherwise we need to do batch predictions. 
+            ## Prepare data by generate a list (sequence_list)
+            ## which contains non-redundant sequences 
+            ##   
+            if isinstance(inputs, dict):
+                mode = 'dictionary'
+                seq2id = {}
+                for k in inputs:
+                    s = inputs[k]
+                    if s not in seq2id:
+                        seq2id[s] = [k]
                     else:
-                        outputs = model.layer_norm(outputs)
-                        for layer in model.linear_layers:
-                            outputs = layer(outputs)
-                    
-                    # move to cpu
-                    outputs = outputs.detach().cpu().numpy()*multiplier
+                        seq2id[s].append(k)
+                sequence_list = list(seq2id.keys())
+            elif isinstance(inputs, list):
+                mode = 'list'
+                sequence_list = list(set(inputs))
+            else:
+                raise Exception('Invalid data type passed - expect a single sequence or a list or dictionary of sequences')
+
+            # if we want to print the performance, start tracking time per prediction. 
+            if print_performance:
+                start_time = time.time()   
+
+            # initialize the return dictionary that maps sequence to
+            # disorder profile
+            pred_dict = {}
+
+            # if we have a cache, pull out everything already predicted so that
+            # only the cache misses are sent to the network
+            if cache is not None:
+                pred_dict = cache.get_many(sequence_list, cache_tag)
+                sequence_list = [s for s in sequence_list if s not in pred_dict]
+                cache_misses = sequence_list
+
+            # split any sequences that are too long into overlapping windows. 
+            # The windows are predicted like any other sequence and stitched 
+            # back together once all predictions are done
+            long_seqs = {}
+            if window_length is not None:
+                requested = set(sequence_list) | set(pred_dict.keys())
+                sequence_list, long_seqs = _windowing.split_long_sequences(sequence_list, window_length, window_overlap)
+                window_only = [s for s in sequence_list if s not in requested]
+
+            # if we have more than one device, split the batches across the devices
+            if len(devices) > 1 and len(sequence_list) > 0:
+                pbar = None
+                if show_progress_bar:
+                    pbar = tqdm(total=len(sequence_list))
+
+                pred_dict.update(predict_on_devices('pLDDT', sequence_list, devices, params['batch_size'], pbar=pbar,
+                                                    version=version, return_decimals=return_decimals,
+                                                    normalized=normalized, round_values=round_values,
+                                                    return_as_disorder_score=return_as_disorder_score,
+                                                    plddt_base=plddt_base, plddt_top=plddt_top,
+                                                    force_disable_batch=force_disable_batch,
+                                                    disable_pack_n_pad=disable_pack_n_pad,
+                                                    max_tokens=max_tokens))
+
+            # if we have been asked for more than one CPU worker, split the batches
+            # across a pool of worker processes
+            elif num_workers > 1 and device.type == 'cpu' and len(sequence_list) > 0:
+                pbar = None
+                if show_progress_bar:
+                    pbar = tqdm(total=len(sequence_list))
+
+                pred_dict.update(predict_with_process_pool('pLDDT', sequence_list, num_workers, params['batch_size'], pbar=pbar,
+                                                           version=version, return_decimals=return_decimals,
+                                                           normalized=normalized, round_values=round_values,
+                                                           return_as_disorder_score=return_as_disorder_score,
+                                                           plddt_base=plddt_base, plddt_top=plddt_top,
+                                                           force_disable_batch=force_disable_batch,
+                                                           disable_pack_n_pad=disable_pack_n_pad,
+                                                           max_tokens=max_tokens))
+
+            # check if we are disabling batch predictions. If we are, we need to
+            # do all predictions individually
+            elif force_disable_batch==True:
+                tot_num_seqs=len(sequence_list)
+                # see if a progress bar is wanted
+                if show_progress_bar:
+                    pbar = tqdm(total=len(sequence_list))
+                    # set pbar update amount
+                    pbar_update_amount=int(0.1*tot_num_seqs)
+                    if pbar_update_amount==0:
+                        pbar_update_amount=1
+                # iterate through sequence list
+                for cur_seq_num, seq in enumerate(sequence_list):
+                    # encode the sequence as int8 residue indices
+                    seq_vector = encode_sequence.encode_indices_batch([seq])
+                    seq_vector = seq_vector.to(device)
+
+                    # get output values from the seq_vector based on the network (brnn_network)
+                    with torch.no_grad():
+                        outputs = model.forward_indices(seq_vector).detach().cpu().numpy()[0].flatten()*multiplier
 
                     # convert to disorder score if needed. 
                     if return_as_disorder_score==True:
@@ -1421,64 +2638,734 @@ def predict_pLDDT(inputs,
                         # means value of 1 = disordered and 0 is disordered
                         outputs = 1-outputs 
 
-                    # clean up / normalize
+                    # Take care of rounding and normalization
                     if normalized == True and round_values==True:
                         outputs=np.round(np.clip(outputs, a_min=0, a_max=max_val_clipped),4)
                     elif normalized==True and round_values==False:
                         outputs=np.clip(outputs, a_min=0, a_max=max_val_clipped)
                     elif normalized==False and round_values==True:
-                        outputs=np.round(outputs, 4)                
-                    
-                    # get individual seqs ignoring padded parts. 
-                    for seq_num, length in enumerate(lengths):
-                        curoutput=outputs[seq_num][0:length].flatten()
-                        seq = batch[seq_num]
-                    
-                        # make list if user wants a list instead of a np.array
-                        if return_numpy==False:
-                            if round_values==True:
-                                # need to round again because the np.round doesn't 
-                                # keep the rounded values when we convert to list. 
-                                curoutput = [round(x, 4) for x in curoutput.flatten()]
-                            else:
-                                # otherwise just return the flattened array as a list. 
-                                curoutput=curoutput.flatten().tolist()
-
-                        # add to dict
-                        
-                        pred_dict[seq]=curoutput
+                        outputs=np.round(outputs, 4)
+                    # if both ==False, we don't need to do anything. 
+                
 
+                    # add to dict
+                    pred_dict[seq]=outputs
                     # update progress bar
                     if show_progress_bar:
-                        pbar.update(1)
+                        if cur_seq_num % (pbar_update_amount)==0:
+                            pbar.update(pbar_update_amount)
+
+            else:         
+                # if we are disabling pack-n-pad functionalitity...
+                if disable_pack_n_pad==True:
+                    # build a dictionary where keys are sequence length
+                    # and values is a list of sequences of that exact length
+                    size_filtered =  size_filter(sequence_list)
+                
+                    # set progress bar info
+                    if show_progress_bar:
+                        pbar = tqdm(total=len(size_filtered))
+
+                    # iterate through local size
+                    for local_size in size_filtered:
+                        local_seqs = size_filtered[local_size]
+                        # load the data
+                        seq_loader = DataLoader(local_seqs, batch_size=params['batch_size'], shuffle=False)
+
+                        # iterate through batches in seq_loader
+                        for batch in seq_loader:
+                            # Encode the batch straight into one tensor padded to the longest sequence in the batch
+                            seqs_padded = encode_sequence.encode_indices_batch(batch)
+                            seqs_padded = seqs_padded.to(device)
+
+                            # Forward pass, then send to CPU for numpy rounding / normalization
+                            with torch.no_grad():
+                                outputs = model.forward_indices(seqs_padded).detach().cpu().numpy()*multiplier
+
+                            # convert to disorder score if needed. 
+                            if return_as_disorder_score==True:
+                                # this normalizes so the pLDDT score ends up being renormalized
+                                # to be between 0 and 1, converted into an effective disorder score
+                                outputs = outputs-plddt_base
+                                outputs = outputs*(1/(plddt_top-plddt_base))
+                                # means value of 1 = disordered and 0 is disordered
+                                outputs = 1-outputs                         
+
+                            # Save predictions
+                            for j, seq in enumerate(batch):
+                                if normalized==True and round_values==True:
+                                    prediction=np.round(np.clip(outputs[j][0:len(seq)], a_min=0, a_max=max_val_clipped),4).flatten()
+                                elif normalized==True and round_values==False:
+                                    prediction=np.clip(outputs[j][0:len(seq)], a_min=0, a_max=max_val_clipped).flatten()
+                                elif normalized==False and round_values==True:
+                                    prediction=np.round(outputs[j][0:len(seq)]).flatten()
+                                else:
+                                    prediction=outputs[j][0:len(seq)].flatten()
+
+
+                                pred_dict[seq] = prediction
+                    
+                        # update the progress bar
+                        if show_progress_bar:
+                            pbar.update(1)
+                else:
+                    # sort the seqs by length, makes pack-n-pad stuff more efficient
+                    sequence_list.sort(key=len, reverse=True)
+
+                    # we will be using pack-n-pad. Batches are either a fixed number of 
+                    # sequences (batch_size) or, if max_tokens is set, as many sequences as
+                    # fit into max_tokens padded residues. If the device runs out of memory 
+                    # the limit is halved and the batch is retried.
+                    batch_size = params['batch_size']
+                    token_budget = max_tokens
+
+                    # set progress bar info if we are going to display it. 
+                    # Counts sequences because the number of batches is not known
+                    # up front when batching by tokens.
+                    if show_progress_bar:
+                        pbar = tqdm(total=len(sequence_list))
 
-        # close pbar
-        if show_progress_bar:
-            pbar.close()
+                    # iterate through each batch (pipelined on CUDA, see iter_packed_batches)
+                    # Scaling, conversion to a disorder score, normalization and
+                    # rounding run on the device, and only the real residues come
+                    # back, as one flat array per batch
+                    postprocess = functools.partial(postprocess_tensor, normalized=normalized, round_values=round_values,
+                                                    max_value=max_val_clipped, multiplier=multiplier,
+                                                    disorder_range=(plddt_base, plddt_top) if return_as_disorder_score==True else None)
+
+                    for batch, outputs, offsets in iter_packed_batches(model, sequence_list, device, params['used_lightning'],
+                                                                       batch_size, token_budget, silence_warnings, postprocess):
+
+                        # each sequence's scores are a view into the batch's flat array
+                        for seq_num, seq in enumerate(batch):
+                            pred_dict[seq]=outputs[offsets[seq_num]:offsets[seq_num+1]]
 
-        # if printing performance
-        if print_performance:
-            end_time = time.time()
-            print(f"\nTime taken for predictions on {device}: {end_time - start_time} seconds") 
+                        # update progress bar
+                        if show_progress_bar:
+                            pbar.update(len(batch))
+
+            # close pbar
+            if show_progress_bar:
+                pbar.close()
+
+            # stitch the windows for any long sequences back together, and then
+            # drop windows that were not also sequences we were asked to predict
+            if len(long_seqs) > 0:
+                for s in long_seqs:
+                    starts = long_seqs[s]
+                    stitched = _windowing.stitch_windows(len(s), starts, [pred_dict[s[i:i+window_length]] for i in starts])
+                    if round_values==True:
+                        stitched = np.round(stitched, 4)
+                    pred_dict[s] = stitched
+
+                for s in window_only:
+                    del pred_dict[s]
+
+            # add the new predictions to the cache. Windowed sequences are left
+            # out, because their scores depend on the window settings and would
+            # otherwise be served in place of a full-length prediction later
+            if cache is not None:
+                cache.put_many({s: pred_dict[s] for s in cache_misses if s not in long_seqs}, cache_tag)
+
+            # pack everything into one ragged array if requested
+            if return_format == 'ragged':
+                ragged = build_ragged_scores(inputs, pred_dict, ragged_dtype, max_value=max_val_clipped)
+                if print_performance:
+                    end_time = time.time()
+                    print(f"\nTime taken for predictions on {device}: {end_time - start_time} seconds") 
+                return ragged
+
+            # make lists if user wants lists instead of np.arrays
+            if return_numpy==False:
+                for s in pred_dict:
+                    pred_dict[s] = _scores_to_list(pred_dict[s], round_values)
+
+            # if printing performance
+            if print_performance:
+                end_time = time.time()
+                print(f"\nTime taken for predictions on {device}: {end_time - start_time} seconds") 
         
-        ##
-        ## PREDICTION DONE
-        ##
-        ## ....................................................................................
-
-        # return scores
-        if mode == 'dictionary':
-            return_dict = {}
-            for s in seq2id:
-                for seq_id in seq2id[s]:
-                    return_dict[seq_id] = [s, pred_dict[s]]                
-            return return_dict
-        elif mode == 'list':
-            return_list = []
-            for s in inputs:
-                return_list.append([s, pred_dict[s]])
-            return return_list
-        else:
-            raise Exception('How did we get here? What did we do wrong? Is this the darkest timeline? Definitely')
+            ##
+            ## PREDICTION DONE
+            ##
+            ## ....................................................................................
+
+            # return scores
+            if mode == 'dictionary':
+                return_dict = {}
+                for s in seq2id:
+                    for seq_id in seq2id[s]:
+                        return_dict[seq_id] = [s, pred_dict[s]]                
+                return return_dict
+            elif mode == 'list':
+                return_list = []
+                for s in inputs:
+                    return_list.append([s, pred_dict[s]])
+                return return_list
+            else:
+                raise Exception('How did we get here? What did we do wrong? Is this the darkest timeline? Definitely')
+    finally:
+        # close the cache if we opened it, even if the prediction failed
+        if close_cache:
+            cache.close()
 
             
+
+
+
+# ....................................................................................
+#
+def parse_network_name(network):
+    '''
+    Function to parse the name of a network as used by predict_multi(). 
+    Names are the type of network followed by the version, e.g. 
+    'disorder_V3' or 'pLDDT_V2'. The version can be given in any of the
+    forms accepted by take_care_of_version(), so 'disorder_3' and 
+    'disorder_legacy' also work.
+
+    Parameters
+    ---------------
+    network : str
+        Name of the network
+
+    Returns
+    ---------------
+    tuple
+        (name, network type, version, network dictionary, path to the weights). 
+        The name is normalized so it always has the form 'disorder_V3' or
+        'pLDDT_V2'.
+    '''
+    PATH = os.path.dirname(os.path.realpath(__file__))
+
+    network_type, _, version = str(network).partition('_')
+    version = take_care_of_version(version)
+
+    if network_type.lower() == 'disorder':
+        network_type = 'disorder'
+        networks = metapredict_networks
+        folder = 'networks'
+    elif network_type.lower() == 'plddt':
+        network_type = 'pLDDT'
+        networks = pplddt_networks
+        folder = 'ppLDDT/networks'
+    else:
+        raise MetapredictError(f"Network {network} not recognized. Networks should be named 'disorder_<version>' or 'pLDDT_<version>', e.g. 'disorder_V3'")
+
+    if version not in networks:
+        raise MetapredictError(f'Network {network} not available. Valid {network_type} versions are {list(networks.keys())}')
+
+    net = networks[version]
+    return f'{network_type}_{version}', network_type, version, net, f"{PATH}/{folder}/{net['weights']}"
+
+
+def load_networks(networks, device_string='cpu'):
+    '''
+    Function to parse a list of network names and load each network onto
+    a device. Networks are the same cached models used by predict() and 
+    predict_pLDDT().
+
+    Parameters
+    ---------------
+    networks : list or str or None
+        Names of the networks (see parse_network_name()). If None, the 
+        default disorder and pLDDT networks are used.
+
+    device_string : str
+        Device to load the networks onto.
+
+    Returns
+    ---------------
+    dict
+        Maps each (normalized) network name to a tuple of 
+        (network type, version, network parameters, model), in the order
+        the networks were passed. Duplicate names are dropped.
+    '''
+    if networks is None:
+        networks = [f'disorder_{DEFAULT_NETWORK}', f'pLDDT_{DEFAULT_NETWORK_PLDDT}']
+
+    if isinstance(networks, str):
+        networks = [networks]
+
+    if len(networks) == 0:
+        raise MetapredictError('At least one network must be passed')
+
+    device = torch.device(device_string)
+
+    models = {}
+    for network in networks:
+        name, network_type, version, net, predictor_path = parse_network_name(network)
+        if name in models:
+            continue
+
+        model = get_model(model_name=f'{name}_{device_string}',
+                          params=net['parameters'],
+                          predictor_path=predictor_path,
+                          device=device)
+        model.eval()
+        model.to(device)
+        models[name] = (network_type, version, net['parameters'], model)
+
+    return models
+
+
+def network_postprocess(network_type, version, normalized=True, round_values=True, return_decimals=False):
+    '''
+    Returns the post-processing function (see postprocess_tensor()) that 
+    scales, clips and rounds raw network outputs in the same way as 
+    predict() (for disorder networks) and predict_pLDDT() (for pLDDT 
+    networks).
+
+    Parameters
+    ---------------
+    network_type : str
+        'disorder' or 'pLDDT'
+
+    version : str
+        Network version, e.g. 'V1'
+
+    normalized : bool
+        Whether to clip the scores
+
+    round_values : bool
+        Whether to round the scores to 4 decimal places
+
+    return_decimals : bool
+        Whether pLDDT scores are returned between 0 and 1 rather than
+        between 0 and 100. Ignored for disorder networks.
+
+    Returns
+    ---------------
+    function
+        Takes a tensor of raw outputs and returns the processed scores
+    '''
+    # scale pLDDT scores in the same way as predict_pLDDT()
+    if network_type == 'pLDDT':
+        if return_decimals==True:
+            multiplier = 0.01 if version=='V1' else 1
+            max_val_clipped = 1
+        else:
+            multiplier = 1 if version=='V1' else 100
+            max_val_clipped = 100
+    else:
+        multiplier = 1
+        max_val_clipped = 1
+
+    return functools.partial(postprocess_tensor, normalized=normalized, round_values=round_values,
+                             max_value=max_val_clipped, multiplier=multiplier)
+
+
+def stitch_network_windows(seq, starts, pred_dict, names, window_length, round_values):
+    """
+    Stitches the window predictions for one long sequence back together 
+    for each of several networks (see backend/windowing.py).
+
+    Parameters
+    ---------------
+    seq : str
+        The long sequence
+
+    starts : list
+        Window start positions, from windowing.split_long_sequences()
+
+    pred_dict : dict
+        Maps each window to a dictionary of network name to scores
+
+    names : list
+        Network names
+
+    window_length : int
+        Length of each window
+
+    round_values : bool
+        Whether to round the stitched scores to 4 decimal places
+
+    Returns
+    ---------------
+    dict
+        Maps network name to the stitched scores for seq
+    """
+    scores = {}
+    for name in names:
+        stitched = _windowing.stitch_windows(len(seq), starts, [pred_dict[seq[i:i+window_length]][name] for i in starts])
+        if round_values==True:
+            stitched = np.round(stitched, 4)
+        scores[name] = stitched
+    return scores
+
+
+def predict_multi(inputs,
+                  networks=None,
+                  use_device=None,
+                  normalized=True,
+                  round_values=True,
+                  return_numpy=True,
+                  return_decimals=False,
+                  show_progress_bar=False,
+                  max_tokens=None,
+                  window_length=None,
+                  window_overlap=500,
+                  silence_warnings=False,
+                  default_to_device='cuda'):
+    """
+    Runs several networks (any mix of disorder and pLDDT networks) over the
+    same sequences. Each batch is encoded and moved to the device once, and
+    every network is run over that same input tensor, so asking for several
+    predictions costs one encoding / host-to-device copy per batch rather 
+    than one per network. Scores are post-processed in the same way as 
+    predict() and predict_pLDDT().
+
+    Parameters
+    ------------
+    inputs : str, list or dict
+        A single sequence, a list of sequences or a dictionary where 
+        values are sequences.
+
+    networks : list
+        Names of the networks to run, e.g. ['disorder_V3', 'pLDDT_V2']. 
+        See parse_network_name() for the accepted names. If None, runs 
+        the default disorder and pLDDT networks.
+        Default = None
+
+    use_device : int or str
+        Identifier for the device to be used for predictions. Only used
+        for lists and dictionaries; single sequences are predicted on 
+        the CPU, as in predict(). See check_device() for options.
+        Default = None
+
+    normalized : bool
+        Whether to clip disorder scores to between 0 and 1 and pLDDT 
+        scores to between 0 and 100 (or 0 and 1 if return_decimals=True).
+        Default = True
+
+    round_values : bool
+        Whether to round scores to 4 decimal places.
+        Default = True
+
+    return_numpy : bool
+        Whether to return numpy arrays (True) or lists (False).
+        Default = True
+
+    return_decimals : bool
+        Whether pLDDT scores are returned as decimals between 0 and 1 
+        rather than between 0 and 100. Does not affect disorder scores.
+        Default = False
+
+    show_progress_bar : bool
+        Whether to show a progress bar for lists and dictionaries.
+        Default = False
+
+    max_tokens : int
+        If set, batches hold as many sequences as fit into max_tokens 
+        padded residues instead of a fixed number of sequences. See 
+        predict() for details.
+        Default = None
+
+    window_length : int
+        If set, sequences longer than window_length are split into 
+        overlapping windows, predicted with the rest of the batch and 
+        stitched back together, as in predict(). If None and predicting on
+        a CUDA device, sequences longer than MAX_CUDA_LENGTH are windowed 
+        automatically. Only used for lists and dictionaries.
+        Default = None
+
+    window_overlap : int
+        Minimum number of residues by which neighbouring windows overlap.
+        Default = 500
+
+    silence_warnings : bool
+        Whether to silence warnings.
+        Default = False
+
+    default_to_device : str
+        Device to use if use_device is None.
+        Default = 'cuda'
+
+    Returns
+    ------------
+    dict or list
+        If a single sequence was passed, a dictionary mapping each network
+        name (normalized, e.g. 'disorder_V3') to the scores. If a list was 
+        passed, a list in the same order where each element is 
+        [sequence, dictionary of scores]. If a dictionary was passed, a 
+        dictionary with the same keys where each value is 
+        [sequence, dictionary of scores].
+    """
+    # if a single sequence, just use cpu, as in predict()
+    if isinstance(inputs, str)==True:
+        device_string = 'cpu'
+    else:
+        device_string = check_device(use_device, default_device=default_to_device)
+
+        # long sequences are windowed as in predict()
+        window_length = set_up_windowing(inputs, [device_string], window_length, window_overlap, silence_warnings)
+    device = torch.device(device_string)
+
+    # parse the network names and load the networks
+    models = load_networks(networks, device_string)
+
+    def finalize(scores):
+        if return_numpy==False:
+            return {name: _scores_to_list(scores[name], round_values) for name in scores}
+        return scores
+
+    # scaling, normalization and rounding for each network, run on the device
+    postprocess = {name: network_postprocess(network_type, version, normalized=normalized, 
+                                             round_values=round_values, return_decimals=return_decimals)
+                   for name, (network_type, version, params, model) in models.items()}
+
+    # single sequence; encode once and run every network on it
+    if isinstance(inputs, str)==True:
+        seq_vector = encode_sequence.encode_indices_batch([inputs]).to(device)
+        scores = {}
+        with torch.no_grad():
+            for name, (network_type, version, params, model) in models.items():
+                outputs = model.forward_indices(seq_vector)[0].flatten()
+                scores[name] = postprocess[name](outputs).detach().cpu().numpy()
+        return finalize(scores)
+
+    if isinstance(inputs, dict):
+        sequence_list = list(set(inputs.values()))
+    elif isinstance(inputs, list):
+        sequence_list = list(set(inputs))
+    else:
+        raise MetapredictError('Invalid data type passed - expect a single sequence or a list or dictionary of sequences')
+
+    if max_tokens is not None and (not isinstance(max_tokens, int) or max_tokens < 1):
+        raise MetapredictError(f'max_tokens must be None or a positive integer, got {max_tokens}')
+
+    # split any sequences that are too long into overlapping windows
+    long_seqs = {}
+    if window_length is not None:
+        requested = set(sequence_list)
+        sequence_list, long_seqs = _windowing.split_long_sequences(sequence_list, window_length, window_overlap)
+        window_only = [s for s in sequence_list if s not in requested]
+
+    if show_progress_bar:
+        pbar = tqdm(total=len(sequence_list))
+
+    # every network runs on each encoded batch, batched as in predict()
+    sequence_list.sort(key=len, reverse=True)
+    batch_size = min([models[name][2]['batch_size'] for name in models])
+    names = list(models.keys())
+    network_list = [(models[name][3], models[name][2]['used_lightning'], postprocess[name]) for name in names]
+
+    pred_dict = {}
+    for batch, outputs, offsets in iter_network_batches(network_list, sequence_list, device, batch_size, max_tokens, silence_warnings):
+        # each sequence's scores are a view into the batch's flat arrays
+        for seq_num, seq in enumerate(batch):
+            pred_dict[seq] = {name: outputs[n][offsets[seq_num]:offsets[seq_num+1]] for n, name in enumerate(names)}
+
+        if show_progress_bar:
+            pbar.update(len(batch))
+
+    if show_progress_bar:
+        pbar.close()
+
+    # stitch the windows for any long sequences back together
+    if len(long_seqs) > 0:
+        for s in long_seqs:
+            pred_dict[s] = stitch_network_windows(s, long_seqs[s], pred_dict, names, window_length, round_values)
+        for s in window_only:
+            del pred_dict[s]
+
+    if isinstance(inputs, dict):
+        return {k: [s, finalize(pred_dict[s])] for k, s in inputs.items()}
+    else:
+        return [[s, finalize(pred_dict[s])] for s in inputs]
+
+
+
+def predict_columnar(inputs,
+                     networks=None,
+                     use_device=None,
+                     normalized=True,
+                     round_values=True,
+                     return_decimals=False,
+                     show_progress_bar=False,
+                     max_tokens=None,
+                     window_length=None,
+                     window_overlap=500,
+                     silence_warnings=False,
+                     default_to_device='cuda'):
+    """
+    Runs several networks over a large collection of sequences and returns
+    the scores in columnar form (a ColumnarScores object): one float32 
+    buffer per network holding the scores for every sequence back to back,
+    plus an offsets array. The buffers are allocated once up front and 
+    each batch is written straight into them, so no per-sequence arrays 
+    are kept around. Batching is the same as predict_multi().
+
+    Parameters
+    ------------
+    inputs : list, dict or iterable
+        A list of sequences (IDs are then the positions in the list), a 
+        dictionary mapping IDs to sequences, or any other iterable of 
+        (id, sequence) pairs.
+
+    networks : list
+        Names of the networks to run, see parse_network_name(). If None,
+        runs the default disorder and pLDDT networks.
+        Default = None
+
+    use_device : int or str
+        Identifier for the device to be used for predictions. See 
+        check_device() for options.
+        Default = None
+
+    normalized : bool
+        Whether to clip the scores, as in predict_multi().
+        Default = True
+
+    round_values : bool
+        Whether to round scores to 4 decimal places.
+        Default = True
+
+    return_decimals : bool
+        Whether pLDDT scores are returned as decimals between 0 and 1 
+        rather than between 0 and 100. Does not affect disorder scores.
+        Default = False
+
+    show_progress_bar : bool
+        Whether to show a progress bar.
+        Default = False
+
+    max_tokens : int
+        If set, batches hold as many sequences as fit into max_tokens 
+        padded residues instead of a fixed number of sequences.
+        Default = None
+
+    window_length : int
+        If set, sequences longer than window_length are split into 
+        overlapping windows and stitched back together, as in 
+        predict_multi(). If None and predicting on a CUDA device, sequences
+        longer than MAX_CUDA_LENGTH are windowed automatically.
+        Default = None
+
+    window_overlap : int
+        Minimum number of residues by which neighbouring windows overlap.
+        Default = 500
+
+    silence_warnings : bool
+        Whether to silence warnings.
+        Default = False
+
+    default_to_device : str
+        Device to use if use_device is None.
+        Default = 'cuda'
+
+    Returns
+    ------------
+    ColumnarScores
+        Scores for every sequence, in the order they were passed.
+    """
+    # collect IDs and sequences
+    if isinstance(inputs, str):
+        raise MetapredictError('predict_columnar() expects a list, dictionary or iterable of (id, sequence) pairs, not a single sequence')
+    elif isinstance(inputs, list):
+        ids = list(range(len(inputs)))
+        sequences = inputs
+    elif isinstance(inputs, dict):
+        ids = list(inputs.keys())
+        sequences = list(inputs.values())
+    else:
+        ids = []
+        sequences = []
+        for pair in inputs:
+            try:
+                seq_id, seq = pair
+            except (TypeError, ValueError):
+                raise MetapredictError(f'Expected an iterable of (id, sequence) pairs, but got {pair}')
+            ids.append(seq_id)
+            sequences.append(seq)
+
+    if len(sequences) == 0:
+        raise MetapredictError('Error: Passed iterable type is length 0')
+
+    if max_tokens is not None and (not isinstance(max_tokens, int) or max_tokens < 1):
+        raise MetapredictError(f'max_tokens must be None or a positive integer, got {max_tokens}')
+
+    # work out where each sequence goes in the buffers, and which positions
+    # each unique sequence has to be written to
+    lengths = np.fromiter((len(s) for s in sequences), dtype=np.int64, count=len(sequences))
+    if np.any(lengths == 0):
+        raise MetapredictError('Error: Passed string is length 0')
+    offsets = np.zeros(len(sequences)+1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    seq2positions = {}
+    for i, s in enumerate(sequences):
+        if s in seq2positions:
+            seq2positions[s].append(i)
+        else:
+            seq2positions[s] = [i]
+
+    sequence_list = list(seq2positions.keys())
+
+    # long sequences are windowed as in predict_multi()
+    device_string = check_device(use_device, default_device=default_to_device)
+    window_length = set_up_windowing(sequence_list, [device_string], window_length, window_overlap, silence_warnings)
+    device = torch.device(device_string)
+
+    # parse the network names and load the networks
+    models = load_networks(networks, device_string)
+
+    # one buffer per network for every residue of every sequence
+    scores = {name: np.empty(offsets[-1], dtype=np.float32) for name in models}
+
+    # split any sequences that are too long into overlapping windows; the
+    # window scores are kept until the long sequence can be stitched
+    long_seqs = {}
+    if window_length is not None:
+        sequence_list, long_seqs = _windowing.split_long_sequences(sequence_list, window_length, window_overlap)
+    window_scores = {}
+
+    if show_progress_bar:
+        pbar = tqdm(total=len(sequence_list))
+
+    # scaling, normalization and rounding for each network, run on the device
+    postprocess = {name: network_postprocess(network_type, version, normalized=normalized, 
+                                             round_values=round_values, return_decimals=return_decimals)
+                   for name, (network_type, version, params, model) in models.items()}
+
+    # every network runs on each encoded batch, batched as in predict()
+    sequence_list.sort(key=len, reverse=True)
+    batch_size = min([models[name][2]['batch_size'] for name in models])
+    names = list(models.keys())
+    network_list = [(models[name][3], models[name][2]['used_lightning'], postprocess[name]) for name in names]
+
+    for batch, batch_outputs, batch_offsets in iter_network_batches(network_list, sequence_list, device, batch_size, max_tokens, silence_warnings):
+        for n, name in enumerate(names):
+            outputs = batch_outputs[n]
+
+            # write each sequence into its slot(s) in the buffer
+            buffer = scores[name]
+            for seq_num, seq in enumerate(batch):
+                seq_scores = outputs[batch_offsets[seq_num]:batch_offsets[seq_num+1]]
+                if seq not in seq2positions:
+                    window_scores.setdefault(seq, {})[name] = seq_scores
+                    continue
+                for i in seq2positions[seq]:
+                    buffer[offsets[i]:offsets[i+1]] = seq_scores
+
+        if show_progress_bar:
+            pbar.update(len(batch))
+
+    if show_progress_bar:
+        pbar.close()
+
+    # stitch the windows for any long sequences back together
+    for seq in long_seqs:
+        # a window that is also an input sequence was written to the 
+        # buffer instead, so read it back from there
+        for i in long_seqs[seq]:
+            window = seq[i:i+window_length]
+            if window not in window_scores:
+                first = seq2positions[window][0]
+                window_scores[window] = {name: scores[name][offsets[first]:offsets[first+1]] for name in names}
+
+        stitched = stitch_network_windows(seq, long_seqs[seq], window_scores, names, window_length, round_values)
+        for name in names:
+            for i in seq2positions[seq]:
+                scores[name][offsets[i]:offsets[i+1]] = stitched[name]
+
+    return _ColumnarScores(ids, offsets, scores)
@@ -0,0 +1,133 @@
+"""
+Quantized storage of per-residue scores.
+
+Scores are stored as unsigned integers with a fixed scale factor, such
+that a stored value q represents the score q*scale. The scale maps the
+full integer range onto the range of the scores:
+
+    scale = max_value / (2**bits - 1)
+
+where max_value is 1 for normalized disorder scores (and for pLDDT scores
+returned as decimals) and 100 for pLDDT scores. This gives
+
+    dtype    disorder (0-1)          pLDDT (0-100)
+    uint8    1/255   (~0.0039)       100/255   (~0.39)
+    uint16   1/65535 (~0.000015)     100/65535 (~0.0015)
+
+Encoding rounds to the nearest step, so the round-trip error is at most
+half a step. With uint16, disorder scores rounded to 4 decimal places
+(the default) are recovered exactly by rounding the decoded value to 4
+decimal places again. Values outside [0, max_value] (e.g. with
+normalized=False) are clipped.
+"""
+
+import numpy as np
+
+from metapredict.metapredict_exceptions import MetapredictError
+
+
+QUANTIZED_DTYPES = ('uint8', 'uint16')
+
+
+def check_quantized_dtype(dtype):
+    """
+    Checks that dtype is one of the quantized dtypes.
+
+    Parameters
+    -----------
+    dtype : str or np.dtype
+        dtype to check
+
+    Returns
+    --------
+    np.dtype
+        The dtype
+    """
+    try:
+        dtype = np.dtype(dtype)
+    except TypeError:
+        raise MetapredictError(f'Quantized dtype must be one of {QUANTIZED_DTYPES}, got {dtype}')
+
+    if dtype.name not in QUANTIZED_DTYPES:
+        raise MetapredictError(f'Quantized dtype must be one of {QUANTIZED_DTYPES}, got {dtype}')
+
+    return dtype
+
+
+def is_quantized_dtype(dtype):
+    """
+    Returns True if dtype is one of the quantized dtypes.
+    """
+    return np.dtype(dtype).name in QUANTIZED_DTYPES
+
+
+def quantization_scale(dtype, max_value=1.0):
+    """
+    Returns the scale factor for a quantized dtype.
+
+    Parameters
+    -----------
+    dtype : str or np.dtype
+        'uint8' or 'uint16'
+
+    max_value : float
+        Largest score, which is stored as the largest integer. 1 for
+        disorder scores and 100 for pLDDT scores.
+        Default = 1.0
+
+    Returns
+    --------
+    float
+        Score represented by one integer step
+    """
+    dtype = check_quantized_dtype(dtype)
+    return float(max_value) / np.iinfo(dtype).max
+
+
+def quantize(scores, dtype='uint8', max_value=1.0):
+    """
+    Encodes scores as unsigned integers.
+
+    Parameters
+    -----------
+    scores : array-like
+        Scores between 0 and max_value
+
+    dtype : str or np.dtype
+        'uint8' or 'uint16'
+        Default = 'uint8'
+
+    max_value : float
+        Largest score. 1 for disorder scores and 100 for pLDDT scores.
+        Default = 1.0
+
+    Returns
+    --------
+    np.ndarray
+        Quantized scores
+    """
+    dtype = check_quantized_dtype(dtype)
+    scale = quantization_scale(dtype, max_value)
+
+    quantized = np.round(np.asarray(scores, dtype=np.float64) / scale)
+    return np.clip(quantized, 0, np.iinfo(dtype).max).astype(dtype)
+
+
+def dequantize(quantized, scale):
+    """
+    Decodes quantized scores.
+
+    Parameters
+    -----------
+    quantized : array-like
+        Quantized scores
+
+    scale : float
+        Scale factor used to encode the scores (see quantization_scale())
+
+    Returns
+    --------
+    np.ndarray
+        float32 scores
+    """
+    return (np.asarray(quantized, dtype=np.float64) * scale).astype(np.float32)
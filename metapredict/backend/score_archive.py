@@ -0,0 +1,349 @@
+"""
+Compact binary archive of per-residue scores with a random-access index.
+
+An archive holds the scores for many sequences (e.g. a whole proteome) in
+one file that can be memory-mapped, so that a long-running service can
+open it without parsing anything and read the scores for any ID straight
+out of the page cache.
+
+File layout (all integers little-endian):
+
+    [0, 8)                  magic bytes b'MPSCORE1'
+    [8, 16)                 uint64 length of the JSON header
+    [16, HEADER_SIZE)       JSON header, padded with spaces. Holds the format
+                            version, the score dtype ('float16', 'uint8' or 'uint16'),
+                            the quantization scale, the number of entries,
+                            the byte offsets of each section and any
+                            user metadata (e.g. the network used)
+    [HEADER_SIZE, ...)      scores for every sequence back to back
+    index                   uint64 start of each sequence (in scores, not
+                            bytes), uint32 length of each sequence, uint64
+                            byte offsets into the ID blob (n+1 values), 
+                            the UTF-8 encoded IDs, a uint64 hash of each 
+                            ID sorted in increasing order and the uint64
+                            position of the entry each sorted hash belongs
+                            to
+
+IDs are found with a binary search of the sorted hashes, so opening an
+archive does not decode any IDs and each lookup is O(log n).
+
+Scores stored as uint8 or uint16 are quantized as round(score/scale) (see
+quantization.py), so a stored value q represents q*scale.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+from metapredict.metapredict_exceptions import MetapredictError
+from metapredict.backend import quantization as _quantization
+
+
+MAGIC = b'MPSCORE1'
+FORMAT_VERSION = 1
+
+# bytes reserved at the start of the file for the magic bytes and header
+HEADER_SIZE = 4096
+
+VALID_DTYPES = ('float16',) + _quantization.QUANTIZED_DTYPES
+
+
+def _align(position, alignment=8):
+    return position + (-position) % alignment
+
+
+def _id_hash(encoded_id):
+    """
+    Stable 64-bit hash of a UTF-8 encoded ID, used to look IDs up in the
+    index. Python's hash() is randomized per process, so it can't be 
+    stored.
+    """
+    return int.from_bytes(hashlib.blake2b(encoded_id, digest_size=8).digest(), 'little')
+
+
+class ScoreArchiveWriter:
+    """
+    Writes a score archive. Scores are appended with add() (or add_many())
+    as they are predicted and only the index, which is small, is kept in
+    memory until the archive is closed.
+    """
+
+    def __init__(self, filename, dtype='float16', max_value=1.0, metadata=None):
+        """
+        Parameters
+        -----------
+        filename : str
+            Path of the archive to write
+
+        dtype : str
+            How scores are stored, either 'float16', 'uint8' or 'uint16'. 
+            uint8 and uint16 quantize the scores between 0 and max_value
+            onto the full integer range.
+            Default = 'float16'
+
+        max_value : float
+            Largest score, used to set the quantization scale (1 for 
+            disorder, 100 for pLDDT). Ignored for float16.
+            Default = 1.0
+
+        metadata : dict or None
+            Any JSON-serializable information to store in the header.
+            Default = None
+        """
+        if dtype not in VALID_DTYPES:
+            raise MetapredictError(f'Archive dtype must be one of {VALID_DTYPES}, got {dtype}')
+
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.max_value = max_value
+        self.scale = 1.0
+        if _quantization.is_quantized_dtype(self.dtype):
+            self.scale = _quantization.quantization_scale(self.dtype, max_value)
+        self.metadata = metadata if metadata is not None else {}
+
+        self.ids = []
+        self.id_set = set()
+        self.starts = []
+        self.lengths = []
+        self.n_values = 0
+
+        try:
+            self.fh = open(filename, 'wb')
+        except Exception:
+            raise MetapredictError(f'Unable to write to file destination {filename}')
+
+        # reserve the header, which is written once we know where everything is
+        self.fh.write(b'\0'*HEADER_SIZE)
+
+    def _encode(self, scores):
+        if _quantization.is_quantized_dtype(self.dtype):
+            return _quantization.quantize(scores, self.dtype, self.max_value)
+        return np.asarray(scores).astype(np.float16)
+
+    def _check_new_ids(self, seq_ids):
+        # every ID must be unique, otherwise one entry would hide another
+        seen = set()
+        for seq_id in seq_ids:
+            if seq_id in self.id_set or seq_id in seen:
+                raise MetapredictError(f'Duplicate ID {seq_id}. Every sequence in a score archive must have a unique ID')
+            seen.add(seq_id)
+
+    def add(self, seq_id, scores):
+        """
+        Adds the scores for one sequence.
+
+        Parameters
+        -----------
+        seq_id : str
+            Sequence ID. Converted to a string. Raises a MetapredictError
+            if the ID has already been added.
+
+        scores : array-like
+            Per-residue scores
+        """
+        seq_id = str(seq_id)
+        self._check_new_ids([seq_id])
+
+        values = self._encode(scores)
+        self.fh.write(values.tobytes())
+
+        self.ids.append(seq_id)
+        self.id_set.add(seq_id)
+        self.starts.append(self.n_values)
+        self.lengths.append(len(values))
+        self.n_values = self.n_values + len(values)
+
+    def add_many(self, ragged):
+        """
+        Adds the scores for many sequences at once from a RaggedScores
+        object (as returned by predict() with return_format='ragged'),
+        encoding and writing them as one block. Raises a MetapredictError
+        if any of the IDs has already been added, in which case nothing is
+        written.
+
+        Parameters
+        -----------
+        ragged : RaggedScores
+        """
+        seq_ids = [str(seq_id) for seq_id in ragged.ids]
+        self._check_new_ids(seq_ids)
+
+        values = ragged.values
+        if ragged.scale is not None:
+            values = _quantization.dequantize(values, ragged.scale)
+        self.fh.write(self._encode(values).tobytes())
+
+        self.id_set.update(seq_ids)
+        for i, seq_id in enumerate(seq_ids):
+            self.ids.append(seq_id)
+            self.starts.append(self.n_values + int(ragged.offsets[i]))
+            self.lengths.append(int(ragged.offsets[i+1] - ragged.offsets[i]))
+        self.n_values = self.n_values + len(ragged.values)
+
+    def close(self):
+        """
+        Writes the index and the header and closes the file.
+        """
+        fh = self.fh
+
+        # index arrays, each 8-byte aligned
+        encoded_ids = [i.encode('utf-8') for i in self.ids]
+        id_offsets = np.zeros(len(encoded_ids)+1, dtype=np.uint64)
+        np.cumsum([len(i) for i in encoded_ids], out=id_offsets[1:])
+
+        # sorted hashes, and the entry each one belongs to
+        hashes = np.fromiter((_id_hash(i) for i in encoded_ids), dtype=np.uint64, count=len(encoded_ids))
+        hash_order = np.argsort(hashes, kind='stable').astype(np.uint64)
+
+        sections = {}
+        for name, data in [('starts', np.asarray(self.starts, dtype=np.uint64).tobytes()),
+                           ('lengths', np.asarray(self.lengths, dtype=np.uint32).tobytes()),
+                           ('id_offsets', id_offsets.tobytes()),
+                           ('ids', b''.join(encoded_ids)),
+                           ('hashes', hashes[hash_order].tobytes()),
+                           ('hash_order', hash_order.tobytes())]:
+            position = _align(fh.tell())
+            fh.write(b'\0'*(position - fh.tell()))
+            sections[name] = position
+            fh.write(data)
+
+        header = {'format_version': FORMAT_VERSION,
+                  'dtype': self.dtype.name,
+                  'scale': self.scale,
+                  'n_entries': len(self.ids),
+                  'n_values': self.n_values,
+                  'data_offset': HEADER_SIZE,
+                  'sections': sections,
+                  'metadata': self.metadata}
+        header = json.dumps(header).encode('utf-8')
+        if 16 + len(header) > HEADER_SIZE:
+            raise MetapredictError('Archive metadata is too large to fit in the header')
+
+        fh.seek(0)
+        fh.write(MAGIC)
+        fh.write(np.uint64(len(header)).tobytes())
+        fh.write(header.ljust(HEADER_SIZE - 16))
+        fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.fh.close()
+
+
+class ScoreArchive:
+    """
+    Reads a score archive written by ScoreArchiveWriter. The file is
+    memory-mapped, so opening it only reads the header, and archive[seq_id]
+    finds the ID with a binary search of the index and returns a numpy 
+    view of the stored scores without copying or parsing anything. Use get() to get float32 scores (which
+    also decodes quantized archives).
+    """
+
+    def __init__(self, filename):
+        """
+        Parameters
+        -----------
+        filename : str
+            Path to the archive
+        """
+        try:
+            self.buffer = np.memmap(filename, dtype=np.uint8, mode='r')
+        except Exception:
+            raise MetapredictError(f'Unable to open score archive {filename}')
+
+        if len(self.buffer) < HEADER_SIZE or bytes(self.buffer[:8]) != MAGIC:
+            raise MetapredictError(f'{filename} is not a metapredict score archive')
+
+        header_length = int(self.buffer[8:16].view(np.uint64)[0])
+        header = json.loads(bytes(self.buffer[16:16+header_length]).decode('utf-8'))
+
+        if header['format_version'] > FORMAT_VERSION:
+            raise MetapredictError(f'{filename} was written by a newer version of metapredict (archive format {header["format_version"]})')
+
+        self.filename = filename
+        self.dtype = np.dtype(header['dtype'])
+        self.scale = header['scale']
+        self.metadata = header['metadata']
+
+        n = header['n_entries']
+        self.n_entries = n
+        sections = header['sections']
+        data_offset = header['data_offset']
+
+        self.values = self.buffer[data_offset:data_offset + header['n_values']*self.dtype.itemsize].view(self.dtype)
+        self.starts = self.buffer[sections['starts']:sections['starts'] + 8*n].view(np.uint64)
+        self.lengths = self.buffer[sections['lengths']:sections['lengths'] + 4*n].view(np.uint32)
+
+        self.id_offsets = self.buffer[sections['id_offsets']:sections['id_offsets'] + 8*(n+1)].view(np.uint64)
+        self.id_blob = self.buffer[sections['ids']:sections['ids'] + int(self.id_offsets[-1])]
+        self.hashes = self.buffer[sections['hashes']:sections['hashes'] + 8*n].view(np.uint64)
+        self.hash_order = self.buffer[sections['hash_order']:sections['hash_order'] + 8*n].view(np.uint64)
+
+    def _encoded_id(self, i):
+        return bytes(self.id_blob[int(self.id_offsets[i]):int(self.id_offsets[i+1])])
+
+    def _position(self, seq_id):
+        """
+        Returns the position of an ID in the archive, or None if it is not
+        there. Different IDs can share a hash, so every entry with a 
+        matching hash is checked.
+        """
+        encoded_id = str(seq_id).encode('utf-8')
+        h = np.uint64(_id_hash(encoded_id))
+
+        j = int(np.searchsorted(self.hashes, h))
+        while j < self.n_entries and self.hashes[j] == h:
+            i = int(self.hash_order[j])
+            if self._encoded_id(i) == encoded_id:
+                return i
+            j = j + 1
+        return None
+
+    @property
+    def ids(self):
+        return [self._encoded_id(i).decode('utf-8') for i in range(self.n_entries)]
+
+    def _scores_at(self, i):
+        start = int(self.starts[i])
+        return self.values[start:start + int(self.lengths[i])]
+
+    def __getitem__(self, seq_id):
+        """
+        Returns a view of the stored scores (float16, uint8 or uint16) for an ID.
+        """
+        i = self._position(seq_id)
+        if i is None:
+            raise KeyError(seq_id)
+        return self._scores_at(i)
+
+    def get(self, seq_id):
+        """
+        Returns the scores for an ID as a float32 array. Quantized scores
+        are decoded.
+        """
+        stored = self[seq_id]
+        if _quantization.is_quantized_dtype(self.dtype):
+            return _quantization.dequantize(stored, self.scale)
+        return stored.astype(np.float32)
+
+    def __contains__(self, seq_id):
+        return self._position(seq_id) is not None
+
+    def __len__(self):
+        return self.n_entries
+
+    def __iter__(self):
+        for i in range(self.n_entries):
+            yield self._encoded_id(i).decode('utf-8'), self._scores_at(i)
+
+    def __str__(self):
+        return f"ScoreArchive with {len(self)} sequences ({len(self.values)} residues, {self.dtype.name}) from {self.filename}"
+
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,160 @@
+"""
+Splitting very long sequences into overlapping windows and stitching the
+per-window predictions back together.
+
+This is used to predict sequences that are too long to run in one go on
+the device (e.g. longer than MAX_CUDA_LENGTH on CUDA). Windows are spread
+evenly along the sequence so that every pair of neighbouring windows
+overlaps by at least the requested overlap, and in the overlaps the scores
+are crossfaded (linearly weighted) from one window to the next, so there
+are no discontinuities at the window boundaries.
+"""
+
+import math
+
+import numpy as np
+
+from metapredict.metapredict_exceptions import MetapredictError
+
+
+def check_window_settings(window_length, window_overlap):
+    """
+    Sanity checks the window length and overlap.
+
+    Parameters
+    -----------
+    window_length : int
+        Length of each window
+
+    window_overlap : int
+        Minimum overlap between neighbouring windows
+
+    Returns
+    --------
+    None
+        Raises a MetapredictError if the settings do not make sense
+    """
+    if not isinstance(window_length, int) or window_length < 2:
+        raise MetapredictError(f'window_length must be an integer >= 2, got {window_length}')
+
+    if not isinstance(window_overlap, int) or window_overlap < 0 or window_overlap >= window_length:
+        raise MetapredictError(f'window_overlap must be an integer between 0 and window_length-1, got {window_overlap}')
+
+
+def window_starts(seq_length, window_length, window_overlap):
+    """
+    Works out the start positions of the windows for a sequence.
+
+    Parameters
+    -----------
+    seq_length : int
+        Length of the sequence
+
+    window_length : int
+        Length of each window
+
+    window_overlap : int
+        Minimum overlap between neighbouring windows
+
+    Returns
+    --------
+    list
+        Start positions (0-indexed). The first window starts at 0 and the
+        last window ends at the end of the sequence. If the sequence fits
+        into one window this is just [0].
+    """
+    if seq_length <= window_length:
+        return [0]
+
+    # smallest number of windows such that neighbours overlap by at least window_overlap
+    n_windows = math.ceil((seq_length - window_overlap) / (window_length - window_overlap))
+    n_windows = max(n_windows, 2)
+
+    step = (seq_length - window_length) / (n_windows - 1)
+    return [int(round(i*step)) for i in range(n_windows)]
+
+
+def split_long_sequences(sequences, window_length, window_overlap):
+    """
+    Splits every sequence longer than window_length into overlapping windows.
+
+    Parameters
+    -----------
+    sequences : list
+        List of sequences
+
+    window_length : int
+        Length of each window
+
+    window_overlap : int
+        Minimum overlap between neighbouring windows
+
+    Returns
+    --------
+    tuple
+        (list, dict). The list holds every sequence that is short enough
+        plus every window (without duplicates), i.e. what should actually
+        be predicted. The dict maps each long sequence to a list of its
+        window start positions.
+    """
+    to_predict = []
+    windows = {}
+
+    for s in sequences:
+        if len(s) > window_length:
+            starts = window_starts(len(s), window_length, window_overlap)
+            windows[s] = starts
+            for start in starts:
+                to_predict.append(s[start:start+window_length])
+        else:
+            to_predict.append(s)
+
+    return list(dict.fromkeys(to_predict)), windows
+
+
+def stitch_windows(seq_length, starts, window_scores):
+    """
+    Combines the scores from overlapping windows into a single profile.
+    In each overlap the weight of the outgoing window ramps down linearly
+    while the weight of the incoming window ramps up, so the profile
+    crossfades smoothly from one window to the next.
+
+    Parameters
+    -----------
+    seq_length : int
+        Length of the full sequence
+
+    starts : list
+        Start position of each window, in increasing order
+
+    window_scores : list
+        List of 1D arrays of scores, one per window
+
+    Returns
+    --------
+    np.ndarray
+        Stitched scores for the full sequence
+    """
+    total = np.zeros(seq_length, dtype=np.float64)
+    weight_sum = np.zeros(seq_length, dtype=np.float64)
+
+    for i, (start, scores) in enumerate(zip(starts, window_scores)):
+        n = len(scores)
+        weights = np.ones(n, dtype=np.float64)
+
+        # ramp up over the overlap with the previous window
+        if i > 0:
+            overlap = starts[i-1] + len(window_scores[i-1]) - start
+            if overlap > 0:
+                weights[:overlap] = np.minimum(weights[:overlap], np.arange(1, overlap+1) / (overlap+1))
+
+        # ramp down over the overlap with the next window
+        if i < len(starts) - 1:
+            overlap = start + n - starts[i+1]
+            if overlap > 0:
+                weights[n-overlap:] = np.minimum(weights[n-overlap:], np.arange(overlap, 0, -1) / (overlap+1))
+
+        total[start:start+n] = total[start:start+n] + weights*scores
+        weight_sum[start:start+n] = weight_sum[start:start+n] + weights
+
+    return (total / weight_sum).astype(np.asarray(window_scores[0]).dtype)
@@ -8,7 +8,7 @@
 ##Handles the primary functions
 
 # NOTE - any new functions must be added to this list!
-__all__ =  ['predict_disorder', 'predict_disorder_domains', 'graph_disorder', 'predict_all', 'percent_disorder', 'predict_disorder_fasta', 'graph_disorder_fasta', 'predict_disorder_uniprot', 'graph_disorder_uniprot', 'predict_disorder_domains_uniprot', 'predict_disorder_domains_from_external_scores', 'graph_pLDDT_uniprot', 'predict_pLDDT_uniprot', 'graph_pLDDT_fasta', 'predict_pLDDT_fasta', 'graph_pLDDT', 'predict_pLDDT', 'predict_disorder_caid', 'predict_disorder_batch']
+__all__ =  ['predict_disorder', 'predict_disorder_domains', 'graph_disorder', 'predict_all', 'percent_disorder', 'predict_disorder_fasta', 'graph_disorder_fasta', 'predict_disorder_uniprot', 'graph_disorder_uniprot', 'predict_disorder_domains_uniprot', 'predict_disorder_domains_from_external_scores', 'graph_pLDDT_uniprot', 'predict_pLDDT_uniprot', 'graph_pLDDT_fasta', 'predict_pLDDT_fasta', 'graph_pLDDT', 'predict_pLDDT', 'predict_disorder_caid', 'predict_disorder_batch', 'predict_disorder_iter', 'predict_multi', 'set_memory_cache_size', 'clear_memory_cache', 'memory_cache_stats']
  
 # import packages
 import os
@@ -31,7 +31,13 @@ from metapredict.parameters import DEFAULT_NETWORK, DEFAULT_NETWORK_PLDDT
 # module from the user
 from metapredict.backend.predictor import predict as _predict
 from metapredict.backend.predictor import predict_pLDDT as _predict_pLDDT
+from metapredict.backend.predictor import predict_multi as _predict_multi
+from metapredict.backend.predictor import predict_columnar as _predict_columnar
 from metapredict.backend import meta_tools as _meta_tools
+from metapredict.backend import prediction_cache as _prediction_cache
+from metapredict.backend import score_archive as _score_archive
+from metapredict.backend import quantization as _quantization
+from metapredict.backend.background_writer import BackgroundWriter as _BackgroundWriter
 
 #import stuff for graphing from backend
 from metapredict.backend.meta_graph import graph as _graph
@@ -52,7 +58,8 @@ def predict_disorder(inputs, version=DEFAULT_NETWORK, device=None,
     gap_closure=10, override_folded_domain_minsize=False, print_performance=False, 
     show_progress_bar=False, force_disable_batch=False, 
     disable_pack_n_pad=False, silence_warnings=False, 
-    legacy=False):
+    legacy=False, cache=None, num_workers=1, domain_threads=1, max_tokens=None,
+    window_length=None, window_overlap=500, return_format=None, ragged_dtype='float32'):
     """
     The main function in metapredict. Updated to handle much more advanced
     functionality while maintaining backwards compatibility with previous
@@ -115,13 +122,16 @@ def predict_disorder(inputs, version=DEFAULT_NETWORK, device=None,
         is the latest version as defined in parameters. Alternatively, 'V1', 'V2',
         or 'V3' can be specified to access a specific version of metapredict
 
-    device : int or str 
+    device : int, str or list 
         Identifier for the device to be used for predictions. 
         Possible inputs: 'cpu', 'mps', 'cuda', or an int that corresponds to
         the index of a specific cuda-enabled GPU. If 'cuda' is specified and
         cuda.is_available() returns False, instead of falling back to CPU, 
         metapredict will raise an Exception so you know that you are not
         using CUDA as you were expecting. 
+        For batch predictions, a list of devices (e.g. ['cuda:0', 'cuda:1'])
+        or 'cuda:all' (every visible CUDA GPU) can also be passed, in which
+        case batches are split across the devices.
         Default: None
             When set to None, we will check if there is a cuda-enabled
             GPU. If there is, we will try to use that GPU. 
@@ -244,6 +254,77 @@ def predict_disorder(inputs, version=DEFAULT_NETWORK, device=None,
         True, it will override any version parameter you set. 
         Default: False
 
+    cache : PredictionCache or str
+        Optional on-disk prediction cache. Either a
+        metapredict.PredictionCache object or the path to a cache
+        directory. Sequences already in the cache (for the same network
+        and settings) are not re-predicted, and new predictions are 
+        added to it.
+        Default = None
+
+    num_workers : int
+        Number of CPU worker processes to split batch predictions across
+        when predicting on the CPU. Useful on many-core machines, where a 
+        single process does not make good use of all the cores. Workers
+        are started with 'spawn', which re-imports the calling script, so
+        scripts that use num_workers > 1 must run their predictions under
+        an if __name__ == '__main__': guard.
+        Default = 1
+
+    domain_threads : int
+        Used only if return_domains = True. Number of threads the domain
+        decomposition is split across when many sequences are predicted.
+        Results are identical for any number of threads.
+        Default = 1
+
+    max_tokens : int
+        If set, batches hold as many sequences as fit into max_tokens 
+        padded residues instead of a fixed number of sequences, which keeps
+        throughput high for proteomes with very mixed sequence lengths. If 
+        the device runs out of memory the batch limit is halved and the 
+        batch is retried.
+        Default = None
+
+    window_length : int
+        If set, sequences longer than window_length are split into 
+        overlapping windows of this length, which are predicted separately
+        and stitched back together. If None and predicting on a CUDA 
+        device, sequences longer than MAX_CUDA_LENGTH are windowed 
+        automatically (with a warning) instead of raising an exception. 
+        Each window only sees part of the sequence, so windowed scores 
+        differ from a full-length prediction: on a 20,000 residue sequence,
+        10,000 residue windows gave disorder scores that were off by 0.02
+        on average and by up to 0.26, and 5,000 residue windows by 0.07 on
+        average and by up to 0.74. Use windows as long as the device 
+        allows. Windowed scores are never added to the prediction cache.
+        Default = None
+
+    window_overlap : int
+        Minimum number of residues by which neighbouring windows overlap.
+        Default = 500
+
+    return_format : str
+        If set to 'ragged', a list or dictionary of sequences is returned
+        as a single RaggedScores object instead: one contiguous array with
+        the scores for every sequence (.values), an int64 offsets array 
+        (.offsets) and the IDs (.ids; positions in the input list, or the
+        input dictionary keys). result[id] returns a view into .values. 
+        The returned object is far smaller than per-sequence arrays for 
+        large jobs and maps directly onto Arrow / Parquet list columns. 
+        Note that the scores are packed into it once every prediction is
+        done, so peak memory during the call is not reduced; use 
+        chunk_size with the FASTA functions to bound that. Not available
+        for single sequences or with return_domains=True.
+        Default = None
+
+    ragged_dtype : str
+        dtype of the scores array when return_format='ragged'. Either 
+        'float32' or 'float16', or 'uint8' or 'uint16' to store quantized
+        scores (see metapredict/backend/quantization.py for the scale 
+        factors). For quantized scores, result.scale is the score per 
+        integer step and result.get(id) returns decoded float32 scores.
+        Default = 'float32'
+
     Returns
     --------
      
@@ -281,7 +362,143 @@ def predict_disorder(inputs, version=DEFAULT_NETWORK, device=None,
         override_folded_domain_minsize=override_folded_domain_minsize,
         print_performance=print_performance, show_progress_bar=show_progress_bar,
         force_disable_batch=force_disable_batch, disable_pack_n_pad=disable_pack_n_pad,
-        silence_warnings=silence_warnings)
+        silence_warnings=silence_warnings, cache=cache, num_workers=num_workers,
+        domain_threads=domain_threads, max_tokens=max_tokens, window_length=window_length, window_overlap=window_overlap,
+        return_format=return_format, ragged_dtype=ragged_dtype)
+
+
+# ..........................................................................................
+#
+def predict_disorder_iter(inputs, version=DEFAULT_NETWORK, device=None,
+    normalized=True, round_values=True, return_numpy=True, return_domains=False,
+    disorder_threshold=None, minimum_IDR_size=12, minimum_folded_domain=50,
+    gap_closure=10, buffer_size=1024, cache=None):
+    """
+    Generator version of predict_disorder() for large or unbounded 
+    collections of sequences. Takes any iterable of (id, sequence) pairs 
+    (for example a generator reading from a database or a FASTA file) and 
+    yields results as each buffer of sequences is predicted, so downstream 
+    processing can start straight away and memory use stays flat regardless
+    of how many sequences are passed.
+
+    Internally, up to buffer_size pairs are read from inputs and predicted 
+    together using the batch predictor, which sorts them by length so they
+    are packed efficiently. Results for each buffer are yielded in the 
+    order the pairs were read in. 
+
+    Parameters
+    ------------
+    inputs : iterable
+        Iterable of (id, sequence) pairs. IDs can be any object and do
+        not need to be unique.
+
+    version : string
+        The network to use for prediction. Default is DEFAULT_NETWORK,
+        which is defined at the top of /parameters.
+        Options currently include V1, V2, or V3. 
+
+    device : int or str 
+        Identifier for the device to be used for predictions. 
+        See predict_disorder() for details. 
+        Default: None
+
+    normalized : bool
+        Whether or not to normalize disorder values to between 0 and 1. 
+        Default : True
+    
+    round_values : bool
+        Whether to round the values to 4 decimal places. 
+        Default : True
+
+    return_numpy : bool
+        Whether to return numpy arrays or lists.
+        Default : True
+
+    return_domains : bool
+        If True, yields DisorderObjects instead of disorder scores.
+        Default : False
+
+    disorder_threshold : float
+        Used only if return_domains = True. Threshold used to define 
+        IDRs. If None the default for the network is used.
+        Default : None
+
+    minimum_IDR_size : int
+        Used only if return_domains = True. Defines the smallest possible
+        IDR.
+        Default : 12
+
+    minimum_folded_domain : int
+        Used only if return_domains = True. Defines where we expect the
+        limit of small folded domains to be.
+        Default : 50
+
+    gap_closure : int
+        Used only if return_domains = True. Defines the largest gap that
+        would be 'closed'.
+        Default : 10
+
+    buffer_size : int
+        Maximum number of sequences read from inputs and predicted at 
+        once. Larger buffers make better use of the GPU, smaller buffers
+        give lower latency and memory use.
+        Default : 1024
+
+    cache : PredictionCache or str
+        Optional on-disk prediction cache. See predict_disorder().
+        Default = None
+
+    Yields
+    --------
+    tuple
+        (id, scores) where scores is an np.ndarray or list depending on 
+        return_numpy, or (id, DisorderObject) if return_domains=True.
+    """
+
+    if not isinstance(buffer_size, int) or buffer_size < 1:
+        raise MetapredictError(f'buffer_size must be a positive integer, got {buffer_size}')
+
+    # check version and make sure it is an uppercase string
+    version = _meta_tools.valid_version(version, 'disorder')
+
+    def _predict_buffer(ids, seqs):
+        # predict the buffer as a list, which keeps the input order and any
+        # duplicate IDs or sequences
+        for s in seqs:
+            _meta_tools.raise_exception_on_zero_length(s)
+
+        results = _predict(seqs, version=version, use_device=device,
+            normalized=normalized, round_values=round_values, 
+            return_numpy=return_numpy, return_domains=return_domains,
+            disorder_threshold=disorder_threshold, minimum_IDR_size=minimum_IDR_size,
+            minimum_folded_domain=minimum_folded_domain, gap_closure=gap_closure,
+            cache=cache)
+
+        for seq_id, r in zip(ids, results):
+            if return_domains:
+                yield (seq_id, r)
+            else:
+                yield (seq_id, r[1])
+
+    ids = []
+    seqs = []
+    for pair in inputs:
+        try:
+            seq_id, seq = pair
+        except (TypeError, ValueError):
+            raise MetapredictError(f'predict_disorder_iter expects an iterable of (id, sequence) pairs, but got {pair}')
+
+        ids.append(seq_id)
+        seqs.append(seq)
+
+        if len(seqs) == buffer_size:
+            yield from _predict_buffer(ids, seqs)
+            ids = []
+            seqs = []
+
+    # and any leftover sequences
+    if len(seqs) > 0:
+        yield from _predict_buffer(ids, seqs)
 
 
 # ..........................................................................................
@@ -293,7 +510,8 @@ def predict_disorder_domains_from_external_scores(disorder,
                                                   minimum_folded_domain=50,
                                                   gap_closure=10,
                                                   override_folded_domain_minsize=False,
-                                                  return_numpy=True):
+                                                  return_numpy=True,
+                                                  domain_threads=1):
     
     """
     This function takes in disorder scores generated from another predictor 
@@ -309,14 +527,24 @@ def predict_disorder_domains_from_external_scores(disorder,
     gap_closure.
 
 
+    A list of disorder profiles can also be passed, in which case the 
+    domain decomposition is run for every profile in one batched call 
+    (see domain_definition.get_domains_batch()) and a list of 
+    DisorderObjects is returned. This is much faster than calling this 
+    function once per profile when there are many profiles.
+
+
     Parameters
     -------------
     disorder : list
-        A list of per-residue disorder scores.
+        A list of per-residue disorder scores, or a list of such lists
+        (or np.ndarrays) for many sequences.
 
-    sequence : str
+    sequence : str or list
         The protein sequence as a string. If no sequence is passed, 
         calling DisorderObject.sequence will return an fake sequence.
+        If disorder is a list of profiles this must be None or a list
+        of sequences in the same order.
 
     disorder_threshold : float
         Value that defines what 'disordered' is based on the input predictor 
@@ -366,10 +594,16 @@ def predict_disorder_domains_from_external_scores(disorder,
         Flag which if set to true means all numerical types are returned
         as numpy.ndlist. Default is True
 
+    domain_threads : int
+        Used only if a list of disorder profiles is passed. Number of 
+        threads the domain decomposition is split across. Results are 
+        identical for any number of threads. Default = 1
+
     Returns
     ---------
-    DisorderObject
-        Returns a DisorderObject. DisorderObject has 7 dot variables:
+    DisorderObject or list
+        Returns a DisorderObject (or a list of DisorderObjects if a list 
+        of disorder profiles was passed). DisorderObject has 7 dot variables:
 
         .sequence : str    
             Amino acid sequence 
@@ -394,6 +628,39 @@ def predict_disorder_domains_from_external_scores(disorder,
     # sanity check
     _meta_tools.raise_exception_on_zero_length(disorder)
 
+    # many disorder profiles are decomposed in one batched call
+    if isinstance(disorder, (list, tuple)) and isinstance(disorder[0], (list, tuple, np.ndarray)):
+        if sequence is None:
+            sequence = ['A'*len(d) for d in disorder]
+        elif isinstance(sequence, str) or len(sequence) != len(disorder):
+            raise MetapredictError('When passing a list of disorder profiles, sequence must be None or a list with one sequence per profile')
+
+        if not isinstance(domain_threads, int) or domain_threads < 1:
+            raise MetapredictError(f'domain_threads must be a positive integer, got {domain_threads}')
+
+        offsets = np.zeros(len(disorder)+1, dtype=np.int64)
+        for i, d in enumerate(disorder):
+            _meta_tools.raise_exception_on_zero_length(d)
+            if len(sequence[i]) != len(d):
+                raise MetapredictError(f'Disorder and sequence info are not length matched for entry {i} [disorder length = {len(d)}, sequence length = {len(sequence[i])}]')
+            offsets[i+1] = offsets[i] + len(d)
+
+        _, idrs, idr_offsets, fds, fd_offsets = _domain_definition.get_domains_batch(np.concatenate([np.asarray(d, dtype=np.float64) for d in disorder]),
+                                                                                     offsets,
+                                                                                     disorder_threshold=disorder_threshold,
+                                                                                     minimum_IDR_size=minimum_IDR_size,
+                                                                                     minimum_folded_domain=minimum_folded_domain,
+                                                                                     gap_closure=gap_closure,
+                                                                                     override_folded_domain_minsize=override_folded_domain_minsize,
+                                                                                     threads=domain_threads)
+        idrs = idrs.tolist()
+        fds = fds.tolist()
+
+        return [_DisorderObject(sequence[i], disorder[i],
+                                idrs[idr_offsets[i]:idr_offsets[i+1]],
+                                fds[fd_offsets[i]:fd_offsets[i+1]],
+                                return_numpy=return_numpy) for i in range(len(disorder))]
+
     # if a sequence was provided check it makes sense in terms of type and length...
     if sequence is not None:
         try:
@@ -593,21 +860,60 @@ def predict_disorder_domains(sequence,
 
 # ..........................................................................................
 #
-def predict_all(sequence):
+def predict_all(sequence, device=None, show_progress_bar=False, max_tokens=None,
+    window_length=None, window_overlap=500):
     """
     Function to return all three disorder predictions (V1, V2, V3 for
-    (metapredict), and predicted pLDDT (V1, V2). Returns as a tuple of numpy 
-    arrays, with ppLDDT returned as normalized between 0 and 1.
+    (metapredict), and predicted pLDDT (V1, V2). For a single sequence, 
+    returns a tuple of numpy arrays, with ppLDDT returned as normalized 
+    between 0 and 1. 
+
+    Also takes a list, dictionary or any iterable of (id, sequence) pairs,
+    in which case the sequences are batch predicted and a ColumnarScores
+    object is returned. This holds one concatenated float32 buffer per 
+    network (in .scores) and an offsets array (in .offsets), so scores for
+    millions of sequences do not need millions of small arrays. Use 
+    result[seq_id] or result.get(seq_id, network) to get the scores for one
+    sequence; for a list the IDs are the positions in the list.
 
     Parameters
     ------------
-    sequence : str 
-        Input amino acid sequence (as string) to be predicted.
+    sequence : str, list, dict or iterable
+        Input amino acid sequence (as string) to be predicted, or a 
+        collection of sequences to batch predict.
+
+    device : int or str
+        Identifier for the device to be used for batch predictions. 
+        Single sequences are always predicted on the CPU. Possible inputs:
+        'cpu', 'mps', 'cuda', 'cuda:int', or an int that corresponds to the
+        index of a specific cuda-enabled GPU.
+        Default = None
+
+    show_progress_bar : bool
+        Whether to show a progress bar for batch predictions.
+        Default = False
+
+    max_tokens : int
+        If set, batches hold as many sequences as fit into max_tokens 
+        padded residues instead of a fixed number of sequences.
+        Default = None
+
+    window_length : int
+        If set, sequences longer than window_length are split into 
+        overlapping windows and stitched back together, as in 
+        predict_multi(). If None and predicting on a CUDA device, sequences
+        longer than MAX_CUDA_LENGTH are windowed automatically (with a 
+        warning). Only used for batch predictions.
+        Default = None
+
+    window_overlap : int
+        Minimum number of residues by which neighbouring windows overlap.
+        Default = 500
 
     Returns
     --------
      
-    tuple with five np.ndarrays:
+    tuple with five np.ndarrays (single sequence):
 
         [0] - normalized ppLDDT scores using V1 pLDDT predictor (previously from AlphaPredict)
         [1] - normalized ppLDDT scores using V2 pLDDT predictor
@@ -615,19 +921,129 @@ def predict_all(sequence):
         [3] - meta disorder (updated metapredict disorder) - V2
         [4] - meta disorder (updated metapredict disorder) - V3
 
+    ColumnarScores (batch):
+        Networks are named 'pLDDT_V1', 'pLDDT_V2', 'disorder_V1', 
+        'disorder_V2' and 'disorder_V3'.
+
     """
+    networks = ['pLDDT_V1', 'pLDDT_V2', 'disorder_V1', 'disorder_V2', 'disorder_V3']
+
+    # batch predictions
+    if not isinstance(sequence, str):
+        return _predict_columnar(sequence, networks=networks, use_device=device,
+                                 normalized=True, return_decimals=True, 
+                                 show_progress_bar=show_progress_bar, max_tokens=max_tokens,
+                                 window_length=window_length, window_overlap=window_overlap)
 
     # sanity check
     _meta_tools.raise_exception_on_zero_length(sequence)
 
-    # compute pLDDT and metapredict disorder
-    v1 = _predict(sequence, version='V1')
-    v2 = _predict(sequence, version='V2')
-    v3 = _predict(sequence, version='V3')
-    ppLDDT_v1 = _predict_pLDDT(sequence, return_numpy=True, normalized=True, return_decimals=True, version='v1')
-    ppLDDT_v2 = _predict_pLDDT(sequence, return_numpy=True, normalized=True, return_decimals=True, version='v2')
+    # compute pLDDT and metapredict disorder. The sequence is encoded once
+    # and all five networks are run on it
+    scores = _predict_multi(sequence, networks=networks,
+                            normalized=True, return_numpy=True, return_decimals=True)
     
-    return (ppLDDT_v1, ppLDDT_v2, v1, v2, v3)
+    return (scores['pLDDT_V1'], scores['pLDDT_V2'], scores['disorder_V1'], scores['disorder_V2'], scores['disorder_V3'])
+
+
+
+# ..........................................................................................
+#
+def predict_multi(inputs, networks=None, device=None, normalized=True, round_values=True,
+    return_numpy=True, return_decimals=False, show_progress_bar=False, max_tokens=None,
+    window_length=None, window_overlap=500, silence_warnings=False):
+    """
+    Function to run several networks - any combination of the disorder 
+    networks (V1, V2, V3) and the pLDDT networks (V1, V2) - over the same
+    sequence or sequences in one go. Each sequence (or batch of sequences)
+    is encoded once and every network is run over the same input, which is
+    faster than calling predict_disorder() and predict_pLDDT() separately.
+
+    Parameters
+    ------------
+    inputs : str, list or dict
+        A single sequence, a list of sequences or a dictionary where 
+        values are sequences.
+
+    networks : list
+        Names of the networks to run. Names are the type of network
+        followed by the version, i.e. 'disorder_V1', 'disorder_V2',
+        'disorder_V3', 'pLDDT_V1' or 'pLDDT_V2'. If None, the default 
+        disorder and pLDDT networks are used.
+        Default = None
+
+    device : int or str
+        Identifier for the device to be used for predictions of lists
+        and dictionaries. Single sequences are always predicted on the 
+        CPU. Possible inputs: 'cpu', 'mps', 'cuda', 'cuda:int', or an int 
+        that corresponds to the index of a specific cuda-enabled GPU.
+        Default = None
+
+    normalized : bool
+        Whether to clip disorder scores to between 0 and 1 and pLDDT 
+        scores to between 0 and 100 (or 0 and 1 if return_decimals=True).
+        Default = True
+
+    round_values : bool
+        Whether to round scores to 4 decimal places.
+        Default = True
+
+    return_numpy : bool
+        Whether to return numpy arrays (True) or lists (False).
+        Default = True
+
+    return_decimals : bool
+        Whether pLDDT scores are returned as decimals between 0 and 1 
+        rather than between 0 and 100. Does not affect disorder scores.
+        Default = False
+
+    show_progress_bar : bool
+        Whether to show a progress bar for lists and dictionaries.
+        Default = False
+
+    max_tokens : int
+        If set, batches hold as many sequences as fit into max_tokens 
+        padded residues instead of a fixed number of sequences.
+        Default = None
+
+    window_length : int
+        If set, sequences longer than window_length are split into 
+        overlapping windows which are predicted with the rest of the batch
+        and stitched back together, as in predict_disorder(). If None and
+        predicting on a CUDA device, sequences longer than MAX_CUDA_LENGTH
+        are windowed automatically (with a warning). Windowed scores differ
+        from a full-length prediction; see predict_disorder() for how much.
+        Only used for lists and dictionaries.
+        Default = None
+
+    window_overlap : int
+        Minimum number of residues by which neighbouring windows overlap.
+        Default = 500
+
+    silence_warnings : bool
+        Whether to silence warnings.
+        Default = False
+
+    Returns
+    --------
+    dict or list
+        If a single sequence was passed, a dictionary mapping each network
+        name (e.g. 'disorder_V3') to its scores. If a list was passed, a 
+        list in the same order where each element is 
+        [sequence, dictionary of scores]. If a dictionary was passed, a 
+        dictionary with the same keys where each value is 
+        [sequence, dictionary of scores].
+
+    """
+
+    # sanity check
+    _meta_tools.raise_exception_on_zero_length(inputs)
+
+    return _predict_multi(inputs, networks=networks, use_device=device,
+        normalized=normalized, round_values=round_values, return_numpy=return_numpy,
+        return_decimals=return_decimals, show_progress_bar=show_progress_bar,
+        max_tokens=max_tokens, window_length=window_length, window_overlap=window_overlap,
+        silence_warnings=silence_warnings)
 
 
 
@@ -646,7 +1062,13 @@ def predict_disorder_batch(input_sequences,
                                 gap_closure=10,
                                 override_folded_domain_minsize=False,
                                 show_progress_bar = True,
-                                disable_batch = False):
+                                disable_batch = False,
+                                num_workers = 1,
+                                max_tokens = None,
+                                window_length = None,
+                                window_overlap = 500,
+                                return_format = None,
+                                ragged_dtype = 'float32'):
 
     """
     Batch mode predictor which takes advantage of PyTorch
@@ -675,13 +1097,16 @@ def predict_disorder_batch(input_sequences,
         which is defined at the top of /parameters.
         Options currently include V1, V2, or V3. 
 
-    device : int or str 
+    device : int, str or list 
         Identifier for the device to be used for predictions. 
         Possible inputs: 'cpu', 'mps', 'cuda', or an int that corresponds to
         the index of a specific cuda-enabled GPU. If 'cuda' is specified and
         cuda.is_available() returns False, instead of falling back to CPU, 
         metapredict will raise an Exception so you know that you are not
         using CUDA as you were expecting. 
+        For batch predictions, a list of devices (e.g. ['cuda:0', 'cuda:1'])
+        or 'cuda:all' (every visible CUDA GPU) can also be passed, in which
+        case batches are split across the devices.
         Default: None
             When set to None, we will check if there is a cuda-enabled
             GPU. If there is, we will try to use that GPU. 
@@ -779,6 +1204,63 @@ def predict_disorder_batch(input_sequences,
         sequences individually.
         Default = False    
 
+    num_workers : int
+        Number of CPU worker processes to split batch predictions across
+        when predicting on the CPU. Useful on many-core machines, where a 
+        single process does not make good use of all the cores. Workers
+        are started with 'spawn', which re-imports the calling script, so
+        scripts that use num_workers > 1 must run their predictions under
+        an if __name__ == '__main__': guard.
+        Default = 1
+
+    max_tokens : int
+        If set, batches hold as many sequences as fit into max_tokens 
+        padded residues instead of a fixed number of sequences, which keeps
+        throughput high for proteomes with very mixed sequence lengths. If 
+        the device runs out of memory the batch limit is halved and the 
+        batch is retried.
+        Default = None
+
+    window_length : int
+        If set, sequences longer than window_length are split into 
+        overlapping windows of this length, which are predicted separately
+        and stitched back together. If None and predicting on a CUDA 
+        device, sequences longer than MAX_CUDA_LENGTH are windowed 
+        automatically (with a warning) instead of raising an exception. 
+        Each window only sees part of the sequence, so windowed scores 
+        differ from a full-length prediction: on a 20,000 residue sequence,
+        10,000 residue windows gave disorder scores that were off by 0.02
+        on average and by up to 0.26, and 5,000 residue windows by 0.07 on
+        average and by up to 0.74. Use windows as long as the device 
+        allows. Windowed scores are never added to the prediction cache.
+        Default = None
+
+    window_overlap : int
+        Minimum number of residues by which neighbouring windows overlap.
+        Default = 500
+
+    return_format : str
+        If set to 'ragged', a list or dictionary of sequences is returned
+        as a single RaggedScores object instead: one contiguous array with
+        the scores for every sequence (.values), an int64 offsets array 
+        (.offsets) and the IDs (.ids; positions in the input list, or the
+        input dictionary keys). result[id] returns a view into .values. 
+        The returned object is far smaller than per-sequence arrays for 
+        large jobs and maps directly onto Arrow / Parquet list columns. 
+        Note that the scores are packed into it once every prediction is
+        done, so peak memory during the call is not reduced; use 
+        chunk_size with the FASTA functions to bound that. Not available
+        for single sequences or with return_domains=True.
+        Default = None
+
+    ragged_dtype : str
+        dtype of the scores array when return_format='ragged'. Either 
+        'float32' or 'float16', or 'uint8' or 'uint16' to store quantized
+        scores (see metapredict/backend/quantization.py for the scale 
+        factors). For quantized scores, result.scale is the score per 
+        integer step and result.get(id) returns decoded float32 scores.
+        Default = 'float32'
+
     Returns
     -------------
     dict or list
@@ -825,7 +1307,13 @@ def predict_disorder_batch(input_sequences,
                         override_folded_domain_minsize=False,
                         gap_closure = gap_closure,
                         show_progress_bar = show_progress_bar,
-                        force_disable_batch = disable_batch)
+                        force_disable_batch = disable_batch,
+                        num_workers = num_workers,
+                        max_tokens = max_tokens,
+                        window_length = window_length,
+                        window_overlap = window_overlap,
+                        return_format = return_format,
+                        ragged_dtype = ragged_dtype)
 
 
 
@@ -946,7 +1434,9 @@ def graph_disorder(sequence,
 def predict_pLDDT(inputs, pLDDT_version=DEFAULT_NETWORK_PLDDT, return_decimals=False,
     device=None, normalized=True, round_values=True, return_numpy=True,
     print_performance=False, show_progress_bar=False, force_disable_batch=False,
-    disable_pack_n_pad=False, silence_warnings=False, return_as_disorder_score=False):
+    disable_pack_n_pad=False, silence_warnings=False, return_as_disorder_score=False,
+    cache=None, num_workers=1, max_tokens=None, window_length=None, window_overlap=500,
+    return_format=None, ragged_dtype='float32'):
     """
     Function to return predicted pLDDT scores. pLDDT scores are the scores
     reported by AlphaFold2 (AF2) that provide a measure of the confidence 
@@ -972,13 +1462,16 @@ def predict_pLDDT(inputs, pLDDT_version=DEFAULT_NETWORK_PLDDT, return_decimals=F
         will be between 0 and 1. 
         Default is False. 
 
-    device : int or str 
+    device : int, str or list 
         Identifier for the device to be used for predictions. 
         Possible inputs: 'cpu', 'mps', 'cuda', or an int that corresponds to
         the index of a specific cuda-enabled GPU. If 'cuda' is specified and
         cuda.is_available() returns False, instead of falling back to CPU, 
         metapredict will raise an Exception so you know that you are not
         using CUDA as you were expecting. 
+        For batch predictions, a list of devices (e.g. ['cuda:0', 'cuda:1'])
+        or 'cuda:all' (every visible CUDA GPU) can also be passed, in which
+        case batches are split across the devices.
         Default: None
             When set to None, we will check if there is a cuda-enabled
             GPU. If there is, we will try to use that GPU. 
@@ -1034,6 +1527,71 @@ def predict_pLDDT(inputs, pLDDT_version=DEFAULT_NETWORK_PLDDT, return_decimals=F
         to generate the scores that were combined with legacy metapredict to make
         V2 and V3. 
 
+    cache : PredictionCache or str
+        Optional on-disk prediction cache. Either a
+        metapredict.PredictionCache object or the path to a cache
+        directory. Sequences already in the cache (for the same network
+        and settings) are not re-predicted, and new predictions are 
+        added to it.
+        Default = None
+
+    num_workers : int
+        Number of CPU worker processes to split batch predictions across
+        when predicting on the CPU. Useful on many-core machines, where a 
+        single process does not make good use of all the cores. Workers
+        are started with 'spawn', which re-imports the calling script, so
+        scripts that use num_workers > 1 must run their predictions under
+        an if __name__ == '__main__': guard.
+        Default = 1
+
+    max_tokens : int
+        If set, batches hold as many sequences as fit into max_tokens 
+        padded residues instead of a fixed number of sequences, which keeps
+        throughput high for proteomes with very mixed sequence lengths. If 
+        the device runs out of memory the batch limit is halved and the 
+        batch is retried.
+        Default = None
+
+    window_length : int
+        If set, sequences longer than window_length are split into 
+        overlapping windows of this length, which are predicted separately
+        and stitched back together. If None and predicting on a CUDA 
+        device, sequences longer than MAX_CUDA_LENGTH are windowed 
+        automatically (with a warning) instead of raising an exception. 
+        Each window only sees part of the sequence, so windowed scores 
+        differ from a full-length prediction: on a 20,000 residue sequence,
+        10,000 residue windows gave disorder scores that were off by 0.02
+        on average and by up to 0.26, and 5,000 residue windows by 0.07 on
+        average and by up to 0.74. Use windows as long as the device 
+        allows. Windowed scores are never added to the prediction cache.
+        Default = None
+
+    window_overlap : int
+        Minimum number of residues by which neighbouring windows overlap.
+        Default = 500
+
+    return_format : str
+        If set to 'ragged', a list or dictionary of sequences is returned
+        as a single RaggedScores object instead: one contiguous array with
+        the scores for every sequence (.values), an int64 offsets array 
+        (.offsets) and the IDs (.ids; positions in the input list, or the
+        input dictionary keys). result[id] returns a view into .values. 
+        The returned object is far smaller than per-sequence arrays for 
+        large jobs and maps directly onto Arrow / Parquet list columns. 
+        Note that the scores are packed into it once every prediction is
+        done, so peak memory during the call is not reduced; use 
+        chunk_size with the FASTA functions to bound that. Not available
+        for single sequences or with return_domains=True.
+        Default = None
+
+    ragged_dtype : str
+        dtype of the scores array when return_format='ragged'. Either 
+        'float32' or 'float16', or 'uint8' or 'uint16' to store quantized
+        scores (see metapredict/backend/quantization.py for the scale 
+        factors). For quantized scores, result.scale is the score per 
+        integer step and result.get(id) returns decoded float32 scores.
+        Default = 'float32'
+
     Returns
     --------
     
@@ -1060,7 +1618,14 @@ def predict_pLDDT(inputs, pLDDT_version=DEFAULT_NETWORK_PLDDT, return_decimals=F
             force_disable_batch=force_disable_batch,
             disable_pack_n_pad = disable_pack_n_pad,
             silence_warnings = silence_warnings,
-            return_as_disorder_score=return_as_disorder_score)
+            return_as_disorder_score=return_as_disorder_score,
+            cache=cache,
+            num_workers=num_workers,
+            max_tokens=max_tokens,
+            window_length=window_length,
+            window_overlap=window_overlap,
+            return_format=return_format,
+            ragged_dtype=ragged_dtype)
 
 
 # ..........................................................................................
@@ -1265,7 +1830,13 @@ def predict_disorder_fasta(filepath,
                            invalid_sequence_action='convert',
                            version=DEFAULT_NETWORK,
                            device=None,
-                           show_progress_bar=True):
+                           show_progress_bar=True,
+                           cache=None,
+                           chunk_size=None,
+                           output_format=None,
+                           include_idrs=False,
+                           archive_dtype='float16',
+                           quantize=None):
     """
     Function to read in a .fasta file from a specified filepath.
     Returns a dictionary of disorder values where the key is the 
@@ -1316,6 +1887,59 @@ def predict_disorder_fasta(filepath,
         Flag which, if set to True, means a progress bar is printed as 
         predictions are made, while if False no progress bar is printed.
 
+    cache : PredictionCache or str
+        Optional on-disk prediction cache. Either a
+        metapredict.PredictionCache object or the path to a cache
+        directory. Sequences already in the cache (for the same network
+        and settings) are not re-predicted, and new predictions are 
+        added to it.
+        Default = None
+
+    chunk_size : int
+        If set, the FASTA file is read and predicted chunk_size sequences
+        at a time and, if output_file is set, each chunk is written out 
+        as soon as it is done. This keeps memory use bounded by the chunk 
+        size rather than the size of the file, so should be used for 
+        proteome-scale (or larger) files. Note that in this mode duplicate 
+        FASTA headers are only detected (and raise an exception) within 
+        a chunk. If None the whole file is read at once.
+        Default = None
+
+    output_format : str
+        Format of output_file, either 'csv', 'parquet' or 'archive'. Parquet
+        files have one row per sequence with columns id, sequence, length 
+        and scores (a list of float32 values), and are written one row 
+        group per chunk when chunk_size is set. Parquet output requires 
+        pyarrow. 'archive' writes a compact binary score archive that can 
+        be opened with metapredict.ScoreArchive, which memory-maps the 
+        file and returns the scores for any ID without parsing. If None,
+        the format is inferred from the output_file extension (.parquet or
+        .pq for Parquet, .mpsa for an archive, otherwise CSV).
+        Default = None
+
+    include_idrs : bool
+        If True and writing Parquet, an extra idrs column is added with the
+        [start, end) boundaries of each IDR, found with the default 
+        settings of predict_disorder_domains().
+        Default = False
+
+    archive_dtype : str
+        How scores are stored when output_format='archive'. Either 
+        'float16', 'uint8' (scores quantized to steps of 1/255) or 'uint16'
+        (steps of 1/65535). Quantized archives require normalized=True.
+        Default = 'float16'
+
+    quantize : str
+        If set to 'uint8' or 'uint16', scores are written (or returned) as 
+        quantized unsigned integers instead of floats; a value q represents
+        the score q/255 (uint8) or q/65535 (uint16). Applies to every 
+        output format: CSV files and returned dictionaries hold the integer
+        values, Parquet files store a list<uint8> or list<uint16> scores 
+        column with the scale in the file metadata, and for score archives
+        it sets the archive dtype. Requires normalized=True. See 
+        metapredict/backend/quantization.py for decoding.
+        Default = None
+
     Returns
     --------
 
@@ -1342,6 +1966,39 @@ def predict_disorder_fasta(filepath,
     if not os.path.isfile(test_data_file):
         raise FileNotFoundError(f'Datafile [{filepath}] does not exist.')
 
+    if quantize is not None:
+        _quantization.check_quantized_dtype(quantize)
+        if normalized == False:
+            raise MetapredictError('Quantized scores require normalized=True, because scores are quantized between 0 and 1')
+
+    # score archives and columnar output are written by their own paths
+    output_format = _meta_tools.get_output_format(output_format, output_file)
+    if output_format == 'archive':
+        if quantize is not None:
+            archive_dtype = quantize
+        metadata = {'prediction_type': 'disorder', 'version': version,
+                    'weights': metapredict_networks[version]['weights'], 'normalized': normalized}
+        return _predict_fasta_to_archive(_predict, filepath, chunk_size, invalid_sequence_action, output_file,
+                                         archive_dtype=archive_dtype, metadata=metadata,
+                                         version=version, normalized=normalized,
+                                         show_progress_bar=show_progress_bar, use_device=device, cache=cache)
+
+    if output_format == 'parquet':
+        idr_threshold = None
+        if include_idrs:
+            idr_threshold = metapredict_networks[version]['parameters']['disorder_threshold']
+        return _predict_fasta_to_parquet(_predict, filepath, chunk_size, invalid_sequence_action, output_file,
+                                         idr_threshold=idr_threshold, quantize=quantize, max_value=1.0,
+                                         version=version, normalized=normalized,
+                                         show_progress_bar=show_progress_bar, use_device=device, cache=cache)
+
+    # if streaming, read, predict and write the file a chunk at a time
+    if chunk_size is not None:
+        return _predict_fasta_in_chunks(_predict, filepath, chunk_size, invalid_sequence_action, output_file,
+                                        quantize=quantize, max_value=1.0,
+                                        version=version, normalized=normalized, return_numpy=False,
+                                        show_progress_bar=show_progress_bar, use_device=device, cache=cache)
+
     # get seqs via protfasta
     protfasta_seqs = _protfasta.read_fasta(filepath, invalid_sequence_action = invalid_sequence_action)
 
@@ -1349,7 +2006,10 @@ def predict_disorder_fasta(filepath,
     disorder_dict = _predict(protfasta_seqs, version=version, 
                             normalized=normalized, return_numpy=False,
                             show_progress_bar=show_progress_bar, 
-                            use_device=device)
+                            use_device=device, cache=cache)
+
+    if quantize is not None:
+        disorder_dict = _quantize_predictions(disorder_dict, quantize, max_value=1.0)
 
     # if we did not request an output file 
     if output_file is None:
@@ -1368,7 +2028,11 @@ def predict_pLDDT_fasta(filepath,
                         invalid_sequence_action='convert',
                         pLDDT_version=DEFAULT_NETWORK_PLDDT,
                         device=None,
-                        show_progress_bar=True):
+                        show_progress_bar=True,
+                        cache=None,
+                        chunk_size=None,
+                        output_format=None,
+                        quantize=None):
     """
     Function to read in a .fasta file from a specified filepath.
     Returns a dictionary of pLDDT values where the key is the 
@@ -1414,6 +2078,43 @@ def predict_pLDDT_fasta(filepath,
         Flag which, if set to True, means a progress bar is printed as 
         predictions are made, while if False no progress bar is printed.
 
+    cache : PredictionCache or str
+        Optional on-disk prediction cache. Either a
+        metapredict.PredictionCache object or the path to a cache
+        directory. Sequences already in the cache (for the same network
+        and settings) are not re-predicted, and new predictions are 
+        added to it.
+        Default = None
+
+    chunk_size : int
+        If set, the FASTA file is read and predicted chunk_size sequences
+        at a time and, if output_file is set, each chunk is written out 
+        as soon as it is done. This keeps memory use bounded by the chunk 
+        size rather than the size of the file, so should be used for 
+        proteome-scale (or larger) files. Note that in this mode duplicate 
+        FASTA headers are only detected (and raise an exception) within 
+        a chunk. If None the whole file is read at once.
+        Default = None
+
+    output_format : str
+        Format of output_file, either 'csv' or 'parquet'. Parquet files 
+        have one row per sequence with columns id, sequence, length and 
+        scores (a list of float32 values), and are written one row group
+        per chunk when chunk_size is set. Parquet output requires pyarrow.
+        If None, the format is inferred from the output_file extension 
+        (.parquet or .pq for Parquet, otherwise CSV).
+        Default = None
+
+    quantize : str
+        If set to 'uint8' or 'uint16', scores are written (or returned) as 
+        quantized unsigned integers instead of floats; a value q represents
+        the pLDDT score q*100/255 (uint8) or q*100/65535 (uint16). CSV files
+        and returned dictionaries hold the integer values, and Parquet 
+        files store a list<uint8> or list<uint16> scores column with the 
+        scale in the file metadata. See metapredict/backend/quantization.py
+        for decoding.
+        Default = None
+
     Returns
     --------
 
@@ -1434,17 +2135,42 @@ def predict_pLDDT_fasta(filepath,
     if not os.path.isfile(test_data_file):
         raise FileNotFoundError(f'Datafile does not exist.')
 
-    protfasta_seqs = _protfasta.read_fasta(filepath, invalid_sequence_action = invalid_sequence_action)
-
     # check version and make sure it is an uppercase string
     pLDDT_version = _meta_tools.valid_version(pLDDT_version, 'pLDDT')
 
+    if quantize is not None:
+        _quantization.check_quantized_dtype(quantize)
+
+    # columnar output is written by its own path
+    output_format = _meta_tools.get_output_format(output_format, output_file)
+    if output_format == 'archive':
+        raise MetapredictError("Score archives are only available for disorder predictions; use output_format='csv' or 'parquet'")
+
+    if output_format == 'parquet':
+        return _predict_fasta_to_parquet(_predict_pLDDT, filepath, chunk_size, invalid_sequence_action, output_file,
+                                         quantize=quantize, max_value=100.0,
+                                         version=pLDDT_version,
+                                         show_progress_bar=show_progress_bar, use_device=device, cache=cache)
+
+    # if streaming, read, predict and write the file a chunk at a time
+    if chunk_size is not None:
+        return _predict_fasta_in_chunks(_predict_pLDDT, filepath, chunk_size, invalid_sequence_action, output_file,
+                                        quantize=quantize, max_value=100.0,
+                                        version=pLDDT_version, return_numpy=False,
+                                        show_progress_bar=show_progress_bar, use_device=device, cache=cache)
+
+    protfasta_seqs = _protfasta.read_fasta(filepath, invalid_sequence_action = invalid_sequence_action)
+
     # new predict_pLDDT function can handle string, list, or dict. 
     confidence_dict = _predict_pLDDT(protfasta_seqs, 
                                     version=pLDDT_version, 
                                     return_numpy=False, 
                                     show_progress_bar=show_progress_bar, 
-                                    use_device=device)
+                                    use_device=device,
+                                    cache=cache)
+
+    if quantize is not None:
+        confidence_dict = _quantize_predictions(confidence_dict, quantize, max_value=100.0)
 
     # if we did not request an output file 
     if output_file is None:
@@ -1455,6 +2181,236 @@ def predict_pLDDT_fasta(filepath,
         _meta_tools.write_csv(confidence_dict, output_file)
 
 
+# ..........................................................................................
+#
+def _predict_fasta_in_chunks(predict_function, filepath, chunk_size, invalid_sequence_action, output_file, quantize=None, max_value=1.0, **kwargs):
+    """
+    Internal function used by predict_disorder_fasta() and predict_pLDDT_fasta()
+    to predict a FASTA file chunk_size sequences at a time. If output_file is
+    set, each chunk is appended to the .csv file on a background thread 
+    while the next chunk is predicted, so only a few chunks are ever held
+    in memory.
+
+    Parameters
+    -------------
+    predict_function : function
+        Either the disorder or the pLDDT batch predictor
+
+    filepath : str 
+        Path to the .fasta file
+
+    chunk_size : int
+        Number of sequences to read and predict at a time
+
+    invalid_sequence_action : str
+        Passed to protfasta
+
+    output_file : str or None
+        .csv file to write to, or None to return a dictionary
+
+    quantize : str or None
+        If set, scores are quantized to this dtype ('uint8' or 'uint16')
+
+    max_value : float
+        Largest possible score, used for quantization
+
+    **kwargs
+        Passed to predict_function
+
+    Returns
+    --------
+    dict or None
+        Dictionary of sequence ID to scores if output_file is None, 
+        otherwise None
+    """
+
+    return_dict = {}
+
+    # truncate (or create) the output file up front so an empty FASTA file
+    # still gives an empty .csv file and each chunk can simply be appended
+    if output_file is not None:
+        _meta_tools.write_csv({}, output_file)
+
+    if output_file is None:
+        for chunk in _meta_tools.read_fasta_chunks(filepath, chunk_size, invalid_sequence_action=invalid_sequence_action):
+            predictions = predict_function(chunk, **kwargs)
+            if quantize is not None:
+                predictions = _quantize_predictions(predictions, quantize, max_value=max_value)
+            return_dict.update(predictions)
+        return return_dict
+
+    # format and write each chunk while the next one is predicted
+    with _BackgroundWriter() as writer:
+        for chunk in _meta_tools.read_fasta_chunks(filepath, chunk_size, invalid_sequence_action=invalid_sequence_action):
+            writer.submit(_write_csv_chunk, predict_function(chunk, **kwargs), output_file, quantize, max_value)
+
+
+def _write_csv_chunk(predictions, output_file, quantize, max_value):
+    """
+    Internal function that (optionally) quantizes a chunk of predictions
+    and appends it to a .csv file. Run on the background writer thread.
+    """
+    if quantize is not None:
+        predictions = _quantize_predictions(predictions, quantize, max_value=max_value)
+    _meta_tools.write_csv(predictions, output_file, append=True)
+
+
+# ..........................................................................................
+#
+def _predict_fasta_to_parquet(predict_function, filepath, chunk_size, invalid_sequence_action, output_file, idr_threshold=None, quantize=None, max_value=1.0, **kwargs):
+    """
+    Internal function used by predict_disorder_fasta() and predict_pLDDT_fasta()
+    to write predictions to a Parquet file. Predictions are made with 
+    return_format='ragged' so the scores go to Arrow as one contiguous 
+    array per row group. If chunk_size is set the file is read, predicted
+    and written one chunk (and row group) at a time, otherwise the whole 
+    file is read with protfasta and written as a single row group.
+
+    Parameters
+    -------------
+    predict_function : function
+        Either the disorder or the pLDDT batch predictor
+
+    filepath : str 
+        Path to the .fasta file
+
+    chunk_size : int or None
+        Number of sequences to read, predict and write at a time
+
+    invalid_sequence_action : str
+        Passed to protfasta
+
+    output_file : str
+        .parquet file to write to
+
+    idr_threshold : float or None
+        If set, an idrs column is written with the IDR boundaries found 
+        using this disorder threshold
+
+    quantize : str or None
+        If set, scores are written quantized to this dtype ('uint8' or 
+        'uint16')
+
+    max_value : float
+        Largest possible score, used for quantization
+
+    **kwargs
+        Passed to predict_function
+
+    Returns
+    --------
+    None
+    """
+
+    if output_file is None:
+        raise MetapredictError('An output_file must be provided to write Parquet output')
+
+    # IDRs are found and each row group is written on a background thread
+    # while the next chunk is predicted
+    with _meta_tools.ParquetScoreWriter(output_file, include_idrs=idr_threshold is not None, quantize=quantize, max_value=max_value) as writer:
+        with _BackgroundWriter() as background:
+            for chunk in _fasta_chunks(filepath, chunk_size, invalid_sequence_action):
+                if len(chunk) == 0:
+                    continue
+
+                ragged = predict_function(chunk, return_format='ragged', **kwargs)
+                background.submit(_write_parquet_chunk, writer, list(chunk.values()), ragged, idr_threshold)
+
+
+def _write_parquet_chunk(writer, sequences, ragged, idr_threshold):
+    """
+    Internal function that finds the IDRs (if idr_threshold is set) for a
+    chunk of predictions and writes it as one row group. Run on the 
+    background writer thread.
+    """
+    idrs = None
+    if idr_threshold is not None:
+        # decompose the whole chunk in one call straight from the ragged buffer
+        values = ragged.values
+        if ragged.scale is not None:
+            values = _quantization.dequantize(values, ragged.scale)
+        _, idr_array, idr_offsets, _, _ = _domain_definition.get_domains_batch(values, ragged.offsets, disorder_threshold=idr_threshold)
+        idr_array = idr_array.tolist()
+        idrs = [idr_array[idr_offsets[i]:idr_offsets[i+1]] for i in range(len(sequences))]
+
+    writer.write(sequences, ragged, idrs=idrs)
+
+
+def _predict_fasta_to_archive(predict_function, filepath, chunk_size, invalid_sequence_action, output_file, archive_dtype='float16', metadata=None, **kwargs):
+    """
+    Internal function used by predict_disorder_fasta() to write predictions
+    to a binary score archive (see metapredict/backend/score_archive.py). 
+    Predictions are made with return_format='ragged' and each chunk is 
+    encoded and appended to the archive as one block.
+
+    Parameters
+    -------------
+    predict_function : function
+        The batch predictor
+
+    filepath : str 
+        Path to the .fasta file
+
+    chunk_size : int or None
+        Number of sequences to read, predict and write at a time. If None
+        the whole file is read at once.
+
+    invalid_sequence_action : str
+        Passed to protfasta
+
+    output_file : str
+        Archive file to write to
+
+    archive_dtype : str
+        'float16', 'uint8' or 'uint16'
+
+    metadata : dict or None
+        Stored in the archive header
+
+    **kwargs
+        Passed to predict_function
+
+    Returns
+    --------
+    None
+    """
+
+    if output_file is None:
+        raise MetapredictError('An output_file must be provided to write a score archive')
+
+    if archive_dtype in _quantization.QUANTIZED_DTYPES and kwargs.get('normalized', True) == False:
+        raise MetapredictError('Quantized score archives require normalized=True, because scores are quantized between 0 and 1')
+
+    # each chunk is encoded and written on a background thread while the next one is predicted
+    with _score_archive.ScoreArchiveWriter(output_file, dtype=archive_dtype, metadata=metadata) as writer:
+        with _BackgroundWriter() as background:
+            for chunk in _fasta_chunks(filepath, chunk_size, invalid_sequence_action):
+                if len(chunk) == 0:
+                    continue
+                background.submit(writer.add_many, predict_function(chunk, return_format='ragged', **kwargs))
+
+
+def _quantize_predictions(predictions, quantize, max_value=1.0):
+    """
+    Internal function that quantizes a dictionary of predictions, as 
+    returned by the batch predictors (ID to [sequence, scores]), to lists
+    of integers.
+    """
+    return {k: [s, _quantization.quantize(scores, quantize, max_value).tolist()] for k, (s, scores) in predictions.items()}
+
+
+def _fasta_chunks(filepath, chunk_size, invalid_sequence_action):
+    """
+    Internal function that returns an iterable of dictionaries of FASTA 
+    header to sequence; either chunks of chunk_size records or, if 
+    chunk_size is None, the whole file as one dictionary.
+    """
+    if chunk_size is not None:
+        return _meta_tools.read_fasta_chunks(filepath, chunk_size, invalid_sequence_action=invalid_sequence_action)
+    else:
+        return [_protfasta.read_fasta(filepath, invalid_sequence_action = invalid_sequence_action)]
+
+
 # ..........................................................................................
 #
 def graph_disorder_fasta(filepath, 
@@ -2077,7 +3033,7 @@ def predict_disorder_domains_uniprot(uniprot_id,
 
 # ..........................................................................................
 #
-def predict_disorder_caid(input_fasta, output_path, version=DEFAULT_NETWORK):
+def predict_disorder_caid(input_fasta, output_path, version=DEFAULT_NETWORK, chunk_size=None, single_file=False):
     '''
     executing script for generating a caid-compliant output file for disorder
     predictions using a .fasta file as the input.
@@ -2089,13 +3045,27 @@ def predict_disorder_caid(input_fasta, output_path, version=DEFAULT_NETWORK):
         the file name if the file is not in the curdir
 
     output_path : str
-        the path where to save the output files.
+        the path where to save the output files. If single_file is True,
+        the path of the file to write.
 
     version : string
         The network to use for prediction. Default is DEFAULT_NETWORK,
         which is defined at the top of /parameters.
         Options currently include V1, V2, or V3. 
 
+    chunk_size : int
+        If set, the FASTA file is read, predicted and written out 
+        chunk_size sequences at a time, so memory use is bounded by the 
+        chunk size rather than the size of the file. If None the whole 
+        file is read at once.
+        Default = None
+
+    single_file : bool
+        If True, all entries are written into one multi-entry CAID file 
+        (output_path) instead of one .caid file per entry in the 
+        output_path directory.
+        Default = False
+
     Returns
     --------
     None
@@ -2106,6 +3076,14 @@ def predict_disorder_caid(input_fasta, output_path, version=DEFAULT_NETWORK):
     # check version and make sure it is an uppercase string
     version = _meta_tools.valid_version(version, 'disorder')
 
+    # if streaming, write out the files for each chunk on a background thread while the next one is predicted
+    if chunk_size is not None:
+        with _BackgroundWriter() as writer:
+            for i, chunk in enumerate(_meta_tools.read_fasta_chunks(input_fasta, chunk_size, invalid_sequence_action='convert')):
+                predictions = _predict(chunk, version=version, return_numpy=False)
+                writer.submit(_meta_tools.write_caid_format, predictions, output_path, version=version, single_file=single_file, append=i > 0)
+        return
+
     # read in the ids and seqs as a list of lists where each list has a first element that corresponds
     # to the ID and the second corresponds to the sequence. Convert invalid amino acids if needed.
     entry_id_and_seqs = _protfasta.read_fasta(input_fasta, return_list=False, invalid_sequence_action = 'convert')
@@ -2114,6 +3092,58 @@ def predict_disorder_caid(input_fasta, output_path, version=DEFAULT_NETWORK):
     predictions = _predict(entry_id_and_seqs, version=version, return_numpy=False)
 
     # write the output file
-    _meta_tools.write_caid_format(predictions, output_path, version=version)
+    _meta_tools.write_caid_format(predictions, output_path, version=version, single_file=single_file)
+
+
+
+# ..........................................................................................
+#
+def set_memory_cache_size(max_entries):
+    """
+    Sets the maximum number of entries in the in-memory LRU cache used for
+    repeated single-sequence predictions (score arrays from predict_disorder()
+    and predict_pLDDT(), and DisorderObjects from predict_disorder_domains() or
+    predict_disorder(..., return_domains=True)). The setting applies to the 
+    current process only. The default is set by MEMORY_CACHE_SIZE in 
+    /parameters.
+
+    Parameters
+    ------------
+    max_entries : int
+        Maximum number of cached results. Set to 0 to disable the cache.
+
+    Returns
+    --------
+    None
+    """
+    _prediction_cache.memory_cache.resize(max_entries)
+
 
+# ..........................................................................................
+#
+def clear_memory_cache():
+    """
+    Empties the in-memory LRU cache used for repeated single-sequence 
+    predictions and resets its hit/miss counters.
 
+    Returns
+    --------
+    None
+    """
+    _prediction_cache.memory_cache.clear()
+
+
+# ..........................................................................................
+#
+def memory_cache_stats():
+    """
+    Reports usage of the in-memory LRU cache used for repeated single-sequence
+    predictions.
+
+    Returns
+    --------
+    dict
+        Dictionary with the keys 'hits', 'misses', 'evictions', 'entries'
+        and 'max_entries'.
+    """
+    return _prediction_cache.memory_cache.stats()
@@ -12,3 +12,8 @@ DEFAULT_NETWORK_PLDDT = 'V2'
 
 # various constraints on predictions we've run across
 MAX_CUDA_LENGTH=65535
+
+# maximum number of single-sequence results (score arrays and DisorderObjects)
+# kept in the in-memory LRU cache. Can be changed per process with 
+# metapredict.set_memory_cache_size(); 0 disables the cache.
+MEMORY_CACHE_SIZE=256
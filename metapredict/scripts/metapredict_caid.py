@@ -16,11 +16,15 @@ def main():
 
     parser.add_argument('data_file', help='Path to fasta file containing sequences to be predicted.')
 
-    parser.add_argument('output_path', help='Path of where to save each generated .caid file.')
+    parser.add_argument('output_path', help='Path of where to save each generated .caid file, or the file to write if --single-file is used.')
 
     parser.add_argument('version', help='The version of metapredict to use. Options are v1, v2, and v3.')
 
+    parser.add_argument('--chunk-size', type=int, default=None, help='Optional. If set, the FASTA file is read, predicted and written out this many sequences at a time, which keeps memory use bounded for very large files.')
+
+    parser.add_argument('--single-file', action='store_true', help='Optional. Write all entries into one multi-entry CAID file at output_path instead of one file per entry.')
+
     args = parser.parse_args()
 
     # carry out predictions
-    meta.predict_disorder_caid(input_fasta=args.data_file, output_path=args.output_path, version=args.version)
\ No newline at end of file
+    meta.predict_disorder_caid(input_fasta=args.data_file, output_path=args.output_path, version=args.version, chunk_size=args.chunk_size, single_file=args.single_file)
\ No newline at end of file
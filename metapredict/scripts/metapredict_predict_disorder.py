@@ -24,10 +24,26 @@ def main():
 
     parser.add_argument('-s', '--silent', action='store_true', help='Optional. Use this flag to suppress the progress bar.')
 
+    parser.add_argument('--chunk-size', type=int, default=None, help='Optional. If set, the FASTA file is read, predicted and written out this many sequences at a time, which keeps memory use bounded for very large files.')
+
+    parser.add_argument('--output-format', choices=['csv', 'parquet', 'archive'], default=None, help='Optional. Format of the output file. Parquet output requires pyarrow. archive writes a binary score archive that can be memory-mapped with metapredict.ScoreArchive. By default the format is inferred from the output file extension (.parquet or .pq for Parquet, .mpsa for an archive, otherwise csv).')
+
+    parser.add_argument('--archive-dtype', choices=['float16', 'uint8', 'uint16'], default='float16', help='Optional. How scores are stored in a score archive. Default = float16')
+
+    parser.add_argument('--quantize', choices=['uint8', 'uint16'], default=None, help='Optional. Write scores as quantized unsigned integers (a value q is the score q/255 for uint8 or q/65535 for uint16).')
+
+    parser.add_argument('--include-idrs', action='store_true', help='Optional. When writing Parquet, also write the IDR boundaries for each sequence.')
+
     parser.add_argument('-d', '--device', default=None, help='Optional. Use this flag to specify device to use. Options are cpu, mps, cuda, or cuda:int, or an int specifying the index of a CUDA-enabled GPU.')
 
     args = parser.parse_args()
 
+    # use a matching extension if Parquet or archive output was asked for with the default filename
+    if args.output_format == 'parquet' and args.output_file == 'disorder_scores.csv':
+        args.output_file = 'disorder_scores.parquet'
+    elif args.output_format == 'archive' and args.output_file == 'disorder_scores.csv':
+        args.output_file = 'disorder_scores.mpsa'
+
     
     if not os.path.isfile(args.data_file):
         print('Error: Could not find passed fasta file [%s]'%(args.data_file))
@@ -45,7 +61,12 @@ def main():
                                     invalid_sequence_action=args.invalid_sequence_action,
                                     version=args.version,
                                     device=args.device,
-                                    show_progress_bar=show_progress_bar)
+                                    show_progress_bar=show_progress_bar,
+                                    chunk_size=args.chunk_size,
+                                    output_format=args.output_format,
+                                    include_idrs=args.include_idrs,
+                                    archive_dtype=args.archive_dtype,
+                                    quantize=args.quantize)
     except Exception as e:
         print('Error durring prediction: %s'%(str(e)))
         sys.exit(1)
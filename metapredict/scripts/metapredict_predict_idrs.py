@@ -4,11 +4,15 @@
 
 # import stuff for making CLI
 import os
+import sys
 import argparse
 import protfasta
 
 from metapredict.parameters import DEFAULT_NETWORK
 import metapredict as meta
+from metapredict.backend.meta_tools import read_fasta_chunks
+from metapredict.backend.background_writer import BackgroundWriter
+from metapredict.metapredict_exceptions import MetapredictError
 
 def main():
 
@@ -31,6 +35,10 @@ def main():
     
     parser.add_argument('-s', '--silent', action='store_true', help='Optional. Use this flag to suppress the progress bar.')
 
+    parser.add_argument('--chunk-size', type=int, default=None, help='Optional. If set, the FASTA file is read and predicted this many sequences at a time, and each chunk is written out while the next one is predicted. This keeps memory use bounded for very large files.')
+
+    parser.add_argument('--domain-threads', type=int, default=1, help='Optional. Number of threads used to extract IDRs from the disorder profiles. Results are the same for any number of threads. Default = 1')
+
     parser.add_argument('-d', '--device', default=None, help='Optional. Use this flag to specify device to use. Options are cpu, mps, cuda, or cuda:int, or an int specifying the index of a CUDA-enabled GPU.')
 
     args = parser.parse_args()
@@ -51,6 +59,41 @@ def main():
     if not os.path.isfile(args.data_file):
         print(f'Error: Could not find passed fasta file [{args.data_file:s}]')
 
+    if args.silent:
+        show_progress_bar=False
+    else:
+        show_progress_bar=True
+
+    # if streaming, predict a chunk at a time and write each chunk's IDRs on a
+    # background thread while the next chunk is predicted
+    if args.chunk_size is not None:
+        if args.verbose:
+            print(f'Predicting disorder {args.chunk_size} sequences at a time')
+
+        # truncate (or create) the output file so each chunk can be appended
+        open(outfile_name, 'w').close()
+
+        # errors from write_idrs are raised on the writer thread and re-raised
+        # here by the writer, so we only ever exit from the main thread
+        try:
+            with BackgroundWriter() as writer:
+                for chunk in read_fasta_chunks(args.data_file, args.chunk_size, invalid_sequence_action=args.invalid_sequence_action):
+                    idrs = meta.predict_disorder(chunk,
+                                                version=args.version,
+                                                device=args.device,
+                                                return_domains=True,
+                                                disorder_threshold=args.threshold,
+                                                show_progress_bar=show_progress_bar,
+                                                domain_threads=args.domain_threads)
+                    writer.submit(write_idrs, idrs, args.mode, outfile_name, append=True)
+        except MetapredictError as e:
+            print(f'Error: {e}')
+            sys.exit(1)
+
+        if not args.silent:
+            print('Saved predictions to: %s'%(os.path.abspath(outfile_name)))
+        return
+
     # read in sequences
     sequences = protfasta.read_fasta(args.data_file, 
                                     invalid_sequence_action=args.invalid_sequence_action)
@@ -58,11 +101,6 @@ def main():
     if args.verbose:
         print('Read in FASTA file')
 
-    if args.silent:
-        show_progress_bar=False
-    else:
-        show_progress_bar=True
-
     if args.verbose:
         print('Predicting disorder')
 
@@ -72,14 +110,47 @@ def main():
                                 device=args.device,
                                 return_domains=True, 
                                 disorder_threshold=args.threshold, 
-                                show_progress_bar=show_progress_bar)
+                                show_progress_bar=show_progress_bar,
+                                domain_threads=args.domain_threads)
 
     if not args.silent:
         print('Saving predictions to: %s'%(os.path.abspath(outfile_name)))
 
+    try:
+        write_idrs(idrs, args.mode, outfile_name)
+    except MetapredictError as e:
+        print(f'Error: {e}')
+        sys.exit(1)
+
+
+def write_idrs(idrs, mode, outfile_name, append=False):
+    """
+    Writes the IDRs for a set of sequences in one of the output modes.
+
+    Parameters
+    -----------
+    idrs : dict
+        Dictionary of header to DisorderObject, as returned by
+        predict_disorder() with return_domains=True
+
+    mode : str
+        'fasta', 'shephard-domains' or 'shephard-domains-uniprot'
+
+    outfile_name : str
+        File to write to
+
+    append : bool
+        If True, append to outfile_name rather than overwriting it
+
+    Raises
+    --------
+    MetapredictError
+        If mode is 'shephard-domains-uniprot' and a header cannot be 
+        parsed for a UniProt ID
+    """
 
     # if the return type is a FASTA file we want to write 
-    if args.mode == 'fasta':
+    if mode == 'fasta':
 
         return_dictionary = {}    
 
@@ -97,45 +168,41 @@ def main():
                 
                 return_dictionary[f'{s} IDR_START={idr_start} IDR_END={idr_end}'] =  idr_seq
                         
-        protfasta.write_fasta(return_dictionary, outfile_name)
+        protfasta.write_fasta(return_dictionary, outfile_name, append_to_fasta=append)
 
     # if the return type is a SHEPHARD-compliant Domains file
-    elif args.mode == 'shephard-domains':
-        fh = open(outfile_name, 'w')
+    elif mode == 'shephard-domains':
+        with open(outfile_name, 'a' if append else 'w') as fh:
 
-        # for each protein
-        for s in idrs:
+            # for each protein
+            for s in idrs:
 
-            # calculate number of IDRs
-            n_idrs = len(idrs[s].disordered_domains)
+                # calculate number of IDRs
+                n_idrs = len(idrs[s].disordered_domains)
 
-            for idx in range(n_idrs):
+                for idx in range(n_idrs):
 
-                idr_start = idrs[s].disordered_domain_boundaries[idx][0] + 1
-                idr_end   = idrs[s].disordered_domain_boundaries[idx][1]
+                    idr_start = idrs[s].disordered_domain_boundaries[idx][0] + 1
+                    idr_end   = idrs[s].disordered_domain_boundaries[idx][1]
 
-                fh.write(f'{s}\t{idr_start}\t{idr_end}\tIDR\n')
+                    fh.write(f'{s}\t{idr_start}\t{idr_end}\tIDR\n')
 
-    elif args.mode == 'shephard-domains-uniprot':
-        fh = open(outfile_name, 'w')
+    elif mode == 'shephard-domains-uniprot':
+        with open(outfile_name, 'a' if append else 'w') as fh:
 
-        # for each protein
-        for s in idrs:
-
-            try:
-                uid = s.split('|')[1]
-            except IndexError:
-                print(f'Error parsing header line: {s}\nCould not split on "|" characters.')
-                exit(1)
-            
-            # calculate number of IDRs
-            n_idrs = len(idrs[s].disordered_domains)
-
-            for idx in range(n_idrs):                
-                idr_start = idrs[s].disordered_domain_boundaries[idx][0] + 1
-                idr_end   = idrs[s].disordered_domain_boundaries[idx][1]
+            # for each protein
+            for s in idrs:
 
-                fh.write(f'{uid}\t{idr_start}\t{idr_end}\tIDR\n')
+                try:
+                    uid = s.split('|')[1]
+                except IndexError:
+                    raise MetapredictError(f'Error parsing header line: {s}\nCould not split on "|" characters.')
                 
-        
+                # calculate number of IDRs
+                n_idrs = len(idrs[s].disordered_domains)
+
+                for idx in range(n_idrs):                
+                    idr_start = idrs[s].disordered_domain_boundaries[idx][0] + 1
+                    idr_end   = idrs[s].disordered_domain_boundaries[idx][1]
 
+                    fh.write(f'{uid}\t{idr_start}\t{idr_end}\tIDR\n')
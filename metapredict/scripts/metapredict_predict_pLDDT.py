@@ -25,11 +25,21 @@ def main():
 
     parser.add_argument('-s', '--silent', action='store_true', help='Optional. Use this flag to suppress the progress bar.')
 
+    parser.add_argument('--chunk-size', type=int, default=None, help='Optional. If set, the FASTA file is read, predicted and written out this many sequences at a time, which keeps memory use bounded for very large files.')
+
+    parser.add_argument('--output-format', choices=['csv', 'parquet'], default=None, help='Optional. Format of the output file. Parquet output requires pyarrow. By default the format is inferred from the output file extension (.parquet or .pq for Parquet, otherwise csv).')
+
+    parser.add_argument('--quantize', choices=['uint8', 'uint16'], default=None, help='Optional. Write scores as quantized unsigned integers (a value q is the score q*100/255 for uint8 or q*100/65535 for uint16).')
+
     parser.add_argument('-d', '--device', default=None, help='Optional. Use this flag to specify device to use. Options are cpu, mps, cuda, or cuda:int, or an int specifying the index of a CUDA-enabled GPU.')
 
 
     args = parser.parse_args()
 
+    # use a .parquet extension if Parquet output was asked for with the default filename
+    if args.output_format == 'parquet' and args.output_file == 'pLDDT_scores.csv':
+        args.output_file = 'pLDDT_scores.parquet'
+
     
     if not os.path.isfile(args.data_file):
         print(f'Error: Could not find passed fasta file [{args.data_file:s}]')
@@ -48,7 +58,10 @@ def main():
                                 invalid_sequence_action=args.invalid_sequence_action,
                                 pLDDT_version=args.pLDDT_version,
                                 device=args.device,
-                                show_progress_bar=show_progress_bar)
+                                show_progress_bar=show_progress_bar,
+                                chunk_size=args.chunk_size,
+                                output_format=args.output_format,
+                                quantize=args.quantize)
     
     if not args.silent:
         print('Predictions saved to: %s'%(os.path.abspath(args.output_file)))
\ No newline at end of file
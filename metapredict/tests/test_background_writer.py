@@ -0,0 +1,108 @@
+"""
+Tests for writing output on a background thread while predicting
+"""
+
+import os
+import sys
+import time
+
+import pytest
+import protfasta
+
+from metapredict.backend.background_writer import BackgroundWriter
+from metapredict.scripts import metapredict_predict_idrs
+from metapredict.metapredict_exceptions import MetapredictError
+
+
+current_filepath = os.getcwd()
+onehundred_seqs = "{}/input_data/test_seqs_100.fasta".format(current_filepath)
+
+
+def test_jobs_run_in_order():
+    written = []
+    with BackgroundWriter(max_queued=1) as writer:
+        for i in range(50):
+            writer.submit(written.append, i)
+    assert written == list(range(50))
+
+
+def test_writes_overlap_with_caller():
+    # a slow write should not hold up the caller until the queue is full
+    start = time.time()
+    with BackgroundWriter(max_queued=2) as writer:
+        writer.submit(time.sleep, 0.5)
+        submitted = time.time() - start
+    assert submitted < 0.25
+    assert time.time() - start >= 0.5
+
+
+def test_errors_are_raised_in_caller():
+    def fail():
+        raise ValueError('disk full')
+
+    written = []
+    writer = BackgroundWriter()
+    writer.submit(fail)
+    writer.submit(written.append, 1)
+    with pytest.raises(ValueError):
+        writer.close()
+
+    # jobs after the failure are skipped
+    assert written == []
+
+    # including jobs submitted after the error has been raised
+    writer = BackgroundWriter()
+    writer.submit(fail)
+    while not writer.failed:
+        time.sleep(0.01)
+    with pytest.raises(ValueError):
+        writer.submit(written.append, 1)
+    writer.submit(written.append, 2)
+    writer.close()
+    assert written == []
+
+    # an exception in the caller takes precedence
+    with pytest.raises(KeyError):
+        with BackgroundWriter() as writer:
+            writer.submit(fail)
+            raise KeyError('caller')
+
+
+@pytest.mark.parametrize('mode', ['fasta', 'shephard-domains'])
+def test_predict_idrs_chunked(tmp_path, monkeypatch, mode):
+    whole = str(tmp_path / 'whole.out')
+    chunked = str(tmp_path / 'chunked.out')
+
+    monkeypatch.setattr(sys, 'argv', ['metapredict-predict-idrs', onehundred_seqs, '-o', whole, '--mode', mode, '-s', '-d', 'cpu'])
+    metapredict_predict_idrs.main()
+
+    monkeypatch.setattr(sys, 'argv', ['metapredict-predict-idrs', onehundred_seqs, '-o', chunked, '--mode', mode, '-s', '-d', 'cpu', '--chunk-size', '7'])
+    metapredict_predict_idrs.main()
+
+    # writing a chunk at a time gives exactly the same file
+    with open(whole) as fh:
+        a = fh.read()
+    with open(chunked) as fh:
+        b = fh.read()
+    assert len(a) > 0
+    assert a == b
+
+
+@pytest.mark.parametrize('chunk_size', [None, '2'])
+def test_predict_idrs_bad_uniprot_header(tmp_path, monkeypatch, capsys, chunk_size):
+    fasta = str(tmp_path / 'no_uniprot.fasta')
+    protfasta.write_fasta({'seq1': 'MDEDQKDQPSSSPKKPENKPAKRSHSPSSAVDEPQPKKSKK', 
+                           'seq2': 'MASPRTRKVLKEVRVQDENNVCFECGAFNPQWVSVTYGIWIC'}, fasta)
+
+    # a bad header fails on the writer thread but exits from the main thread
+    argv = ['metapredict-predict-idrs', fasta, '-o', str(tmp_path / 'idrs.tsv'), '--mode', 'shephard-domains-uniprot', '-s', '-d', 'cpu']
+    if chunk_size is not None:
+        argv = argv + ['--chunk-size', chunk_size]
+    monkeypatch.setattr(sys, 'argv', argv)
+    with pytest.raises(SystemExit) as e:
+        metapredict_predict_idrs.main()
+    assert e.value.code == 1
+    assert 'Error parsing header line: seq1' in capsys.readouterr().out
+
+    with pytest.raises(MetapredictError):
+        metapredict_predict_idrs.write_idrs({'seq1': None}, 'shephard-domains-uniprot', str(tmp_path / 'idrs.tsv'))
@@ -0,0 +1,88 @@
+"""
+Tests for writing CAID formatted output
+"""
+
+import os
+
+import numpy as np
+import pytest
+import protfasta
+
+import metapredict as meta
+from metapredict.backend import meta_tools
+from metapredict.metapredict_exceptions import MetapredictError
+
+from . import build_seq
+
+
+current_filepath = os.getcwd()
+onehundred_seqs = "{}/input_data/test_seqs_100.fasta".format(current_filepath)
+
+
+def reference_caid_entry(entry_id, sequence, scores, cutoff_value):
+    """
+    The original per-residue CAID formatting, used to check that the
+    output is unchanged
+    """
+    out = ['>'+entry_id if entry_id[0] != '>' else entry_id, '\n']
+    for i in range(len(sequence)):
+        binary = meta_tools.get_binary_prediction(scores[i], cutoff_value=cutoff_value)
+        write_score = str(round(float(scores[i]), 3))
+        if len(write_score) < 5:
+            write_score = write_score + '0'*(5-len(write_score))
+        out.append(f'{i+1}\t{sequence[i]}\t{write_score}\t{binary}\n')
+    return ''.join(out)
+
+
+def test_caid_entry_matches_reference():
+    seq = build_seq()
+
+    # edge cases around rounding and the cutoff, plus the values predictions give
+    scores = [0, 1, 0.5, 0.42, 0.4199, 0.0005, 0.0015, 0.9995, 0.1235, 0.25]
+    scores = scores + np.round(np.random.rand(len(seq) - len(scores)), 4).tolist()
+
+    for cutoff in [0.5, 0.42]:
+        assert meta_tools._format_caid_entry('x', seq, scores, cutoff) == reference_caid_entry('x', seq, scores, cutoff)
+        assert meta_tools._format_caid_entry('>x', seq, scores, cutoff) == reference_caid_entry('>x', seq, scores, cutoff)
+
+        # float32 scores
+        scores_32 = np.array(scores, dtype=np.float32)
+        assert meta_tools._format_caid_entry('x', seq, scores_32, cutoff) == reference_caid_entry('x', seq, scores_32, cutoff)
+
+    # scores outside [0, 1] (e.g. normalized=False) keep the original formatting
+    odd = [-0.25, 12.5, 9.9996, -0.0001] + [0.5]*(len(seq)-4)
+    assert meta_tools._format_caid_entry('x', seq, odd, 0.5) == reference_caid_entry('x', seq, odd, 0.5)
+
+
+@pytest.mark.parametrize('chunk_size', [None, 30])
+def test_caid_single_file(tmp_path, chunk_size):
+    seqs = protfasta.read_fasta(onehundred_seqs, invalid_sequence_action='convert')
+    fasta = str(tmp_path / 'seqs.fasta')
+    seqs = {f'seq{i}': s for i, s in enumerate(seqs.values())}
+    protfasta.write_fasta(seqs, fasta)
+
+    per_entry = tmp_path / 'per_entry'
+    per_entry.mkdir()
+    meta.predict_disorder_caid(fasta, str(per_entry), version='V3')
+
+    single = str(tmp_path / 'all.caid')
+    meta.predict_disorder_caid(fasta, single, version='V3', chunk_size=chunk_size, single_file=True)
+
+    # the single file holds the same entries, in FASTA order
+    with open(single) as fh:
+        entries = fh.read().split('>')[1:]
+    assert len(entries) == 100
+
+    for i, entry in enumerate(entries):
+        lines = entry.split('\n')
+        assert lines[0] == f'seq{i}'
+        with open(per_entry / f'seq{i}.caid') as fh:
+            expected = fh.read()
+        assert expected.split('\n')[0] == f'>seq{i}'
+        a = np.loadtxt(lines[1:-1], usecols=(0, 2, 3))
+        b = np.loadtxt(expected.split('\n')[1:-1], usecols=(0, 2, 3))
+        assert np.allclose(a[:, 0], b[:, 0])
+        assert np.allclose(a[:, 1], b[:, 1], atol=2e-3)
+
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder_caid(fasta, str(tmp_path / 'missing' / 'all.caid'), single_file=True)
@@ -44,3 +44,37 @@ def test_domain_decomposition():
                     print(s)
                     assert cyth[1][x] == pyth[1][x]
     
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_domain_decomposition_random_profiles(seed):
+    """
+    The Cython implementation removes short IDRs with a single pass over
+    the runs of the binary profile rather than with string replacement,
+    so check it gives identical boundaries to the Python implementation on
+    random profiles and settings, including the noisy profiles where many
+    short runs sit next to each other.
+    """
+    rng = np.random.default_rng(seed)
+
+    for trial in range(500):
+        n = int(rng.integers(1, 600))
+        kind = trial % 3
+        if kind == 0:
+            values = rng.random(n)
+        elif kind == 1:
+            values = np.clip(np.cumsum(rng.normal(0, 0.1, n)) % 1.0, 0, 1)
+        else:
+            values = np.repeat(rng.random(n//7 + 1), 7)[:n]
+
+        thresh = float(rng.choice([0.1, 0.3, 0.42, 0.5, 0.7, 0.9]))
+        kwargs = {'minimum_IDR_size': int(rng.integers(1, 20)),
+                  'minimum_folded_domain': int(rng.integers(5, 60)),
+                  'gap_closure': int(rng.integers(0, 12)),
+                  'override_folded_domain_minsize': bool(rng.integers(0, 2))}
+
+        cyth = build_domains_from_values(values.astype(np.double), thresh, **kwargs)
+        pyth = domain_definition(values.astype(np.double), thresh, **kwargs)
+
+        assert [list(d) for d in cyth[0]] == [list(d) for d in pyth[0]]
+        assert [list(d) for d in cyth[1]] == [list(d) for d in pyth[1]]
@@ -2,11 +2,16 @@
 
 import metapredict as meta
 from metapredict.metapredict_exceptions import MetapredictError
+from metapredict.backend import domain_definition
+from metapredict.backend.domain_definition import get_domains, get_domains_batch
 
+import numpy as np
 import pytest
 import sys
 import os
 
+from . import build_seq
+
 
 current_filepath = os.getcwd()
 odinpred_file = "{}/input_data/DisorderPredictionssp_P04637_P53_HUMANC.txt".format(current_filepath)
@@ -90,3 +95,141 @@ def test_predict_disordered_domains_external_scores_failsafe():
     with pytest.raises(MetapredictError):
         meta.predict_disorder_domains_from_external_scores([], sequence=20)
     
+
+
+def test_predict_disordered_domains_external_scores_batch():
+    """
+    Tests that passing a list of disorder profiles gives the same 
+    DisorderObjects as passing them one at a time
+
+    """
+
+    with open(odinpred_file, 'r') as fh:
+        content = fh.readlines()
+
+    disorder = [float(x.strip().split()[3]) for x in content[1:]]
+    local_sequence = "".join([x.strip().split()[0] for x in content[1:]])
+
+    # the full profile, a fragment and a profile shorter than the smoothing window
+    profiles = [disorder, disorder[50:300], disorder[:20]]
+    sequences = [local_sequence, local_sequence[50:300], local_sequence[:20]]
+
+    for seqs in [sequences, None]:
+        batch = meta.predict_disorder_domains_from_external_scores(profiles, sequence=seqs)
+        assert len(batch) == 3
+
+        for i in range(3):
+            local_seq = seqs[i] if seqs is not None else None
+            single = meta.predict_disorder_domains_from_external_scores(profiles[i], sequence=local_seq)
+            assert batch[i].sequence == single.sequence
+            assert batch[i].disordered_domain_boundaries == single.disordered_domain_boundaries
+            assert batch[i].folded_domain_boundaries == single.folded_domain_boundaries
+
+    assert batch[0].disordered_domain_boundaries[0] == [0, 103]
+
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder_domains_from_external_scores(profiles, sequence=local_sequence)
+
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder_domains_from_external_scores(profiles, sequence=sequences[::-1])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_get_domains_batch(seed):
+    """
+    Tests that the batched smoothing and decomposition give the same 
+    result as get_domains() on each profile
+
+    """
+    rng = np.random.default_rng(seed)
+
+    profiles = []
+    for i in range(300):
+        n = int(rng.integers(1, 700))
+        profiles.append(np.clip(np.cumsum(rng.normal(0, 0.08, n)) % 1.2, 0, 1))
+
+    offsets = np.zeros(len(profiles)+1, dtype=np.int64)
+    np.cumsum([len(p) for p in profiles], out=offsets[1:])
+
+    for kwargs in [{}, 
+                   {'disorder_threshold': 0.5, 'minimum_IDR_size': 5, 'gap_closure': 3},
+                   {'minimum_IDR_size': 1, 'gap_closure': 0, 'minimum_folded_domain': 20, 'override_folded_domain_minsize': True},
+                   {'minimum_IDR_size': 2, 'gap_closure': 1},
+                   {'minimum_IDR_size': 3}]:
+
+        smoothed, idrs, idr_offsets, fds, fd_offsets = get_domains_batch(np.concatenate(profiles), offsets, **kwargs)
+
+        for i, p in enumerate(profiles):
+            ref = get_domains('A'*len(p), p, **kwargs)
+            assert np.allclose(smoothed[offsets[i]:offsets[i+1]], ref[0], atol=1e-10)
+            assert idrs[idr_offsets[i]:idr_offsets[i+1]].tolist() == [d[:2] for d in ref[1]]
+            assert fds[fd_offsets[i]:fd_offsets[i+1]].tolist() == [d[:2] for d in ref[2]]
+
+
+@pytest.mark.parametrize('threads', [2, 3, 16])
+def test_get_domains_batch_threads(threads):
+    """
+    Tests that splitting the decomposition across threads gives the same
+    result as the serial path
+
+    """
+    rng = np.random.default_rng(threads)
+
+    profiles = [np.clip(np.cumsum(rng.normal(0, 0.08, int(rng.integers(1, 700)))) % 1.2, 0, 1) for i in range(200)]
+    offsets = np.zeros(len(profiles)+1, dtype=np.int64)
+    np.cumsum([len(p) for p in profiles], out=offsets[1:])
+    values = np.concatenate(profiles)
+
+    serial = get_domains_batch(values, offsets)
+    threaded = get_domains_batch(values, offsets, threads=threads)
+    for a, b in zip(serial, threaded):
+        assert np.array_equal(a, b)
+
+    # fewer sequences than threads
+    serial = get_domains_batch(values[:offsets[2]], offsets[:3])
+    threaded = get_domains_batch(values[:offsets[2]], offsets[:3], threads=threads)
+    for a, b in zip(serial, threaded):
+        assert np.array_equal(a, b)
+
+    # through the prediction and external score functions
+    seqs = [build_seq() for i in range(20)]
+    serial = meta.predict_disorder(seqs, device='cpu', return_domains=True)
+    threaded = meta.predict_disorder(seqs, device='cpu', return_domains=True, domain_threads=threads)
+    for a, b in zip(serial, threaded):
+        assert a.disordered_domain_boundaries == b.disordered_domain_boundaries
+        assert a.folded_domain_boundaries == b.folded_domain_boundaries
+
+    serial = meta.predict_disorder_domains_from_external_scores(profiles)
+    threaded = meta.predict_disorder_domains_from_external_scores(profiles, domain_threads=threads)
+    for a, b in zip(serial, threaded):
+        assert a.disordered_domain_boundaries == b.disordered_domain_boundaries
+        assert a.folded_domain_boundaries == b.folded_domain_boundaries
+
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder(seqs, device='cpu', return_domains=True, domain_threads=0)
+
+
+def test_smooth_disorder_batch_short_profiles(capsys):
+    """
+    Tests that profiles shorter than the smoothing window are smoothed as
+    in get_domains(), without printing a warning for each of them
+
+    """
+    rng = np.random.default_rng(0)
+
+    # every length up to and just past the window, several of each
+    profiles = [rng.random(n) for n in list(range(1, 30))*3]
+    offsets = np.zeros(len(profiles)+1, dtype=np.int64)
+    np.cumsum([len(p) for p in profiles], out=offsets[1:])
+
+    smoothed = domain_definition.smooth_disorder_batch(np.concatenate(profiles), offsets)
+    assert capsys.readouterr().out == ''
+
+    for i, p in enumerate(profiles):
+        ref = get_domains('A'*len(p), p)[0]
+        assert np.allclose(smoothed[offsets[i]:offsets[i+1]], ref, atol=1e-10)
+
+    # kernels are computed once per window (or length) and reused
+    hits = domain_definition._short_profile_operator.cache_info().hits
+    domain_definition.smooth_disorder_batch(np.concatenate(profiles), offsets)
+    assert domain_definition._short_profile_operator.cache_info().hits > hits
@@ -0,0 +1,109 @@
+"""
+Tests for the streaming domain decomposition
+"""
+
+import numpy as np
+import pytest
+
+import metapredict as meta
+from metapredict.backend.domain_definition import get_domains_batch
+from metapredict.backend.domain_segmenter import DomainSegmenter, iter_domains
+from metapredict.metapredict_exceptions import DomainError
+
+from . import build_seq
+
+
+def stream(values, chunk_sizes, **kwargs):
+    segmenter = DomainSegmenter(**kwargs)
+    domains = []
+    position = 0
+    for size in chunk_sizes:
+        domains.extend(segmenter.add(values[position:position+size]))
+        position = position + size
+    domains.extend(segmenter.finish())
+
+    # domains come out in order and tile the sequence
+    assert domains[0][1] == 0
+    assert domains[-1][2] == len(values)
+    for a, b in zip(domains[:-1], domains[1:]):
+        assert a[2] == b[1]
+
+    idrs = [[d[1], d[2]] for d in domains if d[0] == 'disordered']
+    fds = [[d[1], d[2]] for d in domains if d[0] == 'folded']
+    assert idrs == segmenter.disordered_domain_boundaries
+    assert fds == segmenter.folded_domain_boundaries
+    return idrs, fds
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_stream_matches_batch(seed):
+    rng = np.random.default_rng(seed)
+
+    for trial in range(600):
+        n = int(rng.integers(1, 600))
+        kind = trial % 3
+        if kind == 0:
+            values = rng.random(n)
+        elif kind == 1:
+            values = np.clip(np.cumsum(rng.normal(0, 0.1, n)) % 1.0, 0, 1)
+        else:
+            values = np.repeat(rng.random(n//7 + 1), 7)[:n]
+
+        kwargs = {'disorder_threshold': float(rng.choice([0.1, 0.3, 0.42, 0.5, 0.7])),
+                  'minimum_IDR_size': int(rng.integers(1, 20)),
+                  'minimum_folded_domain': int(rng.integers(5, 60)),
+                  'gap_closure': int(rng.integers(0, 12)),
+                  'override_folded_domain_minsize': bool(rng.integers(0, 2))}
+
+        _, idrs, _, fds, _ = get_domains_batch(values, np.array([0, n]), **kwargs)
+
+        chunk_sizes = rng.integers(1, 80, size=n)
+        assert stream(values, chunk_sizes, **kwargs) == (idrs.tolist(), fds.tolist())
+
+
+def test_stream_predicted_profile():
+    seq = ''.join([build_seq() for i in range(20)])
+    disorder = meta.predict_disorder(seq, device='cpu')
+    ref = meta.predict_disorder_domains_from_external_scores(disorder, sequence=seq)
+
+    for chunk_size in [1, 37, 1000, len(seq)]:
+        idrs, fds = stream(disorder, [chunk_size]*(len(seq)//chunk_size + 1), disorder_threshold=0.5)
+        assert idrs == ref.disordered_domain_boundaries
+        assert fds == ref.folded_domain_boundaries
+
+    domains = list(iter_domains([disorder[:100], disorder[100:]], disorder_threshold=0.5))
+    assert [[d[1], d[2]] for d in domains if d[0] == 'disordered'] == ref.disordered_domain_boundaries
+
+
+def test_bounded_lookback():
+    rng = np.random.default_rng(0)
+    values = np.clip(np.cumsum(rng.normal(0, 0.05, 50000)) % 1.2, 0, 1)
+
+    segmenter = DomainSegmenter()
+    emitted = 0
+    for i in range(0, len(values), 250):
+        emitted = emitted + len(segmenter.add(values[i:i+250]))
+        assert len(segmenter._raw) < 400
+        assert len(segmenter._B) < 1000
+        assert len(segmenter._smoothed) < 1000
+
+    # domains are handed back while the profile is still arriving
+    assert emitted > 0
+    segmenter.finish()
+
+
+def test_segmenter_errors():
+    segmenter = DomainSegmenter()
+    with pytest.raises(DomainError):
+        segmenter.finish()
+
+    segmenter = DomainSegmenter()
+    segmenter.add([0.9]*10)
+    assert segmenter.finish() == [('disordered', 0, 10)]
+    with pytest.raises(DomainError):
+        segmenter.add([0.9])
+    with pytest.raises(DomainError):
+        segmenter.finish()
+
+    with pytest.raises(DomainError):
+        DomainSegmenter(minimum_IDR_size=-1)
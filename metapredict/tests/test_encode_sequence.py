@@ -0,0 +1,102 @@
+"""
+Tests for the sequence encoders in metapredict.backend.encode_sequence
+"""
+
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from metapredict.backend import encode_sequence
+from metapredict.backend import predictor
+from metapredict.backend.network_parameters import metapredict_networks, pplddt_networks
+
+from . import build_seq, VALID_AA
+
+
+def reference_one_hot(seq):
+    """
+    The original per-residue dictionary-based encoder, kept here so the
+    vectorized encoders can be checked against it.
+    """
+    seq = seq.upper()
+    m = np.zeros((len(seq), 20))
+    for i in range(len(seq)):
+        m[i, encode_sequence.ONE_HOT[seq[i]]] = 1
+    return m
+
+
+def test_one_hot_matches_reference():
+    for _ in range(20):
+        s = build_seq()
+        ref = reference_one_hot(s)
+
+        assert np.array_equal(encode_sequence.one_hot(s).numpy(), ref)
+        assert encode_sequence.one_hot(s).dtype == torch.float64
+
+        fast = encode_sequence.one_hot_float32(s)
+        assert fast.dtype == torch.float32
+        assert np.array_equal(fast.numpy(), ref)
+
+
+def test_one_hot_lowercase():
+    s = ''.join(VALID_AA)
+    assert np.array_equal(encode_sequence.one_hot_float32(s.lower()).numpy(),
+                          encode_sequence.one_hot_float32(s).numpy())
+    assert np.array_equal(encode_sequence.encode_indices(s), np.arange(20))
+
+
+def test_one_hot_batch_matches_pad_sequence():
+    seqs = [build_seq() for _ in range(10)]
+    seqs.append('A')
+
+    padded = encode_sequence.one_hot_batch(seqs)
+    ref = torch.nn.utils.rnn.pad_sequence([encode_sequence.one_hot(s).float() for s in seqs], batch_first=True)
+
+    assert padded.dtype == torch.float32
+    assert padded.shape == ref.shape
+    assert torch.equal(padded, ref)
+
+
+@pytest.mark.parametrize('seq, bad', [('AAAXAAA', 'X'), ('ACDEF1', '1'), ('acdbz', 'B'), ('AAAéA', 'É')])
+def test_invalid_residue_raises(seq, bad):
+    for fn in [encode_sequence.one_hot, encode_sequence.one_hot_float32, encode_sequence.encode_indices]:
+        with pytest.raises(ValueError, match='Invalid amino acid detected: ' + bad):
+            fn(seq)
+
+    with pytest.raises(ValueError, match='Invalid amino acid detected: ' + bad):
+        encode_sequence.one_hot_batch(['AAAA', seq])
+
+
+def test_encode_indices_batch():
+    seqs = ['ACD', 'Y', 'WWWWW']
+    idx = encode_sequence.encode_indices_batch(seqs)
+
+    assert idx.dtype == torch.int8
+    assert idx.shape == (3, 5)
+    assert idx[0].tolist() == [0, 1, 2, encode_sequence.PAD_INDEX, encode_sequence.PAD_INDEX]
+    assert idx[1, 0] == 19
+    assert idx[2].tolist() == [18]*5
+
+
+@pytest.mark.parametrize('name, networks, subdir', [('disorder', metapredict_networks, 'networks'),
+                                                    ('pLDDT', pplddt_networks, 'ppLDDT/networks')])
+def test_forward_indices_matches_one_hot(name, networks, subdir):
+    """
+    The index input path must give exactly the same outputs as feeding
+    the equivalent (zero padded) one-hot tensor.
+    """
+    seqs = sorted([build_seq() for _ in range(8)], key=len, reverse=True)
+
+    for version in networks:
+        net = networks[version]
+        path = os.path.join(os.path.dirname(predictor.__file__), subdir, net['weights'])
+        model = predictor.get_model(f'{name}_{version}', net['parameters'], path, 'cpu')
+        model.eval()
+
+        with torch.no_grad():
+            from_one_hot = model(encode_sequence.one_hot_batch(seqs))
+            from_indices = model.forward_indices(encode_sequence.encode_indices_batch(seqs))
+
+        assert torch.equal(from_one_hot, from_indices)
@@ -0,0 +1,108 @@
+"""
+Tests for chunked (streaming) prediction of FASTA files
+"""
+
+import os
+
+import numpy as np
+import pytest
+import protfasta
+
+import metapredict as meta
+from metapredict.backend import meta_tools
+from metapredict.metapredict_exceptions import MetapredictError
+
+
+current_filepath = os.getcwd()
+onehundred_seqs = "{}/input_data/test_seqs_100.fasta".format(current_filepath)
+
+
+def read_csv(fn):
+    """
+    Reads a metapredict .csv file into a dictionary of header to
+    (sequence, scores)
+    """
+    out = {}
+    with open(fn) as fh:
+        for line in fh:
+            fields = line.strip().split(', ')
+            out[fields[0]] = (fields[1], np.array(fields[2:], dtype=float))
+    return out
+
+
+def test_read_fasta_chunks():
+    ref = protfasta.read_fasta(onehundred_seqs, invalid_sequence_action='convert')
+    chunks = list(meta_tools.read_fasta_chunks(onehundred_seqs, 30))
+
+    assert [len(c) for c in chunks] == [30, 30, 30, 10]
+
+    merged = {}
+    for c in chunks:
+        merged.update(c)
+    assert list(merged.items()) == list(ref.items())
+
+    with pytest.raises(MetapredictError):
+        list(meta_tools.read_fasta_chunks(onehundred_seqs, 0))
+
+
+def test_read_fasta_chunks_duplicate_header(tmp_path):
+    fn = str(tmp_path / 'dup.fasta')
+    with open(fn, 'w') as fh:
+        fh.write('>a\nACDEF\n>b\nGHIKL\n>a\nMNPQR\n')
+
+    # duplicates within a chunk raise, as protfasta.read_fasta() does
+    with pytest.raises(MetapredictError):
+        list(meta_tools.read_fasta_chunks(fn, 3))
+
+    # but are not tracked across chunks
+    assert [list(c) for c in meta_tools.read_fasta_chunks(fn, 2)] == [['a', 'b'], ['a']]
+
+
+@pytest.mark.parametrize('fasta_function', [meta.predict_disorder_fasta, meta.predict_pLDDT_fasta])
+def test_chunked_fasta_matches_whole_file(fasta_function, tmp_path):
+    whole = str(tmp_path / 'whole.csv')
+    chunked = str(tmp_path / 'chunked.csv')
+
+    fasta_function(onehundred_seqs, output_file=whole, device='cpu', show_progress_bar=False)
+    fasta_function(onehundred_seqs, output_file=chunked, device='cpu', show_progress_bar=False, chunk_size=7)
+
+    a = read_csv(whole)
+    b = read_csv(chunked)
+
+    # same entries in the same order. Scores can differ by one in the last
+    # rounded decimal because sequences end up in different batches
+    assert list(a.keys()) == list(b.keys())
+    for k in a:
+        assert a[k][0] == b[k][0]
+        assert np.allclose(a[k][1], b[k][1], atol=2e-4)
+
+    # without an output file a dictionary is returned
+    ref = fasta_function(onehundred_seqs, device='cpu', show_progress_bar=False)
+    d = fasta_function(onehundred_seqs, device='cpu', show_progress_bar=False, chunk_size=7)
+    assert list(d.keys()) == list(ref.keys())
+    for k in ref:
+        assert d[k][0] == ref[k][0]
+        assert np.allclose(d[k][1], ref[k][1], atol=2e-4)
+
+
+def test_chunked_caid(tmp_path):
+    whole = tmp_path / 'whole'
+    chunked = tmp_path / 'chunked'
+    whole.mkdir()
+    chunked.mkdir()
+
+    # CAID files are named after the FASTA header, so use simple headers
+    seqs = protfasta.read_fasta(onehundred_seqs, invalid_sequence_action='convert')
+    fasta = str(tmp_path / 'seqs.fasta')
+    protfasta.write_fasta({f'seq{i}': s for i, s in enumerate(seqs.values())}, fasta)
+
+    meta.predict_disorder_caid(fasta, str(whole))
+    meta.predict_disorder_caid(fasta, str(chunked), chunk_size=9)
+
+    assert sorted(os.listdir(whole)) == sorted(os.listdir(chunked))
+    assert len(os.listdir(chunked)) == 100
+
+    for fn in os.listdir(whole):
+        a = np.loadtxt(whole / fn, skiprows=1, usecols=(0, 2))
+        b = np.loadtxt(chunked / fn, skiprows=1, usecols=(0, 2))
+        assert np.allclose(a, b, atol=2e-3)
@@ -0,0 +1,60 @@
+"""
+Tests for splitting batch predictions across multiple devices. Real
+multi-GPU runs can't be tested here, so the dispatch logic is tested by
+running several 'devices' that all point at the CPU.
+"""
+
+import numpy as np
+import pytest
+import torch
+
+import metapredict as meta
+from metapredict.backend import predictor
+from metapredict.metapredict_exceptions import MetapredictError
+
+from . import build_seq
+
+
+def test_check_devices():
+    assert predictor.check_devices('cpu') == ['cpu']
+    assert predictor.check_devices(['cpu', 'CPU']) == ['cpu']
+    assert predictor.check_devices(None, default_device='cpu') == ['cpu']
+
+    with pytest.raises(MetapredictError):
+        predictor.check_devices([])
+
+    with pytest.raises(MetapredictError):
+        predictor.check_devices(['cpu', 'tpu'])
+
+    if not torch.cuda.is_available():
+        with pytest.raises(MetapredictError):
+            predictor.check_devices('cuda:all')
+    else:
+        assert len(predictor.check_devices('cuda:all')) == torch.cuda.device_count()
+
+
+@pytest.mark.parametrize('function_name', ['disorder', 'pLDDT'])
+def test_predict_on_devices(function_name):
+    seqs = list(set([build_seq() for _ in range(100)]))
+
+    if function_name == 'disorder':
+        ref = dict(meta.predict_disorder(seqs, device='cpu'))
+    else:
+        ref = dict(meta.predict_pLDDT(seqs, device='cpu'))
+
+    out = predictor.predict_on_devices(function_name, seqs, ['cpu', 'cpu', 'cpu'], 8, version='V3' if function_name == 'disorder' else 'V2')
+
+    assert set(out.keys()) == set(ref.keys())
+    for s in ref:
+        assert np.allclose(out[s], ref[s], atol=1e-3)
+
+
+def test_device_list_passthrough():
+    seqs = [build_seq() for _ in range(10)]
+    ref = meta.predict_disorder(seqs, device='cpu')
+    out = meta.predict_disorder(seqs, device=['cpu'])
+    for r, o in zip(ref, out):
+        assert np.array_equal(r[1], o[1])
+
+    # models are cached per device
+    assert 'disorder_V3_cpu' in predictor.loaded_models
@@ -0,0 +1,73 @@
+"""
+Tests for Parquet output from predict_disorder_fasta() and predict_pLDDT_fasta()
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import metapredict as meta
+from metapredict.backend import meta_tools
+from metapredict.metapredict_exceptions import MetapredictError
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+current_filepath = os.getcwd()
+onehundred_seqs = "{}/input_data/test_seqs_100.fasta".format(current_filepath)
+
+
+def test_get_output_format():
+    assert meta_tools.get_output_format(None, 'scores.csv') == 'csv'
+    assert meta_tools.get_output_format(None, 'scores.parquet') == 'parquet'
+    assert meta_tools.get_output_format(None, None) == 'csv'
+    assert meta_tools.get_output_format('Parquet', 'scores.csv') == 'parquet'
+
+    with pytest.raises(MetapredictError):
+        meta_tools.get_output_format('json', 'scores.json')
+
+
+@pytest.mark.parametrize('chunk_size', [None, 30])
+def test_disorder_parquet(tmp_path, chunk_size):
+    fn = str(tmp_path / 'disorder.parquet')
+    ref = meta.predict_disorder_fasta(onehundred_seqs, device='cpu', show_progress_bar=False)
+
+    meta.predict_disorder_fasta(onehundred_seqs, output_file=fn, device='cpu', show_progress_bar=False,
+                                chunk_size=chunk_size, include_idrs=True)
+
+    # one row group per chunk
+    assert pq.ParquetFile(fn).num_row_groups == (1 if chunk_size is None else 4)
+
+    table = pq.read_table(fn)
+    assert table.column_names == ['id', 'sequence', 'length', 'scores', 'idrs']
+    assert table.num_rows == len(ref)
+
+    for row in table.to_pylist():
+        seq, scores = ref[row['id']]
+        assert row['sequence'] == seq
+        assert row['length'] == len(seq)
+        assert np.allclose(row['scores'], scores, atol=2e-4)
+
+        # IDRs match predict_disorder_domains()
+        DO = meta.predict_disorder_domains(seq)
+        assert row['idrs'] == DO.disordered_domain_boundaries
+
+
+def test_pLDDT_parquet(tmp_path):
+    fn = str(tmp_path / 'pLDDT.pq')
+    ref = meta.predict_pLDDT_fasta(onehundred_seqs, device='cpu', show_progress_bar=False)
+
+    meta.predict_pLDDT_fasta(onehundred_seqs, output_file=fn, device='cpu', show_progress_bar=False)
+
+    table = pq.read_table(fn)
+    assert table.column_names == ['id', 'sequence', 'length', 'scores']
+    for row in table.to_pylist():
+        assert np.allclose(row['scores'], ref[row['id']][1], atol=2e-2)
+
+    # explicit format wins over the extension, and an output file is needed
+    fn = str(tmp_path / 'pLDDT.out')
+    meta.predict_pLDDT_fasta(onehundred_seqs, output_file=fn, device='cpu', show_progress_bar=False, output_format='parquet')
+    assert pq.read_table(fn).num_rows == 100
+
+    with pytest.raises(MetapredictError):
+        meta.predict_pLDDT_fasta(onehundred_seqs, device='cpu', show_progress_bar=False, output_format='parquet')
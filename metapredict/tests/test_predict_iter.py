@@ -0,0 +1,74 @@
+"""
+Tests for the generator API predict_disorder_iter()
+"""
+
+import numpy as np
+import pytest
+
+import metapredict as meta
+from metapredict.metapredict_exceptions import MetapredictError
+
+from . import build_seq
+
+
+def test_predict_disorder_iter_matches_batch():
+    pairs = [(f'p{i}', build_seq()) for i in range(25)]
+
+    # duplicate IDs and sequences are kept
+    pairs.append(('p0', pairs[0][1]))
+
+    ref = meta.predict_disorder([s for _, s in pairs], device='cpu')
+    out = list(meta.predict_disorder_iter(iter(pairs), device='cpu', buffer_size=len(pairs)))
+
+    assert [i for i, _ in out] == [i for i, _ in pairs]
+    for r, (_, o) in zip(ref, out):
+        assert isinstance(o, np.ndarray)
+        assert np.array_equal(r[1], o)
+
+
+def test_predict_disorder_iter_small_buffers():
+    pairs = [(i, build_seq()) for i in range(10)]
+
+    out = list(meta.predict_disorder_iter(pairs, device='cpu', buffer_size=3, return_numpy=False))
+    assert [i for i, _ in out] == list(range(10))
+
+    for (i, s), (_, o) in zip(pairs, out):
+        assert isinstance(o, list)
+        assert len(o) == len(s)
+        # different buffers can flip the last rounded decimal
+        assert np.allclose(o, meta.predict_disorder(s), atol=2e-4)
+
+
+def test_predict_disorder_iter_is_lazy():
+    consumed = []
+
+    def source():
+        for i in range(10):
+            consumed.append(i)
+            yield (i, build_seq())
+
+    gen = meta.predict_disorder_iter(source(), device='cpu', buffer_size=4)
+    first = next(gen)
+
+    # only the first buffer has been read
+    assert first[0] == 0
+    assert len(consumed) == 4
+    assert len(list(gen)) == 9
+
+
+def test_predict_disorder_iter_domains():
+    pairs = [('a', build_seq()), ('b', build_seq())]
+    for (i, s), (j, DO) in zip(pairs, meta.predict_disorder_iter(pairs, device='cpu', return_domains=True)):
+        assert i == j
+        assert DO.sequence == s
+
+
+def test_predict_disorder_iter_bad_input():
+    with pytest.raises(MetapredictError):
+        list(meta.predict_disorder_iter(['ACDEF'], device='cpu'))
+
+    with pytest.raises(MetapredictError):
+        list(meta.predict_disorder_iter([('a', 'ACDEF')], buffer_size=0))
+
+    with pytest.raises(MetapredictError):
+        list(meta.predict_disorder_iter([('a', '')], device='cpu'))
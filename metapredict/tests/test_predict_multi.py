@@ -0,0 +1,116 @@
+"""
+Tests for running several networks in one go with predict_multi()
+"""
+
+import numpy as np
+import pytest
+
+import metapredict as meta
+from metapredict.backend import predictor
+from metapredict.metapredict_exceptions import MetapredictError
+
+from . import build_seq
+
+
+def test_parse_network_name():
+    assert predictor.parse_network_name('disorder_V3')[0] == 'disorder_V3'
+    assert predictor.parse_network_name('disorder_3')[0] == 'disorder_V3'
+    assert predictor.parse_network_name('disorder_legacy')[0] == 'disorder_V1'
+    assert predictor.parse_network_name('plddt_v2')[0] == 'pLDDT_V2'
+
+    for bad in ['disorder_V9', 'pLDDT_V3', 'structure_V1']:
+        with pytest.raises(MetapredictError):
+            predictor.parse_network_name(bad)
+
+
+def test_predict_multi_single_sequence():
+    seq = build_seq()
+    networks = ['disorder_V1', 'disorder_V2', 'disorder_V3', 'pLDDT_V1', 'pLDDT_V2']
+
+    out = meta.predict_multi(seq, networks=networks)
+    assert list(out.keys()) == networks
+
+    # identical to separate predictions
+    for v in ['V1', 'V2', 'V3']:
+        assert np.array_equal(out[f'disorder_{v}'], meta.predict_disorder(seq, version=v))
+    for v in ['V1', 'V2']:
+        assert np.array_equal(out[f'pLDDT_{v}'], meta.predict_pLDDT(seq, pLDDT_version=v))
+
+    out = meta.predict_multi(seq, networks=['pLDDT_V1'], return_decimals=True, return_numpy=False)
+    assert isinstance(out['pLDDT_V1'], list)
+    assert out['pLDDT_V1'] == meta.predict_pLDDT(seq, pLDDT_version='V1', return_decimals=True, return_numpy=False)
+
+
+def test_predict_multi_batch():
+    seqs = [build_seq() for _ in range(50)]
+    seqs.append(seqs[0])
+
+    out = meta.predict_multi(seqs, networks=['disorder_V3', 'pLDDT_V2'], device='cpu')
+    assert [s for s, _ in out] == seqs
+
+    disorder = meta.predict_disorder(seqs, device='cpu')
+    plddt = meta.predict_pLDDT(seqs, device='cpu')
+    for (s, scores), d, p in zip(out, disorder, plddt):
+        assert np.allclose(scores['disorder_V3'], d[1], atol=2e-4)
+        assert np.allclose(scores['pLDDT_V2'], p[1], atol=2e-2)
+
+    seq_dict = {f'p{i}': s for i, s in enumerate(seqs)}
+    out = meta.predict_multi(seq_dict, device='cpu', max_tokens=2000)
+    assert list(out.keys()) == list(seq_dict.keys())
+    for k in seq_dict:
+        assert out[k][0] == seq_dict[k]
+        assert len(out[k][1]['disorder_V3']) == len(seq_dict[k])
+
+    with pytest.raises(MetapredictError):
+        meta.predict_multi(seqs, networks=[], device='cpu')
+
+
+def test_predict_all_unchanged():
+    seq = build_seq()
+    out = meta.predict_all(seq)
+
+    assert np.array_equal(out[0], meta.predict_pLDDT(seq, pLDDT_version='V1', return_decimals=True))
+    assert np.array_equal(out[1], meta.predict_pLDDT(seq, pLDDT_version='V2', return_decimals=True))
+    assert np.array_equal(out[2], meta.predict_disorder(seq, version='V1'))
+    assert np.array_equal(out[3], meta.predict_disorder(seq, version='V2'))
+    assert np.array_equal(out[4], meta.predict_disorder(seq, version='V3'))
+
+
+def test_predict_all_batch():
+    seqs = [build_seq() for _ in range(40)]
+    seqs.append(seqs[3])
+
+    out = meta.predict_all(seqs, device='cpu')
+    assert len(out) == len(seqs)
+    assert out.ids == list(range(len(seqs)))
+    assert out.networks == ['pLDDT_V1', 'pLDDT_V2', 'disorder_V1', 'disorder_V2', 'disorder_V3']
+    assert out.offsets[-1] == sum(len(s) for s in seqs)
+    assert np.array_equal(out.lengths, [len(s) for s in seqs])
+
+    for name in out.networks:
+        assert out.scores[name].dtype == np.float32
+        assert len(out.scores[name]) == out.offsets[-1]
+
+    # matches the single sequence version
+    for i in [0, 3, 40]:
+        single = meta.predict_all(seqs[i])
+        for name, ref in zip(out.networks, single):
+            assert np.allclose(out.get(i, name), ref, atol=2e-4)
+
+    # dictionaries and iterators of (id, sequence) pairs
+    seq_dict = {f'p{i}': s for i, s in enumerate(seqs)}
+    from_dict = meta.predict_all(seq_dict, device='cpu', max_tokens=3000)
+    from_iter = meta.predict_all(iter(seq_dict.items()), device='cpu')
+    assert from_dict.ids == from_iter.ids == list(seq_dict.keys())
+    for (k, scores), (k2, scores2) in zip(from_dict, from_iter):
+        assert k == k2
+        for name in scores:
+            assert len(scores[name]) == len(seq_dict[k])
+            assert np.allclose(scores[name], scores2[name], atol=2e-4)
+            assert np.allclose(scores[name], out[int(k[1:])][name], atol=2e-4)
+
+    with pytest.raises(MetapredictError):
+        meta.predict_all(iter(['ACDEF']), device='cpu')
+
+    with pytest.raises(MetapredictError):
+        meta.predict_all(['ACDEF', ''], device='cpu')
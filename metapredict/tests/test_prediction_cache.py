@@ -0,0 +1,258 @@
+"""
+Tests for the persistent prediction cache in metapredict.backend.prediction_cache
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import metapredict as meta
+from metapredict import PredictionCache
+from metapredict.backend import prediction_cache
+from metapredict.metapredict_exceptions import MetapredictError
+
+from . import build_seq
+
+
+@pytest.fixture
+def no_memory_cache():
+    """
+    Turns off the in-memory LRU so single-sequence calls reach the disk cache.
+    """
+    size = meta.memory_cache_stats()['max_entries']
+    meta.set_memory_cache_size(0)
+    yield
+    meta.set_memory_cache_size(size)
+
+
+def test_cache_put_get_roundtrip(tmp_path):
+    tag = prediction_cache.build_cache_tag('disorder', 'V3', 'weights.pt', normalized=True)
+    vals = np.random.random(37).astype(np.float32)
+
+    with PredictionCache(str(tmp_path)) as cache:
+        assert cache.get('ACDEF', tag) is None
+        cache.put('ACDEF', vals, tag)
+        out = cache.get('ACDEF', tag)
+
+        assert out.dtype == np.float32
+        assert np.array_equal(out, vals)
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+        # a different tag is a different key
+        assert cache.get('ACDEF', tag + '|other') is None
+
+    # entries persist between sessions
+    with PredictionCache(str(tmp_path)) as cache:
+        assert len(cache) == 1
+        assert np.array_equal(cache.get('ACDEF', tag), vals)
+
+
+def test_cache_tag_order_independent():
+    a = prediction_cache.build_cache_tag('pLDDT', 'V2', 'w.pt', normalized=True, round_values=False)
+    b = prediction_cache.build_cache_tag('pLDDT', 'V2', 'w.pt', round_values=False, normalized=True)
+    assert a == b
+    assert a != prediction_cache.build_cache_tag('pLDDT', 'V1', 'w.pt', round_values=False, normalized=True)
+
+
+def test_cache_eviction(tmp_path):
+    tag = 'test'
+
+    # room for roughly ten 1000-residue float32 profiles
+    cache = PredictionCache(str(tmp_path), max_size_mb=40000/(1024*1024))
+    for i in range(20):
+        cache.put(f'seq{i}', np.zeros(1000, dtype=np.float32), tag)
+        # keep touching the first sequence so it is never the least recently used
+        cache.get('seq0', tag)
+
+    stats = cache.stats()
+    assert stats['size_bytes'] <= stats['max_size_bytes']
+    assert stats['evictions'] == 20 - stats['entries']
+    assert cache.get('seq0', tag) is not None
+    assert cache.get('seq1', tag) is None
+    cache.close()
+
+
+def test_cache_bad_input():
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder('ACDEFGHIK', cache=10)
+
+    with pytest.raises(MetapredictError):
+        PredictionCache('.', max_size_mb=0)
+
+
+
+def test_cache_path_closed_on_error(tmp_path, monkeypatch):
+    # a cache opened from a path must be closed even if the prediction fails
+    closed = []
+    monkeypatch.setattr(PredictionCache, 'close', lambda self: closed.append(self.path))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('failed to load network')
+    monkeypatch.setattr(meta.backend.predictor, 'get_model', fail)
+
+    for function in [meta.predict_disorder, meta.predict_pLDDT]:
+        for inputs in ['ACDEFGHIK', ['ACDEFGHIK', 'KKKKKKKK']]:
+            closed.clear()
+            with pytest.raises(RuntimeError):
+                function(inputs, device='cpu', cache=str(tmp_path))
+            assert len(closed) == 1
+
+@pytest.mark.parametrize('return_numpy', [True, False])
+def test_cached_predictions_match_uncached(tmp_path, return_numpy, no_memory_cache):
+    seqs = [build_seq() for _ in range(20)]
+    cache = PredictionCache(str(tmp_path))
+
+    # single sequence
+    ref = meta.predict_disorder(seqs[0], return_numpy=return_numpy, device='cpu')
+    for _ in range(2):
+        out = meta.predict_disorder(seqs[0], return_numpy=return_numpy, device='cpu', cache=cache)
+        assert type(out) == type(ref)
+        assert np.array_equal(out, ref)
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+    # list, where half of the sequences are already cached. Cached values were
+    # predicted in a different batch, which can flip the last rounded decimal
+    meta.predict_disorder(seqs[:10], device='cpu', cache=cache)
+    ref = meta.predict_disorder(seqs, return_numpy=return_numpy, device='cpu')
+    out = meta.predict_disorder(seqs, return_numpy=return_numpy, device='cpu', cache=cache)
+    for r, o in zip(ref, out):
+        assert r[0] == o[0]
+        assert type(o[1]) == type(r[1])
+        assert np.allclose(o[1], r[1], atol=2e-4)
+
+    # everything is now cached, so a repeat call is an exact match
+    ref = out
+    out = meta.predict_disorder(seqs, return_numpy=return_numpy, device='cpu', cache=cache)
+    for r, o in zip(ref, out):
+        assert r[0] == o[0]
+        assert np.array_equal(o[1], r[1])
+
+    # dictionary
+    seq_dict = {f'p{i}': s for i, s in enumerate(seqs)}
+    ref = meta.predict_disorder(seq_dict, return_numpy=return_numpy, device='cpu')
+    out = meta.predict_disorder(seq_dict, return_numpy=return_numpy, device='cpu', cache=cache)
+    for k in ref:
+        assert ref[k][0] == out[k][0]
+        assert np.allclose(ref[k][1], out[k][1], atol=2e-4)
+
+    # different settings must not be served from the same entries
+    before = cache.hits
+    unnorm = meta.predict_disorder(seqs, normalized=False, device='cpu', cache=cache)
+    assert cache.hits == before
+    for r, o in zip(meta.predict_disorder(seqs, normalized=False, device='cpu'), unnorm):
+        assert np.allclose(r[1], o[1], atol=2e-4)
+
+    cache.close()
+
+
+def test_cached_pLDDT_and_domains(tmp_path):
+    seqs = [build_seq() for _ in range(5)]
+
+    # passing a directory opens (and closes) a cache for the call
+    for _ in range(2):
+        for version in ['V1', 'V2']:
+            ref = meta.predict_pLDDT(seqs, pLDDT_version=version, device='cpu')
+            out = meta.predict_pLDDT(seqs, pLDDT_version=version, device='cpu', cache=str(tmp_path))
+            for r, o in zip(ref, out):
+                assert r[0] == o[0]
+                assert np.array_equal(r[1], o[1])
+
+    with PredictionCache(str(tmp_path)) as cache:
+        # 5 sequences x 2 pLDDT networks
+        assert len(cache) == 10
+
+        ref = meta.predict_disorder(seqs, return_domains=True, device='cpu')
+        for _ in range(2):
+            out = meta.predict_disorder(seqs, return_domains=True, device='cpu', cache=cache)
+            for r, o in zip(ref, out):
+                assert r.disordered_domain_boundaries == o.disordered_domain_boundaries
+                assert np.array_equal(r.disorder, o.disorder)
+
+
+def test_memory_cache_lru():
+    cache = prediction_cache.MemoryCache(2)
+    cache.put('a', np.arange(3, dtype=np.float32))
+    cache.put('b', 1)
+    cache.get('a')
+    cache.put('c', 2)
+
+    # b was the least recently used
+    assert cache.get('b') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 1, 'entries': 2, 'max_entries': 2}
+
+    # arrays come back as writable copies of a read-only stored array
+    a = cache.get('a')
+    a[0] = 100
+    assert cache.get('a')[0] == 0
+
+    cache.resize(1)
+    assert len(cache) == 1
+    cache.resize(0)
+    cache.put('d', 1)
+    assert len(cache) == 0
+
+    with pytest.raises(MetapredictError):
+        cache.resize(-1)
+
+
+
+def test_memory_cache_threads():
+    # concurrent puts and gets must neither raise nor lose track of entries
+    cache = prediction_cache.MemoryCache(50)
+
+    def work(thread_id):
+        for i in range(2000):
+            cache.put((thread_id, i % 80), np.full(4, i, dtype=np.float32))
+            cache.get((thread_id, (i * 7) % 80))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(work, range(8)))
+
+    stats = cache.stats()
+    assert stats['entries'] == 50
+    assert stats['hits'] + stats['misses'] == 8 * 2000
+
+
+def test_memory_cache_predictions():
+    seq = build_seq()
+    meta.clear_memory_cache()
+
+    d1 = meta.predict_disorder(seq)
+    d1[0] = -1
+    d2 = meta.predict_disorder(seq)
+    assert d2[0] != -1
+    assert meta.memory_cache_stats()['hits'] == 1
+
+    assert meta.predict_disorder(seq, return_numpy=False) == meta.predict_disorder(seq, return_numpy=False)
+    assert np.array_equal(meta.predict_disorder(seq, normalized=False), meta.predict_disorder(seq, normalized=False))
+
+    # DisorderObjects are served from the cache, but only for the same
+    # decomposition settings, and changing one does not change the cache
+    DO = meta.predict_disorder_domains(seq)
+    DO.disorder[0] = -1
+    DO.disordered_domain_boundaries.append([0, 1])
+    hits = meta.memory_cache_stats()['hits']
+    DO2 = meta.predict_disorder_domains(seq)
+    assert meta.memory_cache_stats()['hits'] == hits + 1
+    assert DO2 is not DO
+    assert np.array_equal(DO2.disorder, d2)
+    assert [0, 1] not in DO2.disordered_domain_boundaries
+    # new settings miss on the DisorderObject but reuse the cached scores
+    meta.predict_disorder_domains(seq, minimum_IDR_size=20)
+    assert meta.memory_cache_stats()['hits'] == hits + 2
+
+    p1 = meta.predict_pLDDT(seq)
+    p2 = meta.predict_pLDDT(seq)
+    assert np.array_equal(p1, p2)
+    assert not np.array_equal(meta.predict_pLDDT(seq, return_decimals=True), p1)
+
+    # nothing is served from the cache once it is disabled
+    size = meta.memory_cache_stats()['max_entries']
+    meta.set_memory_cache_size(0)
+    meta.clear_memory_cache()
+    assert np.array_equal(meta.predict_disorder(seq), d2)
+    assert meta.memory_cache_stats()['hits'] == 0
+    meta.set_memory_cache_size(size)
@@ -0,0 +1,61 @@
+"""
+Tests for multi-process CPU predictions (num_workers)
+"""
+
+import numpy as np
+import pytest
+
+import metapredict as meta
+from metapredict.backend import predictor
+from metapredict.metapredict_exceptions import MetapredictError
+
+from . import build_seq
+
+
+def test_num_workers_matches_single_process():
+    seqs = [build_seq() for _ in range(300)]
+    seqs.append(seqs[0])
+    seq_dict = {f'p{i}': s for i, s in enumerate(seqs)}
+
+    ref = meta.predict_disorder(seqs, device='cpu')
+    out = meta.predict_disorder(seqs, device='cpu', num_workers=2)
+
+    # results come back in input order
+    assert [s for s, _ in out] == seqs
+    for r, o in zip(ref, out):
+        assert np.allclose(r[1], o[1], atol=2e-4)
+
+    ref = meta.predict_disorder(seq_dict, device='cpu', return_domains=True)
+    out = meta.predict_disorder(seq_dict, device='cpu', return_domains=True, num_workers=2)
+    assert list(ref.keys()) == list(out.keys())
+    for k in ref:
+        assert ref[k].sequence == out[k].sequence
+        assert np.allclose(ref[k].disorder, out[k].disorder, atol=2e-4)
+
+    ref = meta.predict_pLDDT(seqs, device='cpu', return_numpy=False)
+    out = meta.predict_pLDDT(seqs, device='cpu', return_numpy=False, num_workers=2)
+    for r, o in zip(ref, out):
+        assert isinstance(o[1], list)
+        assert np.allclose(r[1], o[1], atol=2e-2)
+
+    # the pool is reused between calls, and replaced if the size changes
+    pool = predictor.process_pool
+    assert predictor.process_pool_size == 2
+    meta.predict_disorder(seqs[:50], device='cpu', num_workers=2)
+    assert predictor.process_pool is pool
+
+    ref = meta.predict_disorder(seqs, device='cpu')
+    out = meta.predict_disorder(seqs, device='cpu', num_workers=3)
+    for r, o in zip(ref, out):
+        assert np.allclose(r[1], o[1], atol=2e-4)
+    assert predictor.process_pool is not pool
+    assert predictor.process_pool_size == 3
+
+    predictor.close_process_pool()
+    assert predictor.process_pool is None
+
+
+def test_num_workers_bad_input():
+    for bad in [0, -1, 1.5]:
+        with pytest.raises(MetapredictError):
+            meta.predict_disorder(['ACDEFGHIK'], device='cpu', num_workers=bad)
@@ -0,0 +1,115 @@
+"""
+Tests for quantized (uint8 / uint16) score storage
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import metapredict as meta
+from metapredict.backend import quantization
+from metapredict.metapredict_exceptions import MetapredictError
+
+from . import build_seq
+
+current_filepath = os.getcwd()
+onehundred_seqs = "{}/input_data/test_seqs_100.fasta".format(current_filepath)
+
+
+def test_quantize_round_trip():
+    scores = np.round(np.random.rand(10000), 4)
+
+    q = quantization.quantize(scores, 'uint8')
+    assert q.dtype == np.uint8
+    decoded = quantization.dequantize(q, quantization.quantization_scale('uint8'))
+    assert decoded.dtype == np.float32
+    assert np.abs(decoded - scores).max() <= 0.5/255 + 1e-6
+
+    # uint16 recovers scores rounded to 4 decimals exactly
+    q = quantization.quantize(scores, 'uint16')
+    decoded = quantization.dequantize(q, quantization.quantization_scale('uint16'))
+    assert np.array_equal(np.round(decoded.astype(np.float64), 4), scores)
+
+    # pLDDT range and clipping
+    q = quantization.quantize([0, 50, 100, 120, -3], 'uint8', max_value=100)
+    assert q.tolist() == [0, 128, 255, 255, 0]
+
+    with pytest.raises(MetapredictError):
+        quantization.quantize(scores, 'int8')
+
+
+@pytest.mark.parametrize('dtype', ['uint8', 'uint16'])
+def test_ragged_quantized(dtype):
+    seqs = [build_seq() for _ in range(20)]
+    ref = meta.predict_disorder(seqs, device='cpu', return_numpy=True)
+    ragged = meta.predict_disorder(seqs, device='cpu', return_format='ragged', ragged_dtype=dtype)
+
+    assert ragged.values.dtype == np.dtype(dtype)
+    assert ragged.scale == quantization.quantization_scale(dtype)
+    step = ragged.scale
+    for i, s in enumerate(seqs):
+        assert np.allclose(ragged.get(i), ref[i][1], atol=step/2 + 2e-4)
+
+    ref = meta.predict_pLDDT(seqs, device='cpu', return_numpy=True)
+    ragged = meta.predict_pLDDT(seqs, device='cpu', return_format='ragged', ragged_dtype=dtype)
+    step = quantization.quantization_scale(dtype, 100)
+    for i, s in enumerate(seqs):
+        assert np.allclose(ragged.get(i), ref[i][1], atol=step/2 + 2e-2)
+
+
+@pytest.mark.parametrize('chunk_size', [None, 30])
+def test_fasta_quantized(tmp_path, chunk_size):
+    ref = meta.predict_disorder_fasta(onehundred_seqs, device='cpu', show_progress_bar=False)
+    out = meta.predict_disorder_fasta(onehundred_seqs, device='cpu', show_progress_bar=False,
+                                      chunk_size=chunk_size, quantize='uint8')
+    for k in ref:
+        assert out[k][0] == ref[k][0]
+        assert np.array_equal(out[k][1], quantization.quantize(ref[k][1], 'uint8'))
+
+    # CSV holds the integer values
+    fn = str(tmp_path / 'disorder.csv')
+    meta.predict_disorder_fasta(onehundred_seqs, output_file=fn, device='cpu', show_progress_bar=False,
+                                chunk_size=chunk_size, quantize='uint16')
+    with open(fn) as fh:
+        line = fh.readline().strip().split(',')
+    # IDs can contain commas, so take the scores from the end of the line
+    expected = quantization.quantize(next(iter(ref.values()))[1], 'uint16').tolist()
+    assert [int(x) for x in line[-len(expected):]] == expected
+
+    out = meta.predict_pLDDT_fasta(onehundred_seqs, device='cpu', show_progress_bar=False,
+                                   chunk_size=chunk_size, quantize='uint8')
+    assert max(max(v[1]) for v in out.values()) <= 255
+
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder_fasta(onehundred_seqs, device='cpu', quantize='uint8', normalized=False)
+
+
+def test_parquet_quantized(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    fn = str(tmp_path / 'disorder.parquet')
+    ref = meta.predict_disorder_fasta(onehundred_seqs, device='cpu', show_progress_bar=False)
+    meta.predict_disorder_fasta(onehundred_seqs, output_file=fn, device='cpu', show_progress_bar=False,
+                                quantize='uint16')
+
+    table = pq.read_table(fn)
+    assert table.schema.field('scores').type.value_type == 'uint16'
+    scale = float(table.schema.metadata[b'metapredict_score_scale'])
+    assert scale == quantization.quantization_scale('uint16')
+
+    for i, k in enumerate(table.column('id').to_pylist()):
+        decoded = quantization.dequantize(table.column('scores')[i].as_py(), scale)
+        assert np.allclose(decoded, ref[k][1], atol=2e-4)
+
+
+def test_archive_quantized(tmp_path):
+    fn = str(tmp_path / 'disorder.mpsa')
+    ref = meta.predict_disorder_fasta(onehundred_seqs, device='cpu', show_progress_bar=False)
+    meta.predict_disorder_fasta(onehundred_seqs, output_file=fn, device='cpu', show_progress_bar=False,
+                                quantize='uint16')
+
+    archive = meta.ScoreArchive(fn)
+    assert archive.dtype == np.uint16
+    for k in ref:
+        assert np.allclose(archive.get(k), ref[k][1], atol=2e-4)
@@ -0,0 +1,65 @@
+"""
+Tests for return_format='ragged'
+"""
+
+import numpy as np
+import pytest
+
+import metapredict as meta
+from metapredict.metapredict_exceptions import MetapredictError
+
+from . import build_seq
+
+
+def test_ragged_disorder():
+    seqs = [build_seq() for _ in range(50)]
+    seqs.append(seqs[0])
+
+    ref = meta.predict_disorder(seqs, device='cpu')
+    out = meta.predict_disorder(seqs, device='cpu', return_format='ragged')
+
+    assert len(out) == len(seqs)
+    assert out.ids == list(range(len(seqs)))
+    assert out.values.dtype == np.float32
+    assert out.offsets.dtype == np.int64
+    assert out.offsets[-1] == len(out.values) == sum(len(s) for s in seqs)
+    assert np.array_equal(out.lengths, [len(s) for s in seqs])
+
+    for (i, scores), r in zip(out, ref):
+        assert np.array_equal(scores, r[1])
+
+        # per-sequence scores are views, not copies
+        assert np.shares_memory(out[i], out.values)
+
+    # dictionaries keep their keys
+    seq_dict = {f'p{i}': s for i, s in enumerate(seqs)}
+    out = meta.predict_disorder_batch(seq_dict, device='cpu', return_format='ragged', show_progress_bar=False)
+    assert out.ids == list(seq_dict.keys())
+    assert np.array_equal(out['p3'], ref[3][1])
+
+
+def test_ragged_pLDDT_float16():
+    seqs = [build_seq() for _ in range(20)]
+
+    ref = meta.predict_pLDDT(seqs, device='cpu')
+    out = meta.predict_pLDDT(seqs, device='cpu', return_format='ragged', ragged_dtype='float16')
+
+    assert out.values.dtype == np.float16
+    for i, r in enumerate(ref):
+        assert np.allclose(out[i], r[1], atol=0.1)
+
+
+def test_ragged_bad_input():
+    seqs = [build_seq() for _ in range(3)]
+
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder(seqs[0], return_format='ragged')
+
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder(seqs, device='cpu', return_format='ragged', return_domains=True)
+
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder(seqs, device='cpu', return_format='columns')
+
+    with pytest.raises(MetapredictError):
+        meta.predict_pLDDT(seqs, device='cpu', return_format='ragged', ragged_dtype='int8')
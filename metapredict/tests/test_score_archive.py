@@ -0,0 +1,131 @@
+"""
+Tests for the binary score archive
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import metapredict as meta
+from metapredict.backend import score_archive
+from metapredict.metapredict_exceptions import MetapredictError
+
+current_filepath = os.getcwd()
+onehundred_seqs = "{}/input_data/test_seqs_100.fasta".format(current_filepath)
+
+
+def test_archive_roundtrip(tmp_path):
+    fn = str(tmp_path / 'scores.mpsa')
+    scores = {f'p{i}': np.random.rand(np.random.randint(1, 500)).astype(np.float32) for i in range(50)}
+
+    with score_archive.ScoreArchiveWriter(fn, metadata={'note': 'test'}) as writer:
+        for k, v in scores.items():
+            writer.add(k, v)
+
+    archive = meta.ScoreArchive(fn)
+    assert len(archive) == 50
+    assert archive.ids == list(scores.keys())
+    assert archive.metadata == {'note': 'test'}
+    assert 'p3' in archive and 'x' not in archive
+
+    for k, v in scores.items():
+        assert archive[k].dtype == np.float16
+        assert np.allclose(archive.get(k), v, atol=1e-3)
+
+        # reads are views into the memory-mapped file
+        assert np.shares_memory(archive[k], archive.buffer)
+
+    with pytest.raises(KeyError):
+        archive['x']
+
+    assert [k for k, _ in archive] == list(scores.keys())
+
+
+def test_archive_lookup_many_ids(tmp_path):
+    fn = str(tmp_path / 'scores.mpsa')
+    ids = [f'sp|P{i:05d}|PROT_{i}' for i in range(5000)] + ['', 'é', 42]
+
+    with score_archive.ScoreArchiveWriter(fn) as writer:
+        for i, k in enumerate(ids):
+            writer.add(k, np.full(i % 7 + 1, (i % 100)/100))
+
+    archive = meta.ScoreArchive(fn)
+    assert len(archive) == len(ids)
+    assert archive.ids == [str(k) for k in ids]
+    for i, k in enumerate(ids):
+        assert k in archive
+        assert len(archive[k]) == i % 7 + 1
+        assert np.allclose(archive.get(k), (i % 100)/100, atol=1e-3)
+    assert 'sp|P05000|PROT_5000' not in archive
+
+
+def test_archive_duplicate_ids(tmp_path):
+    with score_archive.ScoreArchiveWriter(str(tmp_path / 'scores.mpsa')) as writer:
+        writer.add('a', [0.1, 0.2])
+        with pytest.raises(MetapredictError):
+            writer.add('a', [0.3])
+
+        ragged = meta.predict_disorder(['ACDEFG', 'KLMNPQ'], device='cpu', return_format='ragged')
+        writer.add_many(ragged)
+        with pytest.raises(MetapredictError):
+            writer.add_many(ragged)
+
+        # nothing from a rejected batch is added
+        ragged = meta.predict_disorder({'b': 'ACDEFG', 'b2': 'KLMNPQ', 'a': 'RSTVWY'}, device='cpu', return_format='ragged')
+        with pytest.raises(MetapredictError):
+            writer.add_many(ragged)
+        writer.add('b', [0.5])
+
+    archive = meta.ScoreArchive(str(tmp_path / 'scores.mpsa'))
+    assert len(archive) == 4
+    assert np.allclose(archive.get('a'), [0.1, 0.2], atol=1e-3)
+
+
+def test_archive_uint8(tmp_path):
+    fn = str(tmp_path / 'scores.mpsa')
+    values = np.linspace(0, 1, 300).astype(np.float32)
+
+    with score_archive.ScoreArchiveWriter(fn, dtype='uint8') as writer:
+        writer.add('a', values)
+        writer.add('b', values[::-1])
+
+    archive = meta.ScoreArchive(fn)
+    assert archive['a'].dtype == np.uint8
+    assert archive.get('a').dtype == np.float32
+    assert np.allclose(archive.get('a'), values, atol=0.5/255 + 1e-6)
+    assert np.allclose(archive.get('b'), values[::-1], atol=0.5/255 + 1e-6)
+
+    with pytest.raises(MetapredictError):
+        score_archive.ScoreArchiveWriter(str(tmp_path / 'bad.mpsa'), dtype='int8')
+
+
+def test_not_an_archive(tmp_path):
+    fn = str(tmp_path / 'scores.csv')
+    with open(fn, 'w') as fh:
+        fh.write('a, 0.1, 0.2\n')
+    with pytest.raises(MetapredictError):
+        meta.ScoreArchive(fn)
+
+
+@pytest.mark.parametrize('chunk_size', [None, 30])
+def test_predict_disorder_fasta_archive(tmp_path, chunk_size):
+    fn = str(tmp_path / 'disorder.mpsa')
+    ref = meta.predict_disorder_fasta(onehundred_seqs, device='cpu', show_progress_bar=False)
+
+    meta.predict_disorder_fasta(onehundred_seqs, output_file=fn, device='cpu', show_progress_bar=False, chunk_size=chunk_size)
+
+    archive = meta.ScoreArchive(fn)
+    assert len(archive) == len(ref)
+    assert archive.metadata['version'] == meta.DEFAULT_NETWORK
+    for k in ref:
+        assert len(archive[k]) == len(ref[k][0])
+        assert np.allclose(archive.get(k), ref[k][1], atol=1e-3)
+
+    # uint8
+    fn = str(tmp_path / 'disorder_uint8.bin')
+    meta.predict_disorder_fasta(onehundred_seqs, output_file=fn, device='cpu', show_progress_bar=False, 
+                                output_format='archive', archive_dtype='uint8')
+    archive = meta.ScoreArchive(fn)
+    for k in ref:
+        assert np.allclose(archive.get(k), ref[k][1], atol=0.5/255 + 1e-3)
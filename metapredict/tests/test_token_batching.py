@@ -0,0 +1,154 @@
+"""
+Tests for token-budget (max_tokens) batching and the out-of-memory fallback
+"""
+
+import numpy as np
+import pytest
+import torch
+
+import metapredict as meta
+from metapredict.backend import predictor
+from metapredict.metapredict_exceptions import MetapredictError
+
+from . import build_seq
+
+
+def test_next_batch_end():
+    seqs = ['A'*100, 'A'*50, 'A'*50, 'A'*10, 'A'*10, 'A'*10]
+
+    assert predictor.next_batch_end(seqs, 0, 4) == 4
+    assert predictor.next_batch_end(seqs, 4, 4) == 6
+
+    # always at least one sequence, even if it is over budget
+    assert predictor.next_batch_end(seqs, 0, 4, max_tokens=10) == 1
+    assert predictor.next_batch_end(seqs, 1, 4, max_tokens=100) == 3
+    assert predictor.next_batch_end(seqs, 3, 4, max_tokens=1000) == 6
+
+
+def test_max_tokens_matches_fixed_batches():
+    seqs = [build_seq() for _ in range(200)]
+
+    ref = meta.predict_disorder(seqs, device='cpu')
+    out = meta.predict_disorder(seqs, device='cpu', max_tokens=5000)
+    for r, o in zip(ref, out):
+        assert r[0] == o[0]
+        assert np.allclose(r[1], o[1], atol=2e-4)
+
+    ref = meta.predict_pLDDT(seqs, device='cpu')
+    out = meta.predict_pLDDT(seqs, device='cpu', max_tokens=5000)
+    for r, o in zip(ref, out):
+        assert np.allclose(r[1], o[1], atol=2e-2)
+
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder(seqs, device='cpu', max_tokens=0)
+
+
+@pytest.mark.parametrize('max_tokens', [None, 100000])
+def test_out_of_memory_fallback(monkeypatch, max_tokens):
+    seqs = [build_seq() for _ in range(100)]
+    ref = meta.predict_disorder(seqs, device='cpu')
+
+    # pretend the device can only fit batches of up to 10 sequences
+    batch_sizes = []
+    real_forward = predictor.packed_forward_networks
+
+    def fake_forward(networks, batch, device):
+        if len(batch) > 10:
+            raise RuntimeError('CUDA out of memory. Tried to allocate 2.00 GiB')
+        batch_sizes.append(len(batch))
+        return real_forward(networks, batch, device)
+
+    monkeypatch.setattr(predictor, 'packed_forward_networks', fake_forward)
+    out = meta.predict_disorder(seqs, device='cpu', max_tokens=max_tokens, silence_warnings=True)
+
+    assert sum(batch_sizes) == len(set(seqs))
+    assert max(batch_sizes) <= 10
+    for r, o in zip(ref, out):
+        assert np.allclose(r[1], o[1], atol=2e-4)
+
+    # other errors are not swallowed
+    def broken_forward(networks, batch, device):
+        raise RuntimeError('something else went wrong')
+
+    monkeypatch.setattr(predictor, 'packed_forward_networks', broken_forward)
+    with pytest.raises(RuntimeError):
+        meta.predict_disorder(seqs, device='cpu', max_tokens=max_tokens)
+
+
+class _DoneEvent:
+    def synchronize(self):
+        pass
+
+
+@pytest.mark.parametrize('max_tokens', [None, 20000])
+def test_pipelined_batches(monkeypatch, max_tokens):
+    # run the CUDA pipeline's control flow (prefetching, in-flight batches and
+    # the out-of-memory fallback) on the CPU by standing in for the CUDA calls
+    seqs = sorted(set(build_seq() for _ in range(100)), key=len, reverse=True)
+    _, _, params, model = predictor.load_networks(['disorder_V3'])['disorder_V3']
+    used_lightning = params['used_lightning']
+
+    ref = {}
+    for batch, outputs, offsets in predictor.iter_packed_batches(model, seqs, torch.device('cpu'), used_lightning, 32, max_tokens):
+        for i, s in enumerate(batch):
+            ref[s] = outputs[offsets[i]:offsets[i+1]]
+
+    batch_sizes = []
+
+    def fake_forward_async(networks, pinned, lengths, device, copy_stream):
+        if len(lengths) > 10:
+            raise RuntimeError('CUDA out of memory. Tried to allocate 2.00 GiB')
+        batch_sizes.append(len(lengths))
+        return [predictor.packed_forward_flat(model, pinned, lengths, used_lightning, postprocess)
+                for model, used_lightning, postprocess in networks], _DoneEvent()
+
+    class FakeCudaDevice:
+        type = 'cuda'
+
+    monkeypatch.setattr(predictor.torch.cuda, 'Stream', lambda device: None)
+    monkeypatch.setattr(predictor.torch.cuda, 'empty_cache', lambda: None)
+    monkeypatch.setattr(predictor, 'encode_pinned', predictor.encode_sequence.encode_indices_batch)
+    monkeypatch.setattr(predictor, 'cuda_forward_async', fake_forward_async)
+
+    out = {}
+    for batch, outputs, offsets in predictor.iter_packed_batches(model, seqs, FakeCudaDevice(), used_lightning, 32, max_tokens, silence_warnings=True):
+        for i, s in enumerate(batch):
+            out[s] = outputs[offsets[i]:offsets[i+1]]
+
+    assert sum(batch_sizes) == len(seqs)
+    assert list(out.keys()) == seqs
+    for s in seqs:
+        assert np.allclose(ref[s], out[s], atol=2e-4)
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason='requires CUDA')
+def test_pipelined_batches_cuda():
+    seqs = [build_seq() for _ in range(200)]
+    ref = meta.predict_disorder(seqs, device='cpu')
+    out = meta.predict_disorder(seqs, device='cuda', max_tokens=5000)
+    for r, o in zip(ref, out):
+        assert np.allclose(r[1], o[1], atol=2e-3)
+
+
+def test_flat_outputs_match_padded():
+    # un-padding the packed outputs on the device gives the same scores as
+    # running the padded network and slicing
+    seqs = sorted(set(build_seq() for _ in range(50)), key=len, reverse=True)
+    _, _, params, model = predictor.load_networks(['disorder_V3'])['disorder_V3']
+
+    seqs_padded = predictor.encode_sequence.encode_indices_batch(seqs)
+    lengths = [len(s) for s in seqs]
+    with torch.no_grad():
+        packed_seqs = torch.nn.utils.rnn.pack_padded_sequence(model.embed_indices(seqs_padded), lengths, batch_first=True)
+        padded, _ = torch.nn.utils.rnn.pad_packed_sequence(model.lstm(packed_seqs)[0], batch_first=True)
+        padded = predictor._output_head(model, padded, params['used_lightning']).numpy()
+    flat = predictor.packed_forward_flat(model, seqs_padded, lengths, params['used_lightning']).numpy()
+
+    offsets = predictor.length_offsets(lengths)
+    assert len(flat) == sum(lengths)
+    for i, l in enumerate(lengths):
+        assert np.allclose(flat[offsets[i]:offsets[i+1]], padded[i][:l].flatten(), atol=1e-5)
+
+    # on-device post-processing matches numpy
+    raw = torch.from_numpy(padded.flatten()*1.3 - 0.1)
+    assert np.array_equal(predictor.postprocess_tensor(raw).numpy(), np.round(np.clip(raw.numpy(), 0, 1), 4))
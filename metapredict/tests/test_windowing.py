@@ -0,0 +1,163 @@
+"""
+Tests for splitting very long sequences into overlapping windows
+"""
+
+import os
+
+import numpy as np
+import protfasta
+import pytest
+
+import metapredict as meta
+from metapredict.backend import windowing
+from metapredict.metapredict_exceptions import MetapredictError
+
+from . import VALID_AA
+
+test_fasta = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'input_data', 'test_seqs_100.fasta')
+
+
+def random_seq(length):
+    return ''.join(np.random.choice(VALID_AA, length))
+
+
+def test_window_starts():
+    assert windowing.window_starts(100, 100, 10) == [0]
+
+    for L, W, O in [(101, 100, 10), (1000, 100, 10), (20000, 4000, 1000), (12345, 777, 300)]:
+        starts = windowing.window_starts(L, W, O)
+
+        # first window at the start, last window at the end
+        assert starts[0] == 0
+        assert starts[-1] + W == L
+
+        # neighbours overlap by at least the requested amount
+        for a, b in zip(starts[:-1], starts[1:]):
+            assert a + W - b >= O
+
+    for W, O in [(1, 0), (100, 100), (100, -1), (100.0, 10)]:
+        with pytest.raises(MetapredictError):
+            windowing.check_window_settings(W, O)
+
+
+def test_stitch_windows_exact():
+    # windows cut from a single profile must stitch back to the same profile
+    profile = np.random.rand(5000).astype(np.float32)
+    starts = windowing.window_starts(len(profile), 1200, 300)
+    stitched = windowing.stitch_windows(len(profile), starts, [profile[s:s+1200] for s in starts])
+
+    assert stitched.dtype == profile.dtype
+    assert np.allclose(stitched, profile, atol=1e-6)
+
+    # in the overlap the scores crossfade from one window to the next
+    a = np.zeros(100)
+    b = np.ones(100)
+    stitched = windowing.stitch_windows(150, [0, 50], [a, b])
+    assert np.all(stitched[:50] == 0)
+    assert np.all(stitched[100:] == 1)
+    assert np.all(np.diff(stitched[50:100]) > 0)
+
+
+def test_split_long_sequences():
+    short = random_seq(50)
+    long = random_seq(500)
+
+    to_predict, long_seqs = windowing.split_long_sequences([short, long], 200, 50)
+    assert list(long_seqs.keys()) == [long]
+    assert short in to_predict
+    assert long not in to_predict
+    assert all(len(s) <= 200 for s in to_predict)
+
+
+def test_windowed_prediction():
+    seqs = [random_seq(100) for _ in range(5)]
+    long = random_seq(3000)
+
+    # short sequences are not affected and windows don't appear in the output
+    ref = meta.predict_disorder(seqs, device='cpu')
+    out = meta.predict_disorder(seqs + [long], device='cpu', window_length=1000, window_overlap=200)
+    assert len(out) == len(seqs) + 1
+    for r, o in zip(ref, out):
+        assert np.allclose(r[1], o[1], atol=2e-4)
+    assert out[-1][0] == long
+    assert len(out[-1][1]) == len(long)
+
+    # pLDDT too
+    out = meta.predict_pLDDT([long], device='cpu', window_length=1000, window_overlap=200)
+    assert len(out[0][1]) == len(long)
+
+    with pytest.raises(MetapredictError):
+        meta.predict_disorder([long], device='cpu', window_length=100, window_overlap=100)
+
+
+def test_windowed_predict_multi():
+    seqs = [random_seq(100) for _ in range(5)]
+    long = random_seq(3000)
+
+    # windows are stitched for every network, the same as predicting each
+    # network on its own
+    out = meta.predict_multi(seqs + [long], networks=['disorder_V3', 'pLDDT_V2'], device='cpu', 
+                             window_length=1000, window_overlap=200)
+    assert [s for s, _ in out] == seqs + [long]
+    disorder = meta.predict_disorder([long], device='cpu', window_length=1000, window_overlap=200)[0][1]
+    plddt = meta.predict_pLDDT([long], device='cpu', window_length=1000, window_overlap=200)[0][1]
+    assert np.allclose(out[-1][1]['disorder_V3'], disorder, atol=2e-4)
+    assert np.allclose(out[-1][1]['pLDDT_V2'], plddt, atol=2e-2)
+
+    # a window that is also an input is returned as itself
+    out = meta.predict_multi({'long': long, 'window': long[:1000]}, device='cpu', window_length=1000, window_overlap=200)
+    assert list(out.keys()) == ['long', 'window']
+    assert len(out['window'][1]['disorder_V3']) == 1000
+    assert len(out['long'][1]['disorder_V3']) == len(long)
+
+    with pytest.raises(MetapredictError):
+        meta.predict_multi([long], device='cpu', window_length=100, window_overlap=100)
+
+
+def test_windowed_predict_all():
+    long = random_seq(3000)
+    seqs = [random_seq(100), long, long[:1000], long]
+
+    # windows that are also inputs are read back from the buffers when the
+    # long sequence is stitched
+    out = meta.predict_all(seqs, device='cpu', window_length=1000, window_overlap=200)
+    multi = meta.predict_multi(seqs, networks=out.networks, device='cpu', return_decimals=True, 
+                               window_length=1000, window_overlap=200)
+    assert np.array_equal(out.lengths, [len(s) for s in seqs])
+    for i, (s, scores) in enumerate(multi):
+        for name in scores:
+            assert np.allclose(out.get(i, name), scores[name], atol=2e-4)
+
+
+def test_windowed_prediction_deviation():
+    # the network is a BiLSTM, so each window loses some long-range context 
+    # relative to a full-length prediction. Measure how much on a long 
+    # sequence made by joining real proteins
+    seqs = protfasta.read_fasta(test_fasta, invalid_sequence_action='convert')
+    long = ''.join(seqs.values())[:20000]
+
+    full = meta.predict_disorder(long, device='cpu')
+    windowed = meta.predict_disorder([long], device='cpu', window_length=10000, window_overlap=2000)[0][1]
+
+    # measured: mean 0.02, 95th percentile 0.06, max 0.26 (see the 
+    # window_length docstring)
+    deviation = np.abs(full - windowed)
+    assert deviation.mean() < 0.03
+    assert np.percentile(deviation, 95) < 0.07
+    assert deviation.max() < 0.3
+
+
+@pytest.mark.parametrize('predict_function', [meta.predict_disorder, meta.predict_pLDDT])
+def test_windowed_predictions_not_cached(tmp_path, predict_function):
+    # windowed scores depend on the window settings, so they must never be
+    # served from the cache in place of a full-length prediction
+    short = random_seq(200)
+    long = random_seq(3000)
+
+    full = predict_function([long], device='cpu')[0][1]
+    predict_function([short, long], device='cpu', cache=str(tmp_path), window_length=1000, window_overlap=200)
+    with meta.PredictionCache(str(tmp_path)) as cache:
+        assert len(cache) == 1
+
+    out = predict_function([short, long], device='cpu', cache=str(tmp_path))
+    assert np.allclose(out[1][1], full, atol=2e-4)